@@ -13,7 +13,9 @@ else
 fi
 
 cd "$(dirname "$0")"
-rsync -av web_scripts/ $web_scripts_path
+# The static pages are exported on the server itself (see
+# web_scripts/staticexport.py); a local export must never be deployed:
+rsync -av --exclude /static/ web_scripts/ $web_scripts_path
 
 #chmod 0777 /mit/hwops/web_scripts/robots.txt
 #rsync -av manuals/ /mit/hwops/web_scripts/manuals/
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import authutils
+import requestutils
 import templateutils
 
 
@@ -39,4 +40,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    requestutils.run(main)
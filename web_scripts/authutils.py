@@ -235,25 +235,36 @@ def can_approve(user):
 
 
 def enrich_project_list_with_permissions(user, project_list):
-    """Add the 'can_edit' field to each entry in the given project_list.
+    """Add the 'can_edit' and 'can_approve' fields to each entry in the given
+    project_list.
 
     Parameters
     ----------
     user : str
         The kerberos of the user.
-    project_list : list of dict
-        The info for each project. This will be updated in-place.
+    project_list : list of dict or list of viewmodels.Project
+        The info for each project. Dicts will be updated in-place. Views are
+        immutable, so they are replaced with updated copies in the returned
+        list.
 
     Returns
     -------
-    project_list : list of dict
+    project_list : list of dict or list of viewmodels.Project
         The updated project info.
     """
     user_can_approve = can_approve(user)
+    updated_project_list = []
     for project in project_list:
-        project['can_edit'] = can_edit(user, project['project_id'])
-        project['can_approve'] = (
-            user_can_approve and
-            project['approval'] == 'awaiting_approval'
-        )
-    return project_list
+        permissions = {
+            'can_edit': can_edit(user, project['project_id']),
+            'can_approve': (
+                user_can_approve and
+                project['approval'] == 'awaiting_approval'
+            )
+        }
+        if isinstance(project, dict):
+            project.update(permissions)
+        else:
+            project = project._replace(**permissions)
+        updated_project_list.append(project)
+    return updated_project_list
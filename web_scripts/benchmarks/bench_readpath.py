@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""Compare the time taken to load the project list through the ORM (building
+Projects objects and their relationships, then copying them to dicts),
+through Core selects on the normalized tables, and from the serialized
+project documents used by the list and JSON views.
+
+This fills the TEST database with synthetic projects (removing them again
+afterwards), so never point it at production. Run from web_scripts/benchmarks:
+
+    python bench_readpath.py [num_projects] [num_repeats]
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+sys.path.insert(0, '..')
+
+# Only ever run against the test database:
+os.environ['PROJECTS_DATABASE_MODE'] = 'test'
+import creds
+assert creds.mode == 'test'
+
+import db
+import schema
+
+NAME_PREFIX = 'bench-readpath-'
+
+
+def populate(num_projects):
+    """Insert synthetic approved projects, each with a couple of links and
+    contacts and a single revision, using bulk Core inserts.
+
+    Parameters
+    ----------
+    num_projects : int
+        The number of projects to insert.
+    """
+    projects = schema.Projects.__table__
+    schema.session.execute(
+        projects.insert(),
+        [
+            {
+                'name': '%s%d' % (NAME_PREFIX, i),
+                'description': 'Synthetic project number %d.' % i,
+                'status': 'active',
+                'approval': 'approved',
+                'creator': 'bench',
+                'version': 1
+            }
+            for i in range(num_projects)
+        ]
+    )
+    project_rows = schema.session.execute(
+        db.sa.select(
+            [projects.c.project_id, projects.c.name, projects.c.description]
+        ).where(projects.c.name.like(NAME_PREFIX + '%'))
+    ).fetchall()
+
+    history_rows = []
+    link_rows = []
+    contact_rows = []
+    for project_id, name, description in project_rows:
+        history_rows.append(
+            {
+                'project_id': project_id,
+                'name': name,
+                'description': description,
+                'status': 'active',
+                'approval': 'approved',
+                'creator': 'bench',
+                'author': 'bench',
+                'action': 'create',
+                'revision_id': 0
+            }
+        )
+        for index in range(2):
+            link_rows.append(
+                {
+                    'project_id': project_id,
+                    'link': 'https://%s-%d.mit.edu' % (name, index),
+                    'index': index
+                }
+            )
+            contact_rows.append(
+                {
+                    'project_id': project_id,
+                    'email': '%s-%d@mit.edu' % (name, index),
+                    'type': 'primary' if index == 0 else 'secondary',
+                    'index': index
+                }
+            )
+    schema.session.execute(
+        schema.ProjectsHistory.__table__.insert(), history_rows
+    )
+    schema.session.execute(schema.Links.__table__.insert(), link_rows)
+    schema.session.execute(
+        schema.ContactEmails.__table__.insert(), contact_rows
+    )
+    db.refresh_project_documents(
+        [project_id for project_id, name, description in project_rows]
+    )
+    schema.session.commit()
+
+
+def cleanup():
+    """Remove the synthetic projects.
+    """
+    project_ids = db.sa.select([schema.Projects.project_id]).where(
+        schema.Projects.name.like(NAME_PREFIX + '%')
+    )
+    for model in [
+        schema.Links, schema.CommChannels, schema.ContactEmails, schema.Roles,
+        schema.ProjectsHistory, schema.ProjectDocuments
+    ]:
+        schema.session.execute(
+            model.__table__.delete().where(model.project_id.in_(project_ids))
+        )
+    schema.session.execute(
+        schema.Projects.__table__.delete().where(
+            schema.Projects.name.like(NAME_PREFIX + '%')
+        )
+    )
+    schema.session.commit()
+
+
+def load_orm():
+    return db.projects_to_dicts(
+        db.get_all_approved_projects(db.PROJECT_GRAPH_OPTIONS)
+    )
+
+
+def load_core():
+    return db.rows_to_dicts(db.select_project_list('approved'))
+
+
+def load_documents():
+    return db.get_all_project_info('approved')
+
+
+def time_loader(loader, num_repeats):
+    """Time a loader, starting each repeat with an empty session so that the
+    ORM cannot reuse objects from the identity map.
+
+    Returns
+    -------
+    best_time : float
+        The fastest run, in seconds.
+    num_projects : int
+        The number of projects loaded.
+    """
+    times = []
+    for i in range(num_repeats):
+        schema.session.expire_all()
+        schema.session.expunge_all()
+        start_time = time.time()
+        project_list = loader()
+        times.append(time.time() - start_time)
+        schema.session.commit()
+    return min(times), len(project_list)
+
+
+def main():
+    num_projects = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    num_repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    cleanup()
+    populate(num_projects)
+    try:
+        for label, loader in [
+            ('ORM', load_orm), ('Core', load_core),
+            ('Documents', load_documents)
+        ]:
+            best_time, num_loaded = time_loader(loader, num_repeats)
+            print(
+                '%-9s %d projects: %.3f s (best of %d)' % (
+                    label, num_loaded, best_time, num_repeats
+                )
+            )
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""Compare the wall-clock time of sending reminders serially and with a pool
+of worker threads, against a local SMTP stand-in which adds a fixed delay to
+every command (like a slow outgoing.mit.edu). No real email is sent, but the
+database must be reachable since sendreminders imports db.
+
+Run from web_scripts/benchmarks:
+
+    python bench_sendreminders.py [num_messages] [latency_seconds]
+"""
+
+from __future__ import print_function
+
+import sys
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+sys.path.insert(0, '..')
+
+import config
+import mail
+import sendreminders
+
+
+class SlowSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of the SMTP protocol for smtplib.SMTP.sendmail, with an
+    artificial delay before each reply.
+    """
+    def reply(self, line):
+        time.sleep(self.server.latency)
+        self.wfile.write((line + '\r\n').encode('ascii'))
+        self.wfile.flush()
+
+    def handle(self):
+        self.reply('220 localhost SMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith('EHLO') or command.startswith('HELO'):
+                self.reply('250 localhost')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline().rstrip(b'\r\n') != b'.':
+                    pass
+                self.server.num_messages += 1
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('250 OK')
+
+
+class SlowSMTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency):
+        socketserver.TCPServer.__init__(
+            self, ('127.0.0.1', 0), SlowSMTPHandler
+        )
+        self.latency = latency
+        self.num_messages = 0
+
+
+def make_jobs(num_messages):
+    jobs = []
+    for i in range(num_messages):
+        reminder = {
+            'id': i,
+            'project_id': i,
+            'reminder_kind': 'reminder_7'
+        }
+        project_info = {
+            'project_id': i,
+            'name': 'Benchmark Project %d' % i,
+            'description': 'A project used to benchmark sendreminders.',
+            'status': 'active',
+            'creator': 'benchmark',
+            'links': [{'link': 'https://example.com', 'anchortext': None}],
+            'comm_channels': [{'commchannel': 'benchmark@mit.edu'}],
+            'roles': [],
+            'contacts': [
+                {'email': 'benchmark@mit.edu', 'type': 'primary', 'index': 0}
+            ]
+        }
+        jobs.append((reminder, project_info))
+    return jobs
+
+
+def run(server, jobs, num_workers, max_messages_per_second):
+    server.num_messages = 0
+    start = time.time()
+    failures = sendreminders.deliver_reminders(
+        jobs,
+        num_workers=num_workers,
+        max_messages_per_second=max_messages_per_second
+    )
+    elapsed = time.time() - start
+    assert len(failures) == 0, failures[0][1]
+    assert server.num_messages == len(jobs)
+    return elapsed
+
+
+def main():
+    num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+
+    server = SlowSMTPServer(latency)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    mail.SMTP_HOST, mail.SMTP_PORT = server.server_address
+
+    jobs = make_jobs(num_messages)
+    print(
+        '%d messages, %.3fs per SMTP reply' % (num_messages, latency)
+    )
+    serial = run(server, jobs, 1, None)
+    print('serial:                  %.2fs' % serial)
+    parallel = run(server, jobs, config.REMINDER_WORKERS, None)
+    print(
+        '%d workers:               %.2fs (%.1fx)' % (
+            config.REMINDER_WORKERS, parallel, serial / parallel
+        )
+    )
+    limited = run(
+        server,
+        jobs,
+        config.REMINDER_WORKERS,
+        config.REMINDER_MAX_MESSAGES_PER_SECOND
+    )
+    print(
+        '%d workers, %g msg/s cap: %.2fs' % (
+            config.REMINDER_WORKERS,
+            config.REMINDER_MAX_MESSAGES_PER_SECOND,
+            limited
+        )
+    )
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main()
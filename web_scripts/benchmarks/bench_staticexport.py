@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Compare the time taken by a full rebuild of the static project lists
+(rendering every row) and by incremental rebuilds which only render the rows
+of projects whose revision changed.
+
+This fills the TEST database with synthetic projects (removing them again
+afterwards), so never point it at production. The pages are written to a
+temporary directory. Run from web_scripts/benchmarks:
+
+    python bench_staticexport.py [num_projects] [num_changed]
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import bench_readpath
+
+sys.path.insert(0, '..')
+
+import db
+import staticexport
+
+
+def change_projects(num_changed):
+    """Edit the descriptions of some of the synthetic projects, adding one
+    revision to each.
+    """
+    project_ids = [
+        project_id for project_id, revision_id
+        in db.get_project_list_revisions('approved')
+    ][:num_changed]
+    for project_id in project_ids:
+        project_info = db.get_all_info_for_project(project_id)
+        project_info['description'] += ' (edited)'
+        db.update_project(project_info, project_id, 'bench')
+
+
+def time_export(incremental):
+    start_time = time.time()
+    num_rendered = staticexport.export_static_pages(incremental=incremental)
+    return time.time() - start_time, num_rendered
+
+
+def main():
+    num_projects = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    num_changed = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    # The templates are loaded relative to web_scripts:
+    os.chdir('..')
+    static_dir = tempfile.mkdtemp()
+    staticexport.STATIC_DIR = static_dir
+
+    bench_readpath.cleanup()
+    bench_readpath.populate(num_projects)
+    try:
+        runs = [('Full rebuild', False, 0), ('Incremental, no change', True, 0)]
+        runs.append(
+            ('Incremental, %d changed' % num_changed, True, num_changed)
+        )
+        for label, incremental, num_to_change in runs:
+            change_projects(num_to_change)
+            elapsed, num_rendered = time_export(incremental)
+            print(
+                '%-26s %.3f s (%d rows rendered)' % (
+                    label, elapsed, num_rendered
+                )
+            )
+    finally:
+        bench_readpath.cleanup()
+        shutil.rmtree(static_dir)
+
+
+if __name__ == '__main__':
+    main()
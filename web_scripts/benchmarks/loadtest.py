@@ -0,0 +1,584 @@
+#!/usr/bin/env python
+"""Load test the CGI scripts the way Apache runs them: each request starts
+the script in a new process, with the request in the CGI environment
+variables (and, for forms, on stdin). A pool of workers sends a mix of
+requests and the throughput and latency of each kind are reported.
+
+The database must be reachable from the scripts, so the usual creds.py must
+exist, and the roster is read from PROJECTS_ROSTER (see --roster) if not on
+AFS. Mail goes to a local SMTP stand-in rather than outgoing.mit.edu. Run
+from web_scripts/benchmarks:
+
+    python loadtest.py --database sqlite:///loadtest.sqlite --populate 1000
+        [--requests 500] [--concurrency 8]
+        [--mix list=75,history=10,edit=12,approve=3] [--output report.json]
+
+--populate empties the database and fills it with the synthetic data set of
+synthetic.py, so it is only accepted for SQLite. Without it, the projects
+already in the database (e.g., a local MySQL copy) are used. Edits and
+approvals are made as the first admin in config.ADMIN_USERS. Each request
+also writes its phase timings to config.TIMING_LOG as usual, so
+latencyreport.py can break the latency down further. The static pages the
+writes export go to a temporary directory (PROJECTS_STATIC_DIR), not
+web_scripts/static.
+
+The scripts are run with python2 (see --python), which is what their
+"#!/usr/bin/env python" runs on scripts.mit.edu; they do not work on Python
+3. If every request of some kind fails, the timings mean nothing, so the
+errors are printed, no report is written, and the exit status is 1.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+sys.path.insert(0, '..')
+
+import config
+import latencyreport
+
+WEB_SCRIPTS_DIR = os.path.abspath('..')
+
+DEFAULT_MIX = 'list=75,history=10,edit=12,approve=3'
+
+# The interpreter the scripts are written for (see the module docstring):
+DEFAULT_PYTHON = 'python2'
+
+# Maps each kind of request to its script:
+SCRIPTS = {
+    'list': 'projectlist.py',
+    'json': 'projectjson.py',
+    'history': 'projecthistory.py',
+    'edit': 'performeditproject.py',
+    'approve': 'performapproveproject.py'
+}
+
+# Filled in by import_app_modules, once the database URL is set:
+db = None
+schema = None
+
+
+def import_app_modules():
+    """Import the database modules. schema connects on import, so this must
+    be called after PROJECTS_DATABASE_URL is set.
+    """
+    global db, schema
+    import db
+    import schema
+
+
+def parse_mix(value):
+    """Parse a --mix argument.
+
+    Parameters
+    ----------
+    value : str
+        Comma-separated kind=weight pairs, e.g., 'list=90,edit=10'.
+
+    Returns
+    -------
+    mix : list of tuple of (str, float)
+        Each kind of request and its weight.
+    """
+    mix = []
+    for pair in value.split(','):
+        kind, sep, weight = pair.partition('=')
+        if (kind not in SCRIPTS) or (len(sep) == 0):
+            raise argparse.ArgumentTypeError(
+                'Invalid mix entry %r; use kind=weight, with kind one of '
+                '%s.' % (pair, ', '.join(sorted(SCRIPTS.keys())))
+            )
+        mix.append((kind, float(weight)))
+    return mix
+
+
+def get_absolute_sqlite_url(url):
+    """Make the path in an SQLite URL absolute, as the scripts run in
+    web_scripts rather than here.
+    """
+    prefix = 'sqlite:///'
+    if url.startswith(prefix) and not url.startswith(prefix + '/'):
+        return prefix + os.path.abspath(url[len(prefix):])
+    return url
+
+
+def get_project_ids():
+    """Get the projects to make requests about.
+
+    Returns
+    -------
+    approved_ids : list of int
+        The approved projects, which are viewed and edited.
+    awaiting_ids : list of int
+        The projects awaiting approval, which are approved. If there are
+        none, the approved projects are approved again.
+    """
+    approved_ids = [
+        project['project_id']
+        for project in db.get_all_project_info('approved')
+    ]
+    awaiting_ids = [
+        project['project_id']
+        for project in db.get_all_project_info('awaiting_approval')
+    ]
+    if len(approved_ids) == 0:
+        raise ValueError('There are no approved projects to load test with.')
+    return approved_ids, awaiting_ids or approved_ids
+
+
+def make_form(project_info, project_id):
+    """Encode a project as the edit form would submit it.
+    """
+    form = [
+        ('project_id', str(project_id)),
+        ('name', project_info['name']),
+        ('description', project_info['description']),
+        ('status', project_info['status']),
+        (
+            'contacts',
+            ', '.join(contact['email'] for contact in project_info['contacts'])
+        ),
+        (
+            'comm_channels',
+            ', '.join(
+                channel['commchannel']
+                for channel in project_info['comm_channels']
+            )
+        )
+    ]
+    for index, link in enumerate(project_info['links']):
+        form.append(('link_%d' % index, link['link']))
+        form.append(('anchortext_%d' % index, link['anchortext'] or ''))
+    role_names = set()
+    for index, role in enumerate(project_info['roles']):
+        # The synthetic data can repeat role names, which the form rejects:
+        role_name = role['role']
+        if role_name in role_names:
+            role_name = '%s %d' % (role_name, index + 1)
+        role_names.add(role_name)
+        form.append(('role_name_%d' % index, role_name))
+        form.append(('role_description_%d' % index, role['description']))
+        form.append(('role_prereqs_%d' % index, role['prereq'] or ''))
+    return [
+        (
+            key,
+            value.encode('utf-8') if not isinstance(value, str) else value
+        )
+        for key, value in form
+    ]
+
+
+def make_plan(mix, num_requests, seed):
+    """Choose the requests to send, in order.
+
+    Returns
+    -------
+    plan : list of dict
+        Each request, with keys 'kind', 'script', 'user', 'query', and
+        'form' (the form fields to POST, or None for a GET).
+    """
+    rng = random.Random(seed)
+    approved_ids, awaiting_ids = get_project_ids()
+    admin = config.ADMIN_USERS[0]
+    project_info_cache = {}
+
+    def get_form(project_id):
+        if project_id not in project_info_cache:
+            project_info_cache[project_id] = db.get_all_info_for_project(
+                project_id
+            )
+        return make_form(project_info_cache[project_id], project_id)
+
+    total_weight = sum(weight for kind, weight in mix)
+    plan = []
+    for i in range(num_requests):
+        choice = rng.uniform(0, total_weight)
+        for kind, weight in mix:
+            choice -= weight
+            if choice <= 0:
+                break
+        request = {
+            'kind': kind,
+            'script': SCRIPTS[kind],
+            'user': None,
+            'query': '',
+            'form': None
+        }
+        if kind == 'list':
+            request['query'] = urlencode(
+                {'filter_by': rng.choice(['approved', 'active'])}
+            )
+        elif kind == 'history':
+            request['query'] = urlencode(
+                {'project_id': rng.choice(approved_ids)}
+            )
+        elif kind == 'edit':
+            request['user'] = admin
+            project_id = rng.choice(approved_ids)
+            # The form has no version, so an edit does not fail just because
+            # an earlier one changed the project. Edits of the same project
+            # which overlap can still conflict, as they would in production:
+            request['form'] = get_form(project_id)
+        elif kind == 'approve':
+            request['user'] = admin
+            project_id = awaiting_ids[i % len(awaiting_ids)]
+            request['form'] = get_form(project_id) + [
+                ('approval_action', 'approved'),
+                ('approver_comments', 'Load test.')
+            ]
+        plan.append(request)
+    return plan
+
+
+def get_cgi_environment(request, base_environment):
+    """Build the environment Apache would run a script with.
+    """
+    environment = dict(base_environment)
+    environment.update(
+        {
+            'GATEWAY_INTERFACE': 'CGI/1.1',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'SCRIPT_NAME': '/' + request['script'],
+            'REQUEST_URI': '/' + request['script'] + (
+                '?' + request['query'] if request['query'] else ''
+            ),
+            'QUERY_STRING': request['query'],
+            'REQUEST_METHOD': 'GET' if request['form'] is None else 'POST'
+        }
+    )
+    if request['user'] is not None:
+        environment['SSL_CLIENT_S_DN_Email'] = request['user'] + '@mit.edu'
+    else:
+        environment.pop('SSL_CLIENT_S_DN_Email', None)
+    return environment
+
+
+def send_request(request, base_environment, python):
+    """Run a script for one request.
+
+    Returns
+    -------
+    result : dict
+        With keys 'kind', 'seconds', 'ok', and 'error' (the end of stderr,
+        or of the page, if the request failed).
+    """
+    environment = get_cgi_environment(request, base_environment)
+    body = b''
+    if request['form'] is not None:
+        body = urlencode(request['form']).encode('ascii')
+        environment['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+        environment['CONTENT_LENGTH'] = str(len(body))
+    start_time = time.time()
+    process = subprocess.Popen(
+        [python, request['script']],
+        cwd=WEB_SCRIPTS_DIR,
+        env=environment,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    stdout, stderr = process.communicate(body)
+    seconds = time.time() - start_time
+
+    # Failure pages (e.g., for a form which does not validate) are served
+    # like any other page, so the page is checked as well as the exit status:
+    page = stdout.decode('utf-8', 'replace')
+    is_ok = (
+        (process.returncode == 0) and page.startswith('Content-type') and
+        ('<title>Failure</title>' not in page)
+    )
+    error = None
+    if not is_ok:
+        error = (
+            page if process.returncode == 0
+            else stderr.decode('utf-8', 'replace')
+        )[-2000:]
+    return {
+        'kind': request['kind'],
+        'seconds': seconds,
+        'ok': is_ok,
+        'error': error
+    }
+
+
+def get_python_version(python):
+    """Get the version of the interpreter the scripts are run with, or None
+    if it cannot be run.
+    """
+    try:
+        return subprocess.check_output(
+            [
+                python, '-c',
+                'import platform; print(platform.python_version())'
+            ]
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_failed_kinds(summary):
+    """Get the kinds of request which failed every time, and whose timings
+    are therefore meaningless.
+
+    Parameters
+    ----------
+    summary : dict
+        The output of summarize.
+
+    Returns
+    -------
+    failed_kinds : list of str
+        The kinds of request (or 'all') with an error rate of 100%.
+    """
+    return sorted(
+        kind for kind, kind_summary in summary.items()
+        if kind_summary['errors'] == kind_summary['requests']
+    )
+
+
+def summarize(results, elapsed):
+    """Compute the throughput and latency percentiles of each kind of
+    request, and of all of them.
+
+    Returns
+    -------
+    summary : dict
+        Maps each kind (and 'all') to a dict with keys 'requests', 'errors',
+        'per_second', 'max_seconds', and 'p50_seconds' etc.
+    """
+    by_kind = {'all': []}
+    for result in results:
+        by_kind.setdefault(result['kind'], []).append(result)
+        by_kind['all'].append(result)
+
+    summary = {}
+    for kind, kind_results in by_kind.items():
+        if len(kind_results) == 0:
+            continue
+        times = sorted(result['seconds'] for result in kind_results)
+        kind_summary = {
+            'requests': len(kind_results),
+            'errors': sum(1 for result in kind_results if not result['ok']),
+            'per_second': len(kind_results) / elapsed,
+            'max_seconds': times[-1]
+        }
+        for percentile in latencyreport.PERCENTILES:
+            kind_summary['p%d_seconds' % percentile] = \
+                latencyreport.get_percentile(times, percentile)
+        summary[kind] = kind_summary
+    return summary
+
+
+def print_summary(summary, elapsed):
+    header = '%-8s %8s %7s %8s' % ('kind', 'requests', 'errors', 'req/s') + \
+        ''.join(
+            '%10s' % ('p%d ms' % percentile)
+            for percentile in latencyreport.PERCENTILES
+        ) + '%10s' % 'max ms'
+    print(header)
+    print('-' * len(header))
+    for kind in sorted(summary.keys(), key=lambda kind: (kind == 'all', kind)):
+        kind_summary = summary[kind]
+        print(
+            '%-8s %8d %7d %8.1f' % (
+                kind, kind_summary['requests'], kind_summary['errors'],
+                kind_summary['per_second']
+            ) + ''.join(
+                '%10.1f' % (1000 * kind_summary['p%d_seconds' % percentile])
+                for percentile in latencyreport.PERCENTILES
+            ) + '%10.1f' % (1000 * kind_summary['max_seconds'])
+        )
+    print('%.2f s elapsed' % elapsed)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Load test the CGI scripts with concurrent requests.'
+    )
+    parser.add_argument(
+        '--database', required=True,
+        help='URL of the database the scripts use; SQLite paths are made '
+        'absolute'
+    )
+    parser.add_argument(
+        '--populate', type=int, metavar='NUM_PROJECTS',
+        help='empty the (SQLite) database and fill it with this many '
+        'synthetic projects first'
+    )
+    parser.add_argument(
+        '--revisions', type=int, default=5,
+        help='number of revisions of each synthetic project '
+        '(default: %(default)s)'
+    )
+    parser.add_argument(
+        '--requests', type=int, default=200,
+        help='number of requests to send (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=4,
+        help='number of requests in flight at once (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+        help='comma-separated weights of the kinds of request, out of %s '
+        '(default: %s)' % (', '.join(sorted(SCRIPTS.keys())), DEFAULT_MIX)
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='seed for choosing the requests (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--roster',
+        help='roster file to use instead of the one on AFS (PROJECTS_ROSTER)'
+    )
+    parser.add_argument(
+        '--smtp-latency', type=float, default=0.0,
+        help='delay before each reply of the SMTP stand-in, in seconds '
+        '(default: %(default)s)'
+    )
+    parser.add_argument(
+        '--python', default=DEFAULT_PYTHON,
+        help='interpreter to run the scripts with, which must be Python 2 '
+        '(default: %(default)s)'
+    )
+    parser.add_argument('--output', help='file to write the JSON report to')
+    args = parser.parse_args()
+    if args.database == 'sqlite://':
+        parser.error(
+            'An in-memory database cannot be shared with the scripts.'
+        )
+    if (args.populate is not None) and \
+            not args.database.startswith('sqlite:'):
+        parser.error(
+            'Only SQLite databases can be populated, as they are emptied.'
+        )
+    return args
+
+
+def main():
+    args = parse_args()
+    python_version = get_python_version(args.python)
+    if python_version is None:
+        sys.exit(
+            'Cannot run %s; use --python to give a Python 2 interpreter.' %
+            args.python
+        )
+    print(
+        'Running the scripts with %s (Python %s)' % (
+            args.python, python_version
+        )
+    )
+    os.environ['PROJECTS_DATABASE_URL'] = get_absolute_sqlite_url(
+        args.database
+    )
+    if args.roster is not None:
+        os.environ['PROJECTS_ROSTER'] = os.path.abspath(args.roster)
+
+    if args.populate is not None:
+        import synthetic
+        synthetic.import_app_modules()
+        start_time = time.time()
+        synthetic.generate(args.populate, args.revisions, args.seed)
+        print(
+            'Generated %d projects in %.1f s' % (
+                args.populate, time.time() - start_time
+            )
+        )
+    import_app_modules()
+
+    from bench_sendreminders import SlowSMTPServer
+    smtp_server = SlowSMTPServer(args.smtp_latency)
+    smtp_thread = threading.Thread(target=smtp_server.serve_forever)
+    smtp_thread.daemon = True
+    smtp_thread.start()
+    base_environment = dict(os.environ)
+    base_environment['PROJECTS_SMTP_HOST'] = smtp_server.server_address[0]
+    base_environment['PROJECTS_SMTP_PORT'] = str(
+        smtp_server.server_address[1]
+    )
+    # The writes re-export the static pages. Keep them out of
+    # web_scripts/static, which is what .htaccess serves:
+    static_dir = tempfile.mkdtemp(prefix='loadtest-static-')
+    base_environment['PROJECTS_STATIC_DIR'] = static_dir
+
+    plan = make_plan(args.mix, args.requests, args.seed)
+    # Release the database before the scripts start writing to it:
+    schema.session.close()
+
+    pool = ThreadPool(args.concurrency)
+    start_time = time.time()
+    try:
+        results = pool.map(
+            lambda request: send_request(
+                request, base_environment, args.python
+            ),
+            plan,
+            chunksize=1
+        )
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree(static_dir)
+    elapsed = time.time() - start_time
+    smtp_server.shutdown()
+    smtp_server.server_close()
+
+    summary = summarize(results, elapsed)
+    print_summary(summary, elapsed)
+    print('%d messages sent' % smtp_server.num_messages)
+    errors = {}
+    for result in results:
+        if (not result['ok']) and (result['kind'] not in errors):
+            errors[result['kind']] = result['error']
+    for kind, error in sorted(errors.items()):
+        print()
+        print('First failed %s request:' % kind)
+        print(error)
+
+    failed_kinds = get_failed_kinds(summary)
+    if len(failed_kinds) > 0:
+        print(
+            '\nEvery request of kind(s) %s failed, so the timings are '
+            'meaningless; no report was written. Check that %s (Python %s) '
+            'can run the scripts.' % (
+                ', '.join(failed_kinds), args.python, python_version
+            ),
+            file=sys.stderr
+        )
+        sys.exit(1)
+
+    if args.output is not None:
+        report = {
+            'created': datetime.datetime.now().isoformat(),
+            'python': python_version,
+            'database': args.database,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'mix': dict(args.mix),
+            'seed': args.seed,
+            'elapsed_seconds': elapsed,
+            'kinds': summary
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,507 @@
+#!/usr/bin/env python
+"""Benchmark the hot db operations and page renderers against a deterministic
+synthetic data set, at several scales, and write a report which can be
+compared across commits.
+
+The data set has num_projects projects, each with num_revisions revisions in
+the history tables and a realistic mix of statuses, contacts, roles, links,
+and comm channels. The same seed always generates the same data (for a given
+Python version). Every table is emptied before each scale is generated, so
+only SQLite databases are accepted. Run from web_scripts/benchmarks:
+
+    python synthetic.py [--scales 100,1000] [--revisions 5] [--repeats 5]
+        [--database sqlite:///synthetic.sqlite] [--output report.json]
+        [--compare old_report.json]
+
+The database defaults to an in-memory SQLite database.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, '..')
+
+# The data is dated relative to this, rather than to the current time, so
+# that the same projects are stale on every run:
+REFERENCE_TIME = datetime.datetime(2024, 1, 1)
+
+# Weights of the (status, approval) combinations:
+STATES = [
+    (('active', 'approved'), 70),
+    (('inactive', 'approved'), 15),
+    (('active', 'awaiting_approval'), 10),
+    (('inactive', 'rejected'), 5)
+]
+
+# Range of the number of entries of each auxiliary table in the first
+# revision. Later revisions may add more.
+ENTRY_COUNTS = {
+    'contacts': (1, 3),
+    'roles': (1, 3),
+    'links': (0, 3),
+    'comm_channels': (0, 2)
+}
+
+WORDS = [
+    'student', 'project', 'service', 'web', 'mail', 'archive', 'terminal',
+    'hosting', 'locker', 'kerberos', 'printing', 'wiki', 'chat', 'calendar',
+    'directory', 'mirror', 'linux', 'cluster', 'backup', 'history'
+]
+ROLE_NAMES = ['Maintainer', 'Developer', 'Designer', 'Sysadmin', 'Writer']
+
+# Filled in by import_app_modules, once the database URL is set:
+db = None
+schema = None
+projecthistory = None
+projectlist = None
+sqlstats = None
+strutils = None
+
+
+def import_app_modules():
+    """Import the modules under test. schema connects on import, so this must
+    be called after PROJECTS_DATABASE_URL is set.
+    """
+    global db, schema, projecthistory, projectlist, sqlstats, strutils
+    import db
+    import schema
+    import projecthistory
+    import projectlist
+    import sqlstats
+    import strutils
+
+    # projecthistory and projectlist enable cgitb on import, which would turn
+    # tracebacks into HTML:
+    sys.excepthook = sys.__excepthook__
+
+
+def make_sentence(rng, num_words):
+    return ' '.join(rng.choice(WORDS) for i in range(num_words)).capitalize()
+
+
+def make_entry(rng, key, name, index):
+    """Make one entry of an auxiliary table, in the format of the rows (less
+    project_id).
+    """
+    if key == 'contacts':
+        return {
+            'email': '%s-%d@mit.edu' % (name, index),
+            'type': 'primary' if index == 0 else 'secondary',
+            'index': index
+        }
+    elif key == 'roles':
+        return {
+            'role': rng.choice(ROLE_NAMES),
+            'description': make_sentence(rng, rng.randint(5, 30)) + '.',
+            'prereq': (
+                make_sentence(rng, rng.randint(3, 10)) + '.'
+                if rng.random() < 0.5 else None
+            ),
+            'index': index
+        }
+    elif key == 'links':
+        return {
+            'link': 'https://%s.mit.edu/%d' % (name, index),
+            'anchortext': (
+                make_sentence(rng, rng.randint(1, 4))
+                if rng.random() < 0.5 else None
+            ),
+            'index': index
+        }
+    else:
+        return {
+            'commchannel': '%s-discuss-%d@mit.edu' % (name, index),
+            'index': index
+        }
+
+
+def generate_project(rng, project_id, num_revisions):
+    """Generate one project and its history.
+
+    Returns
+    -------
+    rows : dict
+        Maps table names to lists of rows to insert.
+    """
+    rows = {table.name: [] for table in schema.SQLBase.metadata.sorted_tables}
+    name = 'synthetic-%05d' % project_id
+    choice = rng.uniform(0, sum(weight for state, weight in STATES))
+    for (status, approval), weight in STATES:
+        choice -= weight
+        if choice <= 0:
+            break
+    creator = 'user%d' % rng.randint(0, 999)
+    approver = 'approver%d' % rng.randint(0, 9) \
+        if approval != 'awaiting_approval' else None
+
+    entries = {
+        key: [
+            make_entry(rng, key, name, index)
+            for index in range(rng.randint(low, high))
+        ]
+        for key, (low, high) in ENTRY_COUNTS.items()
+    }
+    # Revisions are spread over the three years before REFERENCE_TIME:
+    timestamp = REFERENCE_TIME - datetime.timedelta(
+        days=rng.uniform(30 * num_revisions, 3 * 365)
+    )
+    project = {
+        'project_id': project_id,
+        'name': name,
+        'status': status,
+        'approval': approval,
+        'creator': creator,
+        'approver': approver,
+        'approver_comments': None
+    }
+    for revision_id in range(num_revisions):
+        project['description'] = make_sentence(rng, rng.randint(10, 60)) + '.'
+        if approver is not None:
+            project['approver_comments'] = make_sentence(
+                rng, rng.randint(0, 8)
+            )
+        actions = {}
+        if revision_id > 0:
+            # Each edit adds an entry to one of the auxiliary tables:
+            key = rng.choice(sorted(entries.keys()))
+            entries[key].append(
+                make_entry(rng, key, name, len(entries[key]))
+            )
+            actions[key, len(entries[key]) - 1] = 'create'
+            timestamp += datetime.timedelta(days=rng.uniform(1, 30))
+
+        history = {
+            'author': creator,
+            'revision_id': revision_id,
+            'timestamp': timestamp
+        }
+        rows['projectshistory'].append(
+            dict(
+                project, action='create' if revision_id == 0 else 'update',
+                **history
+            )
+        )
+        for key, model, match_key in db.AUXILIARY_TABLES:
+            history_table = db.CLASS_TO_HISTORY_CLASS_MAP[model].__tablename__
+            for index, entry in enumerate(entries[key]):
+                action = 'create' if revision_id == 0 else \
+                    actions.get((key, index), 'same')
+                rows[history_table].append(
+                    dict(entry, project_id=project_id, action=action, **history)
+                )
+
+    expires_at = timestamp + datetime.timedelta(
+        days=db.config.EXPIRATION_BY_NUM_DAYS
+    )
+    is_active = status == 'active'
+    rows['projects'].append(
+        dict(
+            project,
+            last_confirmed_at=None,
+            last_confirmed_by=None,
+            expires_at=expires_at if is_active else None,
+            next_reminder_at=(
+                db.get_next_reminder_at(expires_at, REFERENCE_TIME)
+                if is_active else None
+            ),
+            version=num_revisions
+        )
+    )
+    for key, model, match_key in db.AUXILIARY_TABLES:
+        rows[model.__tablename__].extend(
+            dict(entry, project_id=project_id) for entry in entries[key]
+        )
+    return rows
+
+
+def generate(num_projects, num_revisions, seed):
+    """Empty the database and fill it with synthetic projects.
+
+    Returns
+    -------
+    num_rows : dict
+        Maps table names to the number of rows inserted.
+    """
+    tables = schema.SQLBase.metadata.sorted_tables
+    for table in reversed(tables):
+        schema.session.execute(table.delete())
+
+    num_rows = {table.name: 0 for table in tables}
+    # Insert in batches to bound the memory used:
+    batch_size = 500
+    for first in range(0, num_projects, batch_size):
+        batch = {table.name: [] for table in tables}
+        for project_id in range(
+            first + 1, min(first + batch_size, num_projects) + 1
+        ):
+            # Each project has its own generator, so project i is the same at
+            # every scale:
+            rng = random.Random(seed * 1000003 + project_id)
+            for key, rows in generate_project(
+                rng, project_id, num_revisions
+            ).items():
+                batch[key].extend(rows)
+        for table in tables:
+            if len(batch[table.name]) > 0:
+                schema.session.execute(table.insert(), batch[table.name])
+                num_rows[table.name] += len(batch[table.name])
+    db.refresh_project_documents()
+    schema.session.commit()
+    num_rows['projectdocuments'] = num_projects
+    return num_rows
+
+
+def get_sample_project_id():
+    """Get the first approved project, which the single-project operations
+    run on.
+    """
+    return schema.session.query(schema.Projects.project_id).filter(
+        schema.Projects.approval == 'approved'
+    ).order_by(schema.Projects.project_id).first()[0]
+
+
+def prepare_nothing(project_id):
+    return ()
+
+
+def prepare_project_id(project_id):
+    return (project_id,)
+
+
+def prepare_update(project_id):
+    project_info = db.get_all_info_for_project(project_id)
+    project_info['description'] += ' Edited.'
+    return (project_info, project_id, 'bench')
+
+
+def prepare_project_list(project_id):
+    return (db.get_all_project_views('approved'),)
+
+
+def prepare_project_history(project_id):
+    project_history, has_older = db.get_project_history_page(project_id)
+    return (
+        strutils.decode_utf_nested_dict_list(project_history), project_id,
+        0, has_older
+    )
+
+
+def get_stale_projects():
+    return db.get_stale_projects(REFERENCE_TIME)
+
+
+def render_project_list(project_list):
+    return projectlist.render_project_list(
+        project_list, 'approved', None, None, None, '', ''
+    )
+
+
+def render_project_history(project_history, project_id, page, has_older):
+    return projecthistory.render_project_history(
+        project_history, project_id, None, None, '', '', page=page,
+        has_older=has_older
+    )
+
+
+def get_operations():
+    """Get the operations to time.
+
+    Returns
+    -------
+    operations : list of tuple of (str, callable, callable)
+        The name of each operation, a function which takes the sample project
+        ID and returns the arguments (the time taken by this is not
+        counted), and the function to time.
+    """
+    return [
+        (
+            'get_all_project_info', prepare_nothing,
+            lambda: db.get_all_project_info('approved')
+        ),
+        (
+            'get_all_info_for_project', prepare_project_id,
+            db.get_all_info_for_project
+        ),
+        ('get_project_history', prepare_project_id, db.get_project_history),
+        (
+            'get_project_history_page', prepare_project_id,
+            db.get_project_history_page
+        ),
+        ('get_stale_projects', prepare_nothing, get_stale_projects),
+        ('update_project', prepare_update, db.update_project),
+        ('render_project_list', prepare_project_list, render_project_list),
+        (
+            'render_project_history', prepare_project_history,
+            render_project_history
+        )
+    ]
+
+
+def time_operation(prepare, run, project_id, num_repeats):
+    """Time an operation, starting each repeat with empty caches.
+
+    Returns
+    -------
+    result : dict
+        The fastest and median times (in seconds) and the number of queries
+        made by one run.
+    """
+    times = []
+    for i in range(num_repeats):
+        db.reset_read_cache()
+        schema.session.expire_all()
+        schema.session.expunge_all()
+        args = prepare(project_id)
+        sqlstats.reset()
+        start_time = time.time()
+        run(*args)
+        times.append(time.time() - start_time)
+        num_queries = sqlstats.get_summary()['queries']
+        schema.session.commit()
+    times.sort()
+    return {
+        'best_seconds': times[0],
+        'median_seconds': times[len(times) // 2],
+        'queries': num_queries
+    }
+
+
+def get_commit():
+    """Get the current git commit, if there is one.
+    """
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], stderr=devnull
+            ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_reports(report, old_report):
+    """Print the change in time and queries of each operation against an
+    older report.
+    """
+    old_scales = {
+        scale['num_projects']: scale for scale in old_report['scales']
+    }
+    print()
+    print('Compared to %s:' % (old_report.get('commit') or 'old report'))
+    for scale in report['scales']:
+        old_scale = old_scales.get(scale['num_projects'])
+        if old_scale is None:
+            continue
+        for name, result in sorted(scale['operations'].items()):
+            old_result = old_scale['operations'].get(name)
+            if old_result is None:
+                continue
+            print(
+                '%6d %-26s %6.2fx time, %+d queries' % (
+                    scale['num_projects'], name,
+                    result['best_seconds'] /
+                    max(old_result['best_seconds'], 1e-9),
+                    result['queries'] - old_result['queries']
+                )
+            )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the db layer against synthetic data.'
+    )
+    parser.add_argument(
+        '--scales', default='100,1000',
+        help='comma-separated numbers of projects (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--revisions', type=int, default=5,
+        help='number of revisions of each project (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--repeats', type=int, default=5,
+        help='number of times to run each operation (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='seed for the generator (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--database', default='sqlite://',
+        help='SQLite URL of the database, which is emptied '
+        '(default: in memory)'
+    )
+    parser.add_argument('--output', help='file to write the JSON report to')
+    parser.add_argument(
+        '--compare', help='earlier JSON report to compare the results with'
+    )
+    args = parser.parse_args()
+    if not args.database.startswith('sqlite:'):
+        parser.error('Only SQLite databases can be used, as they are emptied.')
+    return args
+
+
+def main():
+    args = parse_args()
+    os.environ['PROJECTS_DATABASE_URL'] = args.database
+    os.environ['PROJECTS_DATABASE_MODE'] = 'test'
+    # The renderers build their sign-in links from the request, as for an
+    # anonymous visitor:
+    os.environ['HTTP_HOST'] = 'localhost'
+    os.environ['REQUEST_URI'] = '/projecthistory.py'
+    os.environ.pop('SSL_CLIENT_S_DN_Email', None)
+    import_app_modules()
+
+    report = {
+        'created': datetime.datetime.now().isoformat(),
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'sqlalchemy': db.sa.__version__,
+        'database': args.database,
+        'seed': args.seed,
+        'revisions': args.revisions,
+        'repeats': args.repeats,
+        'scales': []
+    }
+    # The templates are loaded relative to web_scripts:
+    os.chdir('..')
+    for num_projects in [int(scale) for scale in args.scales.split(',')]:
+        start_time = time.time()
+        num_rows = generate(num_projects, args.revisions, args.seed)
+        scale = {
+            'num_projects': num_projects,
+            'generate_seconds': time.time() - start_time,
+            'num_rows': num_rows,
+            'operations': {}
+        }
+        project_id = get_sample_project_id()
+        for name, prepare, run in get_operations():
+            result = time_operation(prepare, run, project_id, args.repeats)
+            scale['operations'][name] = result
+            print(
+                '%6d %-26s %.4f s (median %.4f s), %d queries' % (
+                    num_projects, name, result['best_seconds'],
+                    result['median_seconds'], result['queries']
+                )
+            )
+        report['scales'].append(scale)
+    os.chdir('benchmarks')
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare_reports(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""Verify the projectdocuments table (the serialized copy of each project
+used by the list views) against the normalized tables.
+
+Usage:
+
+    python checkdocuments.py [--repair]
+
+Prints each project whose document is missing or stale and exits with status
+1 if there are any. With --repair, the documents of those projects are
+rebuilt. Run with --repair once after the table is first created to populate
+it for the existing projects.
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+
+import db
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Verify the serialized project documents.'
+    )
+    parser.add_argument(
+        '--repair', action='store_true',
+        help='rebuild the documents which are missing or stale'
+    )
+    args = parser.parse_args()
+
+    problems = db.check_project_documents()
+    for project_id, problem in problems:
+        print('Project %d: document is %s' % (project_id, problem))
+
+    if len(problems) == 0:
+        print('All project documents are up to date.')
+    elif args.repair:
+        db.refresh_project_documents(
+            [project_id for project_id, problem in problems]
+        )
+        db.session.commit()
+        print('Rebuilt %d document(s).' % len(problems))
+    else:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
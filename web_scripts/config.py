@@ -1,3 +1,44 @@
+import os
+
 EXPIRATION_BY_NUM_DAYS = 365
+# Reminders are sent when a project is this many days from expiring:
+REMIND_DAYS_BEFORE_EXPIRATION = [30, 21, 14, 7, 3, 2, 1]
 ADMIN_USERS = ['huydai', 'markchil', 'innaavo', 'psvenk', 'alwinfy', 'aabreu', 'arjunjb', 'amigdal', 'turino14', 'nmorgan', 'rgabriel']
 APPROVER_USERS = []
+# Concurrency and rate limit for the emails sent by sendreminders.py:
+REMINDER_WORKERS = 4
+REMINDER_MAX_MESSAGES_PER_SECOND = 5
+# Number of revisions per page in projecthistory.py:
+HISTORY_PAGE_SIZE = 20
+# Whether the pages which just display projects (the lists, the history, and
+# the JSON feed) read from the read replica given by database_replica_url in
+# creds.py (or PROJECTS_DATABASE_REPLICA_URL). The forms and every write
+# always use the primary. If False, or no replica is given, everything uses
+# the primary database:
+USE_READ_REPLICA = True
+# Statements which one request executes more than this many times (e.g., a
+# query inside a loop) are reported by sqlstats:
+SQL_REPEAT_THRESHOLD = 5
+# File to append the per-request SQL statistics to, one JSON line per request.
+# Set to None to send them to stderr (i.e., the server's error log) instead:
+SQL_STATS_LOG = os.path.normpath(
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'logs',
+        'sqlstats.log'
+    )
+)
+# Where requestutils.run writes the profiles requested by admins (with
+# ?profile=1 or PROJECTS_PROFILE=1). This is next to web_scripts in the
+# locker, so the profiles are not served to visitors:
+PROFILE_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'profiles')
+)
+# Log of the phase timings of every request (see requestutils.run and
+# latencyreport.py), rotated when it reaches TIMING_LOG_MAX_BYTES:
+TIMING_LOG = os.path.normpath(
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'timing.log'
+    )
+)
+TIMING_LOG_MAX_BYTES = 1024 * 1024
+TIMING_LOG_BACKUP_COUNT = 5
@@ -6,6 +6,7 @@ import cgi
 import authutils
 import db
 import formutils
+import requestutils
 import strutils
 import templateutils
 import valutils
@@ -65,4 +66,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    requestutils.run(main)
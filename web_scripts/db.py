@@ -1,12 +1,237 @@
 #!/usr/bin/python
 
+import copy
 import datetime
+import functools
+import json
 
 import sqlalchemy as sa
+import sqlalchemy.orm.exc
+
+import config
+import diffutils
+import viewmodels
 from schema import \
-    session, Projects, ContactEmails, Roles, Links, CommChannels, \
-    ProjectsHistory, ContactEmailsHistory, RolesHistory, LinksHistory, \
-    CommChannelsHistory, CLASS_TO_HISTORY_CLASS_MAP
+    session, read_session, sqlengine, Projects, ContactEmails, Roles, Links, \
+    CommChannels, ProjectsHistory, ContactEmailsHistory, RolesHistory, \
+    LinksHistory, CommChannelsHistory, ReminderLog, ProjectDocuments, \
+    CLASS_TO_HISTORY_CLASS_MAP
+
+EXPIRATION_HORIZON = datetime.timedelta(days=config.EXPIRATION_BY_NUM_DAYS)
+
+# Projects columns which describe the project (and can be edited through the
+# form), and the superset which can be changed by updates in general:
+PROJECT_DETAIL_FIELDS = ['name', 'description', 'status']
+PROJECT_UPDATE_FIELDS = PROJECT_DETAIL_FIELDS + [
+    'approval', 'approver', 'approver_comments'
+]
+
+# The auxiliary tables, as tuples of (key in project_info, model, column to
+# match rows on when updating):
+AUXILIARY_TABLES = [
+    ('links', Links, 'link'),
+    ('comm_channels', CommChannels, 'commchannel'),
+    ('contacts', ContactEmails, 'email'),
+    ('roles', Roles, 'role')
+]
+
+# Loader options which fetch the auxiliary tables along with the projects
+# (or revisions) a query returns, using one extra query per table no matter
+# how many projects there are:
+PROJECT_GRAPH_OPTIONS = [
+    sa.orm.selectinload(getattr(Projects, key))
+    for key, model, match_key in AUXILIARY_TABLES
+]
+HISTORY_GRAPH_OPTIONS = [
+    sa.orm.selectinload(getattr(ProjectsHistory, key))
+    for key, model, match_key in AUXILIARY_TABLES
+]
+
+class ConcurrentEditError(RuntimeError):
+    """Raised when a project was changed by someone else between being read
+    and being written.
+    """
+    pass
+
+
+##############################################################
+# Request-Scoped Read Cache
+##############################################################
+
+# Each CGI request runs in its own process, so the module-level read cache
+# lives for exactly one request. The same project details are read many times
+# while handling a request (by valutils, authutils, performutils, and the
+# write path), so the getters decorated with cached_read only query the
+# database the first time. Every write through this module invalidates the
+# entries for the affected project. Code which writes to the database some
+# other way (or long-running scripts which need to see writes from other
+# processes) must call reset_read_cache.
+
+# Maps project_id (or None, for getters keyed by something other than a
+# project ID) to a dict mapping call signatures to results:
+_read_cache = {}
+read_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def reset_read_cache():
+    """Empty the read cache and reset the hit/miss counters.
+    """
+    _read_cache.clear()
+    read_cache_stats['hits'] = 0
+    read_cache_stats['misses'] = 0
+
+
+def invalidate_read_cache(project_id=None):
+    """Remove the cached reads for a project. Cached reads which are not keyed
+    by a project ID (e.g., looking up a project ID by name) are always
+    removed, as any write may affect them.
+
+    Parameters
+    ----------
+    project_id : int or str, optional
+        The project ID which was written to.
+    """
+    _read_cache.pop(None, None)
+    if project_id is not None:
+        _read_cache.pop(int(project_id), None)
+
+
+def get_read_cache_stats():
+    """Get the number of cache hits (i.e., queries avoided) and misses since
+    the cache was last reset.
+
+    Returns
+    -------
+    stats : dict
+        Dict with keys 'hits' and 'misses'.
+    """
+    return dict(read_cache_stats)
+
+
+def cached_read(project_arg=None, uncached_arg=None):
+    """Decorator which caches the results of a getter in the read cache.
+    Results are deep-copied on the way out, so callers are free to modify
+    them.
+
+    Parameters
+    ----------
+    project_arg : str, optional
+        The name of the argument which holds the project ID. If not provided,
+        the results are invalidated on every write.
+    uncached_arg : str, optional
+        The name of a boolean argument which, when true, bypasses the cache
+        (e.g., when raw SQL objects are requested).
+    """
+    def decorator(fn):
+        arg_names = fn.__code__.co_varnames[:fn.__code__.co_argcount]
+
+        def get_arg(name, args, kwargs):
+            idx = arg_names.index(name)
+            if idx < len(args):
+                return args[idx]
+            else:
+                return kwargs.get(name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if (uncached_arg is not None) and get_arg(
+                uncached_arg, args, kwargs
+            ):
+                return fn(*args, **kwargs)
+
+            if project_arg is None:
+                bucket_key = None
+            else:
+                try:
+                    bucket_key = int(get_arg(project_arg, args, kwargs))
+                except (TypeError, ValueError):
+                    return fn(*args, **kwargs)
+
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            bucket = _read_cache.setdefault(bucket_key, {})
+            if key in bucket:
+                read_cache_stats['hits'] += 1
+            else:
+                read_cache_stats['misses'] += 1
+                bucket[key] = fn(*args, **kwargs)
+            return copy.deepcopy(bucket[key])
+
+        return wrapper
+
+    return decorator
+
+
+##############################################################
+# Read Routing
+##############################################################
+
+# The read-only getters below can run on schema.read_session, which is bound
+# to the read replica if one is configured (see schema.py). Writes always go
+# to the primary through schema.session. The replica may lag behind, so it is
+# only used by processes which call allow_replica_reads: the pages which just
+# display projects (the lists, the history, and the JSON feed). Everything
+# else reads from the primary, as the forms carry the project's version and
+# the validation checks names and permissions, which must not be stale.
+#
+# Once a process has written anything (including through Core statements),
+# all of its reads go to the primary too, which is what a success page shown
+# after an edit expects. Reads made while the main session holds changes which
+# have not been flushed yet (e.g., looking up the ID of a project being added)
+# also go to the primary, so that they see them.
+
+_read_routing = {'replica_allowed': False, 'pinned_to_primary': False}
+
+
+def on_primary_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    if context.isinsert or context.isupdate or context.isdelete:
+        _read_routing['pinned_to_primary'] = True
+
+
+sa.event.listen(sqlengine, 'before_cursor_execute', on_primary_execute)
+
+
+def allow_replica_reads():
+    """Let the reads in this process go to the read replica (until it writes
+    anything). Only the pages which just display projects call this.
+    """
+    _read_routing['replica_allowed'] = True
+
+
+def pin_reads_to_primary():
+    """Send all further reads in this process to the primary database, e.g.,
+    in a script which must see the very latest data.
+    """
+    _read_routing['pinned_to_primary'] = True
+
+
+def reset_read_routing():
+    """Send reads to the primary again, as at the start of a process (mostly
+    useful for tests).
+    """
+    _read_routing['replica_allowed'] = False
+    _read_routing['pinned_to_primary'] = False
+
+
+def get_read_session():
+    """Get the session to use for a read-only query.
+
+    Returns
+    -------
+    session : sqlalchemy.orm.Session
+        schema.read_session (the replica, if there is one) if this process
+        has called allow_replica_reads and has not written to the database,
+        and the main session has no changes which are not flushed yet.
+        Otherwise the main session.
+    """
+    if (
+        (not _read_routing['replica_allowed']) or
+        _read_routing['pinned_to_primary'] or
+        session.new or session.dirty or session.deleted
+    ):
+        return session
+    return read_session
 
 
 ##############################################################
@@ -37,8 +262,9 @@ def make_history_entry(x, author_kerberos, action, revision_id):
     """
     x_history = CLASS_TO_HISTORY_CLASS_MAP[type(x)]()
     for key in x.__table__.columns.keys():
-        # Skip 'id' to allow auto-increment:
-        if key != 'id':
+        # Skip 'id' to allow auto-increment, and skip columns which are only
+        # tracked in the current state (e.g., Projects.last_confirmed_at):
+        if (key != 'id') and (key in x_history.__table__.columns):
             setattr(x_history, key, getattr(x, key))
 
     # Handle edge case of project creation, where project_id is not available
@@ -71,6 +297,7 @@ def db_add(x, author_kerberos, action, revision_id):
         The revision ID to associate with the action.
     """
     session.add(x)
+    invalidate_read_cache(x.project_id)
     x_history = make_history_entry(x, author_kerberos, action, revision_id)
     session.add(x_history)
 
@@ -94,100 +321,7 @@ def db_delete(x, author_kerberos, revision_id):
     x_history = make_history_entry(x, author_kerberos, 'delete', revision_id)
     session.delete(x)
     session.add(x_history)
-
-
-def db_update_record(current_x, new_x, author_kerberos, revision_id):
-    """Update the database to reflect new values for a given row.
-
-    Caller is responsible for committing the change. (This allows transactions
-    to succeed/fail together.)
-
-    Parameters
-    ----------
-    current_x : SQLBase
-        The current row.
-    new_x : SQLBase
-        The new row.
-    author_kerberos : str
-        The kerb of the author of the entry.
-    revision_id : int
-        The revision ID to associate with the action.
-    """
-    changed = False
-    for field in current_x.__table__.columns.keys():
-        if (
-            (field != 'id') and
-            (getattr(current_x, field) != getattr(new_x, field))
-        ):
-            setattr(current_x, field, getattr(new_x, field))
-            changed = True
-
-    action = 'update' if changed else 'same'
-    x_history = make_history_entry(
-        current_x, author_kerberos, action, revision_id
-    )
-    session.add(x_history)
-
-
-def make_key_idx_map(x, match_key):
-    """Make a dict which maps key strings to indices in the list of records.
-
-    Parameters
-    ----------
-    x : list of SQLBase
-        List of records.
-    match_key : str
-        The key to match records on.
-
-    Returns
-    -------
-    key_idx_map : dict
-        Dict mapping keys to indices in x.
-    """
-    return {getattr(x_val, match_key): idx for idx, x_val in enumerate(x)}
-
-
-def db_update(
-    current_x, new_x, match_key, author_kerberos, revision_id
-):
-    """Update a set of rows to match the new version, tracking
-    create/update/delete relationships.
-
-    Caller is responsible for committing the change. (This allows transactions
-    to succeed/fail together.)
-
-    Parameters
-    ----------
-    current_x : list of SQLBase
-        The rows as they currently existing in the database.
-    new_x : list of SQLBase
-        The new entries to put in the database.
-    match_key : str
-        The column to match on.
-    author_kerberos : str
-        The kerb of the author of the entry.
-    revision_id : int
-        The revision ID to associate with the action.
-    """
-    # Determine what the index of each key is:
-    current_key_idx_map = make_key_idx_map(current_x, match_key)
-    new_key_idx_map = make_key_idx_map(new_x, match_key)
-
-    # Delete the entries which appear in current_x but not new_x:
-    for key, idx in current_key_idx_map.items():
-        if key not in new_key_idx_map:
-            db_delete(current_x[idx], author_kerberos, revision_id)
-
-    # Add entries which appear in new_x but not current_x, update entries which
-    # appear in both:
-    for key, idx in new_key_idx_map.items():
-        if key in current_key_idx_map:
-            db_update_record(
-                current_x[current_key_idx_map[key]], new_x[idx],
-                author_kerberos, revision_id
-            )
-        else:
-            db_add(new_x[idx], author_kerberos, 'create', revision_id)
+    invalidate_read_cache(x.project_id)
 
 
 # Presumably we are doing this because of the "There's probably a way to do this with joins..."
@@ -208,7 +342,8 @@ def list_dict_convert(query_res_lst, remove_sql_ref=False):
     
     If `remove_sql_ref` set to True, the `_sa_instance_state`
     key automatically inserted by SQLalchemy will be removed 
-    from each list entry
+    from each list entry, as will any relationships which happen to be
+    loaded (i.e., only the columns are kept)
     
     Safety: For value safety this function gets the shallow copy
     of each entry's dictionary representation
@@ -219,14 +354,54 @@ def list_dict_convert(query_res_lst, remove_sql_ref=False):
     if remove_sql_ref:
         converted_lst = []
         for entry in query_res_lst:
-            entry_dict = get_dict(entry).copy()
-            entry_dict.pop('_sa_instance_state')
+            if isinstance(entry, dict):
+                entry_dict = entry.copy()
+                entry_dict.pop('_sa_instance_state', None)
+            else:
+                entry_dict = row_to_dict(entry)
             converted_lst.append(entry_dict)
         return converted_lst
     else:
         return [get_dict(r).copy() for r in query_res_lst]
 
 
+def row_to_dict(row):
+    """Convert a row object to a dict of its column values.
+
+    Parameters
+    ----------
+    row : SQLBase
+        The row object.
+
+    Returns
+    -------
+    row_dict : dict
+        Dict mapping column names to values.
+    """
+    return {key: getattr(row, key) for key in row.__table__.columns.keys()}
+
+
+def graph_to_dict(project):
+    """Convert a Projects or ProjectsHistory row, together with its auxiliary
+    table rows (see PROJECT_GRAPH_OPTIONS), to a project_info dict.
+
+    Parameters
+    ----------
+    project : Projects or ProjectsHistory
+        The row object.
+
+    Returns
+    -------
+    project_info : dict
+        The project info, with keys 'links', 'comm_channels', 'contacts', and
+        'roles' holding lists of dicts.
+    """
+    project_info = row_to_dict(project)
+    for key, model, match_key in AUXILIARY_TABLES:
+        project_info[key] = [row_to_dict(row) for row in getattr(project, key)]
+    return project_info
+
+
 def check_object_params(dict, req_params):
     """Check if a given dictionary has all of the keys defined in req_params (lst)
     """
@@ -239,64 +414,77 @@ def check_object_params(dict, req_params):
 
 # Get Functions
 
-def get_all_projects():
+def get_all_projects(options=()):
     """Get metadata all of projects in database
+
+    `options` are passed to the query (e.g., PROJECT_GRAPH_OPTIONS).
     """
-    return session.query(Projects).order_by(
+    return get_read_session().query(Projects).order_by(
         Projects.status, Projects.name
-    ).all()
+    ).options(*options).all()
 
 
-def get_all_approved_projects():
+def get_all_approved_projects(options=()):
     """Get data for all approved projects in the database.
+
+    `options` are passed to the query (e.g., PROJECT_GRAPH_OPTIONS).
     """
-    return session.query(Projects).filter_by(
+    return get_read_session().query(Projects).filter_by(
         approval='approved'
     ).order_by(
         Projects.status, Projects.name
-    ).all()
+    ).options(*options).all()
 
 
-def get_all_awaiting_approval_projects():
+def get_all_awaiting_approval_projects(options=()):
     """Get data for all projects which are awaiting approval.
+
+    `options` are passed to the query (e.g., PROJECT_GRAPH_OPTIONS).
     """
-    return session.query(Projects).filter_by(
+    return get_read_session().query(Projects).filter_by(
         approval='awaiting_approval'
     ).order_by(
         Projects.status, Projects.name
-    ).all()
+    ).options(*options).all()
 
 
-def get_active_approved_projects():
+def get_active_approved_projects(options=()):
     """Get data for all active projects in the database.
+
+    `options` are passed to the query (e.g., PROJECT_GRAPH_OPTIONS).
     """
-    return session.query(Projects).filter_by(
+    return get_read_session().query(Projects).filter_by(
         status='active', approval='approved'
     ).order_by(
         Projects.name
-    ).all()
+    ).options(*options).all()
 
 
-def get_inactive_approved_projects():
+def get_inactive_approved_projects(options=()):
     """Get data for all inactive projects in the database.
+
+    `options` are passed to the query (e.g., PROJECT_GRAPH_OPTIONS).
     """
-    return session.query(Projects).filter_by(
+    return get_read_session().query(Projects).filter_by(
         status='inactive', approval='approved'
     ).order_by(
         Projects.name
-    ).all()
+    ).options(*options).all()
 
 
-def get_projects_for_contact(email):
+def get_projects_for_contact(email, options=()):
     """Get all projects for which the given email is a contact.
+
+    `options` are passed to the query (e.g., PROJECT_GRAPH_OPTIONS).
     """
-    return session.query(Projects).join(
+    return get_read_session().query(Projects).join(
         ContactEmails, Projects.project_id == ContactEmails.project_id
     ).filter(ContactEmails.email == email).order_by(
         Projects.status, Projects.name
-    ).all()
+    ).options(*options).all()
 
 
+@cached_read(project_arg='project_id', uncached_arg='raw_input')
 def get_project_info(
     model, project_id, raw_input=False, sort_by_index=False, revision_id=None,
     filter_deleted=True
@@ -320,7 +508,9 @@ def get_project_info(
     
     Useful for building higher-level queries
     """
-    query = session.query(model).filter_by(project_id=project_id)
+    # Rows which are going to be modified must come from the primary:
+    query_session = session if raw_input else get_read_session()
+    query = query_session.query(model).filter_by(project_id=project_id)
 
     if revision_id is not None:
         query = query.filter_by(revision_id=revision_id)
@@ -449,36 +639,64 @@ def get_comm_revision(
         )
 
 
+@cached_read()
 def get_project_id(name):
     """Get the ID of a project with `name`, if it exists
     Otherwise returns None
     """
-    return session.query(Projects.project_id).filter_by(name=name).scalar()
+    return get_read_session().query(Projects.project_id).filter_by(
+        name=name
+    ).scalar()
+
+
+def get_project_ids_by_name(names):
+    """Look up the IDs of several projects by name, using a single query.
+    Names are compared without regard to case, as the database does.
+
+    Parameters
+    ----------
+    names : list of str
+        The project names.
+
+    Returns
+    -------
+    project_ids : dict
+        Maps the lowercased name of each project which exists to its ID.
+    """
+    if len(names) == 0:
+        return {}
+    rows = get_read_session().query(Projects.name, Projects.project_id).filter(
+        Projects.name.in_(names)
+    ).all()
+    return {row.name.lower(): row.project_id for row in rows}
 
 
+@cached_read(project_arg='project_id')
 def get_project_name(project_id):
     """Get the name of the project with the given project_id, if it exists.
     Otherwise returns None.
     """
-    return session.query(
+    return get_read_session().query(
         Projects.name
     ).filter_by(project_id=project_id).scalar()
 
 
+@cached_read(project_arg='project_id')
 def get_project_creator(project_id):
     """Get the kerberos of the creator of the project with the given
     project_id, if it exists. Otherwise returns None.
     """
-    return session.query(
+    return get_read_session().query(
         Projects.creator
     ).filter_by(project_id=project_id).scalar()
 
 
+@cached_read(project_arg='project_id')
 def get_project_approval_status(project_id):
     """Get the approval status of the project with the given project_id, if it
     exists. Otherwise returns None.
     """
-    return session.query(
+    return get_read_session().query(
         Projects.approval
     ).filter_by(project_id=project_id).scalar()
 
@@ -543,195 +761,1278 @@ def enrich_project_with_revision_info(project_info, revision_id=None):
     return project_info
 
 
-def get_all_info_for_project(project_id, revision_id=None):
-    """Get all of the information for a specific project.
+# Core read path
+
+# Read-only views (the project list, the JSON export, and the info pages) do
+# not need ORM objects, so they select plain rows with the statements below.
+# The statements are built once, and execute_read compiles each one only the
+# first time it is run in a process. Writes still go through the ORM.
+
+_compiled_cache = {}
+
+PROJECT_LIST_FILTERS = {
+    'approved': Projects.approval == 'approved',
+    'active': sa.and_(
+        Projects.status == 'active', Projects.approval == 'approved'
+    ),
+    'inactive': sa.and_(
+        Projects.status == 'inactive', Projects.approval == 'approved'
+    ),
+    'awaiting_approval': Projects.approval == 'awaiting_approval',
+    'contact': Projects.project_id.in_(
+        sa.select([ContactEmails.project_id]).where(
+            ContactEmails.email == sa.bindparam('email')
+        )
+    )
+}
+PROJECT_LIST_STATEMENTS = {
+    filter_method: sa.select([Projects.__table__]).where(
+        condition
+    ).order_by(Projects.status, Projects.name)
+    for filter_method, condition in PROJECT_LIST_FILTERS.items()
+}
+PROJECTS_BY_ID_STATEMENT = sa.select([Projects.__table__]).where(
+    Projects.project_id.in_(sa.bindparam('project_ids', expanding=True))
+)
+AUXILIARY_ROWS_STATEMENTS = {
+    key: sa.select([model.__table__]).where(
+        model.project_id.in_(sa.bindparam('project_ids', expanding=True))
+    ).order_by(model.project_id, model.index)
+    for key, model, match_key in AUXILIARY_TABLES
+}
+_current_revisions = sa.select(
+    [
+        ProjectsHistory.project_id,
+        sa.func.max(ProjectsHistory.revision_id).label('revision_id')
+    ]
+).where(
+    ProjectsHistory.project_id.in_(
+        sa.bindparam('project_ids', expanding=True)
+    )
+).group_by(ProjectsHistory.project_id).alias('current_revisions')
+CURRENT_REVISIONS_STATEMENT = sa.select([_current_revisions])
+REVISION_INFO_STATEMENT = sa.select(
+    [
+        ProjectsHistory.project_id,
+        ProjectsHistory.timestamp,
+        ProjectsHistory.author
+    ]
+).select_from(
+    ProjectsHistory.__table__.join(
+        _current_revisions,
+        sa.and_(
+            ProjectsHistory.project_id == _current_revisions.c.project_id,
+            ProjectsHistory.revision_id == _current_revisions.c.revision_id
+        )
+    )
+)
+
+
+DOCUMENT_LIST_STATEMENTS = {
+    filter_method: sa.select(
+        [Projects.project_id, ProjectDocuments.document]
+    ).select_from(
+        Projects.__table__.outerjoin(ProjectDocuments.__table__)
+    ).where(condition).order_by(Projects.status, Projects.name)
+    for filter_method, condition in PROJECT_LIST_FILTERS.items()
+}
+REVISION_LIST_STATEMENTS = {
+    filter_method: sa.select(
+        [Projects.project_id, ProjectDocuments.revision_id]
+    ).select_from(
+        Projects.__table__.outerjoin(ProjectDocuments.__table__)
+    ).where(condition).order_by(Projects.status, Projects.name)
+    for filter_method, condition in PROJECT_LIST_FILTERS.items()
+}
+ALL_PROJECT_IDS_STATEMENT = sa.select([Projects.project_id]).order_by(
+    Projects.project_id
+)
+DOCUMENTS_BY_ID_STATEMENT = sa.select([ProjectDocuments.__table__]).where(
+    ProjectDocuments.project_id.in_(
+        sa.bindparam('project_ids', expanding=True)
+    )
+)
+_project_id_matches = Projects.project_id == sa.bindparam('project_id')
+VALIDATION_FACTS_STATEMENT = sa.select(
+    [
+        sa.select([sa.func.count()]).select_from(
+            Projects.__table__
+        ).where(_project_id_matches).as_scalar().label('num_projects'),
+        sa.select([Projects.name]).where(
+            _project_id_matches
+        ).as_scalar().label('name'),
+        sa.select([Projects.status]).where(
+            _project_id_matches
+        ).as_scalar().label('status'),
+        sa.select([Projects.creator]).where(
+            _project_id_matches
+        ).as_scalar().label('creator'),
+        sa.select([Projects.project_id]).where(
+            Projects.name == sa.bindparam('name')
+        ).limit(1).as_scalar().label('name_project_id'),
+        sa.select([ContactEmails.email]).where(
+            sa.and_(
+                ContactEmails.project_id == sa.bindparam('project_id'),
+                ContactEmails.email == sa.bindparam('contact_email')
+            )
+        ).limit(1).as_scalar().label('contact_email'),
+        sa.select([sa.func.count()]).select_from(
+            ProjectsHistory.__table__
+        ).where(
+            sa.and_(
+                ProjectsHistory.project_id == sa.bindparam('project_id'),
+                ProjectsHistory.revision_id == sa.bindparam('revision_id'),
+                ProjectsHistory.action != 'delete'
+            )
+        ).as_scalar().label('num_revisions')
+    ]
+)
+
+
+def execute_read(statement, **params):
+    """Execute one of the statements above in the current transaction,
+    reusing its compiled form.
 
     Parameters
     ----------
-    project_id : str or int
-        The project ID to get information for.
+    statement : sqlalchemy.sql.Select
+        The statement. This must be a module-level constant, as the compiled
+        form is cached per statement object.
+    **params : dict
+        The values of the bound parameters.
 
     Returns
     -------
-    project_info : dict
-        The information on the specified project.
+    rows : list of sqlalchemy.engine.RowProxy
+        The result rows.
     """
-    project_info = get_project_revision(project_id, revision_id=revision_id)
-    if len(project_info) == 0:
-        return None
-    project_info = project_info[0]
-    project_info = enrich_project_with_auxiliary_fields(
-        project_info, revision_id=revision_id
+    connection = get_read_session().connection().execution_options(
+        compiled_cache=_compiled_cache
     )
-
-    return project_info
+    return connection.execute(statement, **params).fetchall()
 
 
-def get_all_project_info(filter_method='active', contact_email=None):
-    """Get the information for all projects.
+def get_validation_facts(
+    project_id=None, name=None, revision_id=None, contact_email=None
+):
+    """Get everything from the database which validating a form may need,
+    using a single query. See valutils.ValidationContext.
 
     Parameters
     ----------
-    filter_method : {'all', 'active', 'inactive'}, optional
-        The filter to apply. Options are:
-        * 'approved': return all approved projects
-        * 'active' (default): return all active approved projects
-        * 'inactive': return all inactive approved projects
-        * 'contact': return projects for which the given contact_email is in
-            the contact list.
-        * 'awaiting_approval': return projects which are awaiting approval.
+    project_id : int, optional
+        The project being validated.
+    name : str, optional
+        The proposed project name.
+    revision_id : int, optional
+        The revision of the project being validated.
     contact_email : str, optional
-        The contact email to filter on when filter_method is 'contact'.
+        The email address to look for among the project's contacts.
+
+    Returns
+    -------
+    facts : dict
+        With keys 'num_projects' (the number of projects with project_id),
+        'name', 'status', and 'creator' (of that project, or None if there is
+        none), 'name_project_id' (the ID of the project called name, or None
+        if there is none), 'contact_email' (the contact of the project which
+        matches contact_email, or None), and 'num_revisions' (the number of
+        undeleted revisions with revision_id). The facts for arguments which
+        are not given are empty.
+    """
+    row = execute_read(
+        VALIDATION_FACTS_STATEMENT,
+        project_id=project_id,
+        name=name,
+        revision_id=revision_id,
+        contact_email=contact_email
+    )[0]
+    return dict(row.items())
+
+
+def get_revision_info(project_ids):
+    """Get information on the most recent revision of each of several
+    projects, using a single query.
+
+    Parameters
+    ----------
+    project_ids : list of int
+        The project IDs.
+
+    Returns
+    -------
+    revision_info_map : dict
+        Maps each project ID which has a history to a dict with keys
+        'timestamp' and 'editor', as in enrich_project_with_revision_info.
+    """
+    if len(project_ids) == 0:
+        return {}
+
+    return {
+        row.project_id: {'timestamp': row.timestamp, 'editor': row.author}
+        for row in execute_read(
+            REVISION_INFO_STATEMENT, project_ids=list(project_ids)
+        )
+    }
+
+
+def rows_to_dicts(project_rows):
+    """Convert rows from the projects table to full project_info dicts, using
+    one query per auxiliary table plus one for the revision info.
+
+    Parameters
+    ----------
+    project_rows : list of sqlalchemy.engine.RowProxy
+        The rows.
+
+    Returns
+    -------
+    project_list : list of dict
+        The project info for each project, in the same order, in the same
+        format as get_all_info_for_project.
+    """
+    project_ids = [row.project_id for row in project_rows]
+    auxiliary_rows = get_auxiliary_rows(project_ids)
+    revision_info_map = get_revision_info(project_ids)
+
+    project_list = []
+    for row in project_rows:
+        project_info = dict(row)
+        for key, model, match_key in AUXILIARY_TABLES:
+            project_info[key] = [
+                dict(entry)
+                for entry in auxiliary_rows[key].get(row.project_id, [])
+            ]
+        project_info['revision_info'] = revision_info_map[row.project_id]
+        project_list.append(project_info)
+    return project_list
+
+
+def rows_to_views(project_rows):
+    """Convert rows from the projects table to viewmodels.Project views, using
+    one query per auxiliary table plus one for the revision info.
+
+    Parameters
+    ----------
+    project_rows : list of sqlalchemy.engine.RowProxy
+        The rows.
+
+    Returns
+    -------
+    project_list : list of viewmodels.Project
+        The view of each project, in the same order.
+    """
+    project_ids = [row.project_id for row in project_rows]
+    auxiliary_rows = get_auxiliary_rows(project_ids)
+    revision_info_map = get_revision_info(project_ids)
+
+    return [
+        viewmodels.make_project(
+            row,
+            {
+                key: auxiliary_rows[key].get(row.project_id, [])
+                for key, model, match_key in AUXILIARY_TABLES
+            },
+            revision_info_map[row.project_id]
+        )
+        for row in project_rows
+    ]
+
+
+def get_auxiliary_rows(project_ids):
+    """Get the rows of each auxiliary table which belong to several projects,
+    using one query per table.
+
+    Parameters
+    ----------
+    project_ids : list of int
+        The project IDs.
+
+    Returns
+    -------
+    auxiliary_rows : dict
+        Maps the keys of AUXILIARY_TABLES (e.g., 'links') to dicts mapping
+        project IDs to lists of rows, in index order. Projects with no rows in
+        a table are left out.
+    """
+    auxiliary_rows = {}
+    for key, model, match_key in AUXILIARY_TABLES:
+        auxiliary_rows[key] = {}
+        if len(project_ids) == 0:
+            continue
+        for row in execute_read(
+            AUXILIARY_ROWS_STATEMENTS[key], project_ids=list(project_ids)
+        ):
+            auxiliary_rows[key].setdefault(row.project_id, []).append(row)
+    return auxiliary_rows
+
+
+def projects_to_dicts(projects):
+    """Convert Projects rows (loaded with PROJECT_GRAPH_OPTIONS) to full
+    project_info dicts, including the revision info.
+
+    Parameters
+    ----------
+    projects : list of Projects
+        The row objects.
 
     Returns
     -------
     project_list : list of dict
-        List of all projects.
-    """
-    if filter_method == 'approved':
-        projects = get_all_approved_projects()
-    elif filter_method == 'active':
-        projects = get_active_approved_projects()
-    elif filter_method == 'inactive':
-        projects = get_inactive_approved_projects()
-    elif filter_method == 'contact':
-        projects = get_projects_for_contact(contact_email)
-    elif filter_method == 'awaiting_approval':
-        projects = get_all_awaiting_approval_projects()
+        The project info for each project, in the same order.
+    """
+    revision_info_map = get_revision_info(
+        [project.project_id for project in projects]
+    )
+    project_list = []
+    for project in projects:
+        project_info = graph_to_dict(project)
+        project_info['revision_info'] = revision_info_map[project.project_id]
+        project_list.append(project_info)
+    return project_list
+
+
+def get_all_info_for_projects(project_ids):
+    """Get all of the information for several projects, using a constant
+    number of queries regardless of the number of projects.
+
+    Parameters
+    ----------
+    project_ids : list of int
+        The project IDs to get information for.
+
+    Returns
+    -------
+    project_info_map : dict
+        Maps each project ID which exists to its information, in the same
+        format as get_all_info_for_project.
+    """
+    if len(project_ids) == 0:
+        return {}
+
+    project_rows = execute_read(
+        PROJECTS_BY_ID_STATEMENT, project_ids=list(project_ids)
+    )
+    return {
+        project_info['project_id']: project_info
+        for project_info in rows_to_dicts(project_rows)
+    }
+
+
+def get_project_views(project_ids):
+    """Get views of several projects, for the read-only renderers, using a
+    constant number of queries regardless of the number of projects.
+
+    Parameters
+    ----------
+    project_ids : list of int
+        The project IDs.
+
+    Returns
+    -------
+    project_view_map : dict
+        Maps each project ID which exists to its viewmodels.Project view.
+    """
+    if len(project_ids) == 0:
+        return {}
+
+    project_rows = execute_read(
+        PROJECTS_BY_ID_STATEMENT, project_ids=list(project_ids)
+    )
+    return {
+        project.project_id: project
+        for project in rows_to_views(project_rows)
+    }
+
+
+@cached_read(project_arg='project_id')
+def get_all_info_for_project(project_id, revision_id=None):
+    """Get all of the information for a specific project.
+
+    Parameters
+    ----------
+    project_id : str or int
+        The project ID to get information for.
+
+    Returns
+    -------
+    project_info : dict
+        The information on the specified project.
+    """
+    if revision_id is None:
+        project_info_map = get_all_info_for_projects([project_id])
+        if len(project_info_map) == 0:
+            return None
+        return list(project_info_map.values())[0]
+
+    project_info = get_project_revision(project_id, revision_id=revision_id)
+    if len(project_info) == 0:
+        return None
+    project_info = project_info[0]
+    project_info = enrich_project_with_auxiliary_fields(
+        project_info, revision_id=revision_id
+    )
+
+    return project_info
+
+
+def get_all_project_info(filter_method='active', contact_email=None):
+    """Get the information for all projects.
+
+    Parameters
+    ----------
+    filter_method : {'all', 'active', 'inactive'}, optional
+        The filter to apply. Options are:
+        * 'approved': return all approved projects
+        * 'active' (default): return all active approved projects
+        * 'inactive': return all inactive approved projects
+        * 'contact': return projects for which the given contact_email is in
+            the contact list.
+        * 'awaiting_approval': return projects which are awaiting approval.
+    contact_email : str, optional
+        The contact email to filter on when filter_method is 'contact'.
+
+    Returns
+    -------
+    project_list : list of dict
+        List of all projects. The SCHEDULING_COLUMNS are not included.
+    """
+    return load_project_documents(filter_method, contact_email)
+
+
+def get_all_project_views(filter_method='active', contact_email=None):
+    """Get views of all projects, for the read-only renderers. This takes the
+    same arguments as get_all_project_info.
+
+    Returns
+    -------
+    project_list : list of viewmodels.Project
+        List of all projects. The SCHEDULING_COLUMNS, which are not in the
+        documents, are None.
+    """
+    project_list = []
+    for project_info in load_project_documents(filter_method, contact_email):
+        for key in SCHEDULING_COLUMNS:
+            project_info[key] = None
+        project_list.append(
+            viewmodels.make_project(
+                project_info, project_info, project_info['revision_info']
+            )
+        )
+    return project_list
+
+
+def get_list_params(filter_method, contact_email=None):
+    """Get the bound parameters for the statements for a project list.
+    """
+    if filter_method not in PROJECT_LIST_FILTERS:
+        raise ValueError('Unknown status filter!')
+
+    params = {}
+    if filter_method == 'contact':
+        params['email'] = contact_email
+    return params
+
+
+def select_project_list(filter_method, contact_email=None):
+    """Select the rows of the projects table for a project list. See
+    get_all_project_info for the arguments.
+
+    Returns
+    -------
+    project_rows : list of sqlalchemy.engine.RowProxy
+        The rows.
+    """
+    return execute_read(
+        PROJECT_LIST_STATEMENTS[filter_method],
+        **get_list_params(filter_method, contact_email)
+    )
+
+
+# Project documents
+
+# Datetimes are stored as str() formats them, which is how the JSON feed has
+# always shown them, so that documents can go into the feed as they are. The
+# microseconds are left out when they are zero.
+DOCUMENT_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+DOCUMENT_DATETIME_FORMAT_NO_MICROSECONDS = '%Y-%m-%d %H:%M:%S'
+
+# Projects columns which only drive confirmation, reminders, and concurrency
+# control. They are not public (the documents go into the JSON feed as they
+# are), and writes which only change them leave the documents alone:
+SCHEDULING_COLUMNS = [
+    'last_confirmed_at', 'last_confirmed_by', 'expires_at',
+    'next_reminder_at', 'version'
+]
+
+# Projects columns which go into the documents:
+DOCUMENT_COLUMNS = [
+    key for key in Projects.__table__.columns.keys()
+    if key not in SCHEDULING_COLUMNS
+]
+
+# Document columns which hold datetimes, which have to be restored when a
+# document is loaded:
+DATETIME_COLUMNS = [
+    key for key in DOCUMENT_COLUMNS
+    if isinstance(Projects.__table__.columns[key].type, sa.DateTime)
+]
+
+
+def format_document_value(value):
+    """Convert the values json cannot serialize (i.e., datetimes) for
+    serialize_document.
+    """
+    if isinstance(value, datetime.datetime):
+        return str(value)
+    raise TypeError('Cannot serialize %r!' % (value,))
+
+
+def get_document_info(project_info):
+    """Get the public part of a project's info, which is what goes into its
+    document: everything but the SCHEDULING_COLUMNS.
+
+    Parameters
+    ----------
+    project_info : dict
+        The project info, in the format of get_all_info_for_project.
+
+    Returns
+    -------
+    document_info : dict
+        A shallow copy of the project info without the SCHEDULING_COLUMNS.
+    """
+    return {
+        key: value for key, value in project_info.items()
+        if key not in SCHEDULING_COLUMNS
+    }
+
+
+def serialize_document(project_info):
+    """Serialize a project's info for the projectdocuments table. Only the
+    public fields are kept (see get_document_info).
+
+    Parameters
+    ----------
+    project_info : dict
+        The project info, in the format of get_all_info_for_project.
+
+    Returns
+    -------
+    document : str
+        The JSON document. Serializing the same info always gives the same
+        document.
+    """
+    return json.dumps(
+        get_document_info(project_info), sort_keys=True,
+        default=format_document_value
+    )
+
+
+def parse_document_datetime(value):
+    if value is None:
+        return None
+    if '.' in value:
+        return datetime.datetime.strptime(value, DOCUMENT_DATETIME_FORMAT)
+    return datetime.datetime.strptime(
+        value, DOCUMENT_DATETIME_FORMAT_NO_MICROSECONDS
+    )
+
+
+def deserialize_document(document):
+    """Load a document from the projectdocuments table. This is the inverse
+    of serialize_document.
+
+    Parameters
+    ----------
+    document : str
+        The JSON document.
+
+    Returns
+    -------
+    project_info : dict
+        The project info.
+    """
+    project_info = json.loads(document)
+    for key in DATETIME_COLUMNS:
+        project_info[key] = parse_document_datetime(project_info[key])
+    project_info['revision_info']['timestamp'] = parse_document_datetime(
+        project_info['revision_info']['timestamp']
+    )
+    return project_info
+
+
+def build_project_documents(project_ids):
+    """Build the documents for several projects from the normalized tables.
+
+    Parameters
+    ----------
+    project_ids : list of int
+        The project IDs.
+
+    Returns
+    -------
+    document_rows : dict
+        Maps each project ID which exists to a dict with keys 'project_id',
+        'revision_id', and 'document'.
+    """
+    if len(project_ids) == 0:
+        return {}
+
+    project_list = rows_to_dicts(
+        execute_read(PROJECTS_BY_ID_STATEMENT, project_ids=list(project_ids))
+    )
+    revision_ids = {
+        row.project_id: row.revision_id
+        for row in execute_read(
+            CURRENT_REVISIONS_STATEMENT, project_ids=list(project_ids)
+        )
+    }
+    return {
+        project_info['project_id']: {
+            'project_id': project_info['project_id'],
+            'revision_id': revision_ids[project_info['project_id']],
+            'document': serialize_document(project_info)
+        }
+        for project_info in project_list
+    }
+
+
+def refresh_project_documents(project_ids=None):
+    """Rewrite the documents for several projects from the normalized tables.
+    Pending changes are flushed first, so this can be called at the end of a
+    write, before committing. Caller is responsible for committing the
+    change.
+
+    Parameters
+    ----------
+    project_ids : list of int, optional
+        The project IDs. Default is to rewrite the documents for every
+        project.
+    """
+    if project_ids is None:
+        project_ids = [
+            row.project_id for row in execute_read(ALL_PROJECT_IDS_STATEMENT)
+        ]
+    project_ids = [int(project_id) for project_id in project_ids]
+    if len(project_ids) == 0:
+        return
+
+    session.flush()
+    document_rows = build_project_documents(project_ids)
+    session.execute(
+        ProjectDocuments.__table__.delete().where(
+            ProjectDocuments.project_id.in_(project_ids)
+        )
+    )
+    if len(document_rows) > 0:
+        session.execute(
+            ProjectDocuments.__table__.insert(), list(document_rows.values())
+        )
+
+
+def load_project_documents(filter_method, contact_email=None):
+    """Load the project info for a project list from the projectdocuments
+    table, with one row per project. Projects which do not have a document
+    yet (e.g., because they were added before the table was) are built from
+    the normalized tables instead.
+
+    See get_all_project_info for the arguments.
+
+    Returns
+    -------
+    project_list : list of dict
+        The project info for each project.
+    """
+    return [
+        deserialize_document(document)
+        for document in get_project_list_documents(
+            filter_method, contact_email
+        )
+    ]
+
+
+def get_project_list_documents(filter_method, contact_email=None):
+    """Get the serialized documents for a project list, without loading them.
+    See get_all_project_info for the arguments.
+
+    Returns
+    -------
+    documents : list of str
+        The JSON document of each project, in the order of the list.
+        Documents for projects which do not have one yet are built from the
+        normalized tables.
+    """
+    rows = execute_read(
+        DOCUMENT_LIST_STATEMENTS[filter_method],
+        **get_list_params(filter_method, contact_email)
+    )
+    missing_ids = [row.project_id for row in rows if row.document is None]
+    if len(missing_ids) > 0:
+        missing_map = get_all_info_for_projects(missing_ids)
+    else:
+        missing_map = {}
+
+    return [
+        serialize_document(missing_map[row.project_id])
+        if row.document is None else row.document
+        for row in rows
+    ]
+
+
+def get_project_list_revisions(filter_method, contact_email=None):
+    """Get the current revision of each project in a project list, without
+    loading the projects themselves. See get_all_project_info for the
+    arguments.
+
+    Returns
+    -------
+    revisions : list of tuple of (int, int or None)
+        The project ID and revision ID of each project, in the order of the
+        list. The revision ID is None for projects which do not have a
+        document yet.
+    """
+    return [
+        (row.project_id, row.revision_id)
+        for row in execute_read(
+            REVISION_LIST_STATEMENTS[filter_method],
+            **get_list_params(filter_method, contact_email)
+        )
+    ]
+
+
+def check_project_documents(batch_size=500):
+    """Verify the projectdocuments table against the normalized tables.
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        The number of projects to check at a time. Default is 500.
+
+    Returns
+    -------
+    problems : list of tuple of (int, str)
+        The project ID and problem ('missing' or 'stale') for each project
+        whose document does not match the normalized tables.
+    """
+    project_ids = [
+        row.project_id for row in execute_read(ALL_PROJECT_IDS_STATEMENT)
+    ]
+    problems = []
+    for start in range(0, len(project_ids), batch_size):
+        batch = project_ids[start:start + batch_size]
+        expected = build_project_documents(batch)
+        actual = {
+            row.project_id: row
+            for row in execute_read(
+                DOCUMENTS_BY_ID_STATEMENT, project_ids=batch
+            )
+        }
+        for project_id in batch:
+            if project_id not in actual:
+                problems.append((project_id, 'missing'))
+            elif (
+                (actual[project_id].revision_id !=
+                    expected[project_id]['revision_id']) or
+                (actual[project_id].document !=
+                    expected[project_id]['document'])
+            ):
+                problems.append((project_id, 'stale'))
+    return problems
+
+
+@cached_read(project_arg='project_id')
+def get_current_revision(project_id):
+    """Get the current revision ID for the given project.
+
+    Parameters
+    ----------
+    project_id : int
+        The project ID to get the current revision ID for.
+
+    Returns
+    -------
+    revision_id : int
+        The current revision's ID.
+    """
+    return get_read_session().query(
+        sa.func.max(ProjectsHistory.revision_id)
+    ).filter_by(project_id=project_id).one()[0]
+
+
+def load_history_snapshots(query):
+    """Run a query for ProjectsHistory rows, loading the links, comm_channels,
+    roles, and contacts entries of each revision with one query per table
+    regardless of the number of revisions. Entries which were deleted in a
+    revision are included, with action 'delete'.
+
+    Parameters
+    ----------
+    query : sqlalchemy.orm.Query
+        Query yielding ProjectsHistory rows.
+
+    Returns
+    -------
+    revisions : list of dict
+        The revisions, in the order returned by the query.
+    """
+    return [
+        graph_to_dict(revision)
+        for revision in query.options(*HISTORY_GRAPH_OPTIONS).all()
+    ]
+
+
+def get_revision_snapshot(project_id, revision_id):
+    """Get a single revision of a project, in the same format as
+    get_project_history.
+
+    Parameters
+    ----------
+    project_id : int
+        The project ID.
+    revision_id : int
+        The revision ID.
+
+    Returns
+    -------
+    revisions : list of dict
+        The revision (or an empty list if it does not exist).
+    """
+    return load_history_snapshots(
+        get_read_session().query(ProjectsHistory).filter_by(
+            project_id=project_id, revision_id=revision_id
+        )
+    )
+
+
+def get_project_history(project_id):
+    """Get all revisions for the given project.
+
+    Parameters
+    ----------
+    project_id : int
+        The project ID to fetch.
+
+    Returns
+    -------
+    project_history : list of dict
+        The project history.
+    """
+    return load_history_snapshots(
+        get_read_session().query(ProjectsHistory).filter_by(
+            project_id=project_id
+        ).order_by(ProjectsHistory.revision_id)
+    )
+
+
+def diff_revisions(previous, revision):
+    """Compute the changes made by a revision.
+
+    Parameters
+    ----------
+    previous : dict or None
+        The preceding revision, from get_project_history. Pass None for the
+        first revision of a project.
+    revision : dict
+        The revision, from get_project_history.
+
+    Returns
+    -------
+    changes : dict
+        Has key 'fields', a list of dicts with keys 'field', 'old', and 'new'
+        for each changed project column, and a key for each auxiliary table
+        (e.g., 'links') with the output of diffutils.diff_entries.
+    """
+    if previous is None:
+        previous = {key: [] for key, model, match_key in AUXILIARY_TABLES}
+
+    changes = {'fields': []}
+    for field in diffutils.get_compared_columns(Projects):
+        if (
+            (field in ProjectsHistory.__table__.columns) and
+            not diffutils.values_equal(previous.get(field), revision[field])
+        ):
+            changes['fields'].append(
+                {
+                    'field': field,
+                    'old': previous.get(field),
+                    'new': revision[field]
+                }
+            )
+
+    for key, model, match_key in AUXILIARY_TABLES:
+        changes[key] = diffutils.diff_entries(
+            [
+                entry for entry in previous[key]
+                if entry['action'] != 'delete'
+            ],
+            [
+                entry for entry in revision[key]
+                if entry['action'] != 'delete'
+            ],
+            match_key,
+            diffutils.get_compared_columns(model)
+        )
+
+    return changes
+
+
+def get_project_history_page(
+    project_id, page=0, page_size=config.HISTORY_PAGE_SIZE
+):
+    """Get one page of the revisions for the given project, newest first,
+    together with the changes made by each revision. Only the revisions on
+    the page (and the one preceding the oldest of them, to diff against) are
+    loaded.
+
+    Parameters
+    ----------
+    project_id : int
+        The project ID to fetch.
+    page : int, optional
+        The page to get, where page 0 has the newest revisions. Default is 0.
+    page_size : int, optional
+        The number of revisions per page. Default is config.HISTORY_PAGE_SIZE.
+
+    Returns
+    -------
+    revisions : list of dict
+        The revisions, from get_project_history, with the output of
+        diff_revisions in the 'changes' key.
+    has_older : bool
+        Whether or not there are older revisions on later pages.
+    """
+    revisions = load_history_snapshots(
+        get_read_session().query(ProjectsHistory).filter_by(
+            project_id=project_id
+        ).order_by(
+            ProjectsHistory.revision_id.desc()
+        ).offset(page * page_size).limit(page_size + 1)
+    )
+
+    for revision, previous in zip(revisions, revisions[1:] + [None]):
+        revision['changes'] = diff_revisions(previous, revision)
+
+    has_older = len(revisions) > page_size
+    return revisions[:page_size], has_older
+
+
+def get_now():
+    return session.query(sa.func.now()).scalar()
+
+
+def query_projects_with_last_edit_timestamp(query_session=None):
+    """Make a query for each project along with the time of its most recent
+    edit or confirmation, whichever is later.
+
+    Parameters
+    ----------
+    query_session : sqlalchemy.orm.Session, optional
+        The session to query. Default is get_read_session(). Pass the main
+        session if the projects are going to be modified.
+
+    Returns
+    -------
+    query : sqlalchemy.orm.Query
+        Query yielding (Projects, last_edit_timestamp) tuples.
+    last_edit_timestamp : sqlalchemy.sql.ColumnElement
+        The last_edit_timestamp expression, for use in filters.
+    """
+    if query_session is None:
+        query_session = get_read_session()
+    most_recent_revision_dates = query_session.query(
+        sa.func.max(ProjectsHistory.timestamp).label('last_edit_timestamp'),
+        ProjectsHistory.project_id
+    ).group_by(ProjectsHistory.project_id).subquery()
+
+    last_edit_timestamp = sa.case(
+        [
+            (
+                Projects.last_confirmed_at >
+                most_recent_revision_dates.c.last_edit_timestamp,
+                Projects.last_confirmed_at
+            )
+        ],
+        else_=most_recent_revision_dates.c.last_edit_timestamp
+    )
+    query = query_session.query(
+        Projects, last_edit_timestamp
+    ).join(
+        most_recent_revision_dates,
+        Projects.project_id == most_recent_revision_dates.c.project_id
+    )
+    return query, last_edit_timestamp
+
+
+def get_stale_projects(
+    now, time_horizon=datetime.timedelta(days=365), active_only=True
+):
+    """Get projects for which the most recent edit or confirmation is farther
+    back than the specified horizon.
+
+    Parameters
+    ----------
+    now : datetime.datetime
+        The current time. Get this using db.get_now().
+    time_horizon : datetime.timedelta, optional
+        The time horizon to use. Default is 365 days.
+    active_only : bool, optional
+        Whether or not to return only active projects (default) or all
+        projects (including inactive ones).
+
+    Returns
+    -------
+    stale_projects : list of dict
+        The (full) info for each project. Includes the timestamp of the most
+        recent edit or confirmation (whichever is later) in the field
+        'last_edit_timestamp'.
+    """
+    query, last_edit_timestamp = query_projects_with_last_edit_timestamp()
+    condition = (last_edit_timestamp <= now - time_horizon)
+    if active_only:
+        condition &= (Projects.status == 'active')
+
+    results = query.filter(condition).options(*PROJECT_GRAPH_OPTIONS).all()
+    if len(results) > 0:
+        stale_projects, last_edit_timestamps = zip(*results)
+    else:
+        stale_projects = []
+        last_edit_timestamps = []
+
+    stale_projects = projects_to_dicts(stale_projects)
+
+    for project, last_edit_timestamp in zip(
+        stale_projects, last_edit_timestamps
+    ):
+        project['last_edit_timestamp'] = last_edit_timestamp
+
+    return stale_projects
+
+
+def get_reminder_deadlines(expires_at):
+    """Get the times at which each reminder is due for a project, and the
+    time at which the project expires.
+
+    A reminder for N days left is due once the time remaining before
+    expiration rounds to N days, i.e., N and a half days before expiration.
+
+    Parameters
+    ----------
+    expires_at : datetime.datetime
+        The time at which the project expires.
+
+    Returns
+    -------
+    deadlines : list of (int, datetime.datetime)
+        The number of days left and the corresponding deadline, in
+        chronological order. The last entry is (0, expires_at).
+    """
+    deadlines = [
+        (
+            num_days_left,
+            expires_at - datetime.timedelta(days=num_days_left + 0.5)
+        )
+        for num_days_left in sorted(
+            config.REMIND_DAYS_BEFORE_EXPIRATION, reverse=True
+        )
+    ]
+    deadlines.append((0, expires_at))
+    return deadlines
+
+
+def get_next_reminder_at(expires_at, now):
+    """Get the first reminder (or expiration) deadline after the given time.
+
+    Parameters
+    ----------
+    expires_at : datetime.datetime
+        The time at which the project expires.
+    now : datetime.datetime
+        The current time. Get this using db.get_now().
+
+    Returns
+    -------
+    next_reminder_at : datetime.datetime
+        The next deadline. If every deadline has already passed, this is
+        expires_at (i.e., the project is due to be deactivated).
+    """
+    for num_days_left, deadline in get_reminder_deadlines(expires_at):
+        if deadline > now:
+            return deadline
+    return expires_at
+
+
+def schedule_reminders(project, now):
+    """Set the expiration and next reminder times for a project which has
+    just been edited or confirmed. Caller is responsible for committing the
+    change.
+
+    Parameters
+    ----------
+    project : Projects
+        The project row object. This is updated in place.
+    now : datetime.datetime
+        The current time. Get this using db.get_now().
+    """
+    if project.status == 'active':
+        project.expires_at = now + EXPIRATION_HORIZON
+        project.next_reminder_at = get_next_reminder_at(
+            project.expires_at, now
+        )
     else:
-        raise ValueError('Unknown status filter!')
+        project.expires_at = None
+        project.next_reminder_at = None
 
-    project_list = list_dict_convert(projects)
-    # There's probably a way to do this with joins...
-    project_list = [
-        enrich_project_with_auxiliary_fields(project_info)
-        for project_info in project_list
-    ]
-        
-    return project_list
 
+def get_projects_due_for_reminder(now):
+    """Get the active projects for which a reminder or deactivation is due.
 
-def get_current_revision(project_id):
-    """Get the current revision ID for the given project.
+    This is a range scan on the index on Projects.next_reminder_at, so it only
+    touches the projects which are actually due.
 
     Parameters
     ----------
-    project_id : int
-        The project ID to get the current revision ID for.
+    now : datetime.datetime
+        The current time. Get this using db.get_now().
 
     Returns
     -------
-    revision_id : int
-        The current revision's ID.
+    due_projects : list of dict
+        The 'project_id' and 'expires_at' of each project.
     """
-    return session.query(
-        sa.func.max(ProjectsHistory.revision_id)
-    ).filter_by(project_id=project_id).one()[0]
+    due_projects = session.query(
+        Projects.project_id, Projects.expires_at
+    ).filter(
+        Projects.next_reminder_at <= now
+    ).filter_by(status='active').order_by(Projects.next_reminder_at).all()
+    return [
+        {'project_id': project_id, 'expires_at': expires_at}
+        for project_id, expires_at in due_projects
+    ]
 
 
-def get_project_history(project_id):
-    """Get all revisions for the given project.
+def set_next_reminder_times(next_reminder_times):
+    """Set the next reminder time for several projects with a single UPDATE
+    and commits the change.
 
     Parameters
     ----------
-    project_id : int
-        The project ID to fetch.
-
-    Returns
-    -------
-    project_history : list of dict
-        The project history.
+    next_reminder_times : dict
+        Maps each project ID to its new next_reminder_at.
     """
-    project_history = list_dict_convert(
-        session.query(ProjectsHistory).filter_by(project_id=project_id).all()
+    if len(next_reminder_times) == 0:
+        return
+
+    session.query(Projects).filter(
+        Projects.project_id.in_(list(next_reminder_times.keys()))
+    ).update(
+        {
+            'next_reminder_at': sa.case(
+                next_reminder_times, value=Projects.project_id
+            )
+        },
+        synchronize_session=False
     )
-    for revision in project_history:
-        revision['contacts'] = list_dict_convert(
-            session.query(ContactEmailsHistory).filter_by(
-                project_id=project_id, revision_id=revision['revision_id']
-            ).all()
-        )
-        revision['roles'] = list_dict_convert(
-            session.query(RolesHistory).filter_by(
-                project_id=project_id, revision_id=revision['revision_id']
-            ).all()
-        )
-        revision['links'] = list_dict_convert(
-            session.query(LinksHistory).filter_by(
-                project_id=project_id, revision_id=revision['revision_id']
-            ).all()
-        )
-        revision['comm_channels'] = list_dict_convert(
-            session.query(CommChannelsHistory).filter_by(
-                project_id=project_id, revision_id=revision['revision_id']
-            ).all()
-        )
-    return project_history
-
-
-def get_now():
-    return session.query(sa.func.now()).scalar()
+    for project_id in next_reminder_times.keys():
+        invalidate_read_cache(project_id)
+    # Only scheduling columns changed, so the documents are still current.
+    session.commit()
 
 
-def get_stale_projects(
-    now, time_horizon=datetime.timedelta(days=365), active_only=True
-):
-    """Get projects for which the most recent edit is farther back than the
-    specified horizon.
+def log_reminders(reminders):
+    """Add pending entries to the reminder log and commits the change. Entries
+    which are already in the log (in any state) are left untouched, so this
+    can safely be repeated.
 
     Parameters
     ----------
-    now : datetime.datetime
-        The current time. Get this using db.get_now().
-    time_horizon : datetime.timedelta, optional
-        The time horizon to use. Default is 365 days.
-    active_only : bool, optional
-        Whether or not to return only active projects (default) or all
-        projects (including inactive ones).
+    reminders : list of dict
+        The reminders to log. Each entry shall have keys 'project_id',
+        'reminder_kind', and 'deadline'.
+    """
+    if len(reminders) == 0:
+        return
+
+    existing = set(
+        session.query(
+            ReminderLog.project_id, ReminderLog.reminder_kind,
+            ReminderLog.deadline
+        ).filter(
+            ReminderLog.project_id.in_(
+                [reminder['project_id'] for reminder in reminders]
+            )
+        ).all()
+    )
+    new_rows = [
+        {
+            'project_id': reminder['project_id'],
+            'reminder_kind': reminder['reminder_kind'],
+            'deadline': reminder['deadline'],
+            'status': 'pending'
+        }
+        for reminder in reminders
+        if (
+            reminder['project_id'], reminder['reminder_kind'],
+            reminder['deadline']
+        ) not in existing
+    ]
+    if len(new_rows) > 0:
+        session.execute(ReminderLog.__table__.insert().values(new_rows))
+    session.commit()
+
+
+def get_pending_reminders():
+    """Get the reminder log entries which have not been handled yet.
 
     Returns
     -------
-    stale_projects : list of dict
-        The (full) info for each project. Includes the timestamp of the most
-        recent edit in the field 'last_edit_timestamp'.
+    reminders : list of dict
+        The pending entries, oldest first.
     """
-    most_recent_revision_dates = session.query(
-        sa.func.max(ProjectsHistory.timestamp).label('last_edit_timestamp'),
-        ProjectsHistory.project_id
-    ).group_by(ProjectsHistory.project_id).subquery()
-
-    condition = (
-        most_recent_revision_dates.c.last_edit_timestamp <=
-        now - time_horizon
+    return list_dict_convert(
+        session.query(ReminderLog).filter_by(
+            status='pending'
+        ).order_by(ReminderLog.id).all(),
+        remove_sql_ref=True
     )
-    if active_only:
-        condition &= (Projects.status == 'active')
 
-    query = session.query(
-        Projects, most_recent_revision_dates.c.last_edit_timestamp
-    ).join(
-        most_recent_revision_dates,
-        Projects.project_id == most_recent_revision_dates.c.project_id
-    ).filter(condition)
-    results = query.all()
-    if len(results) > 0:
-        stale_projects, last_edit_timestamps = zip(*results)
-    else:
-        stale_projects = []
-        last_edit_timestamps = []
 
-    stale_projects = list_dict_convert(stale_projects)
-    stale_projects = [
-        enrich_project_with_auxiliary_fields(project_info)
-        for project_info in stale_projects
-    ]
+def mark_reminder(reminder_id, status):
+    """Record that a reminder log entry has been handled and commits the
+    change.
 
-    for project, last_edit_timestamp in zip(
-        stale_projects, last_edit_timestamps
-    ):
-        project['last_edit_timestamp'] = last_edit_timestamp
+    Parameters
+    ----------
+    reminder_id : int
+        The ID of the reminder log entry.
+    status : {'sent', 'skipped'}
+        The outcome.
+    """
+    reminder = session.query(ReminderLog).get(reminder_id)
+    reminder.status = status
+    reminder.processed_at = get_now()
+    session.commit()
 
-    return stale_projects
+
+def backfill_reminder_schedules():
+    """Compute expires_at and next_reminder_at for every project from its
+    edit history and commits the change. This only needs to be run once, when
+    the columns are first added; afterwards they are maintained on every
+    write.
+    """
+    now = get_now()
+    query, _ = query_projects_with_last_edit_timestamp(session)
+    for project, last_edit_timestamp in query.all():
+        if project.status == 'active':
+            project.expires_at = last_edit_timestamp + EXPIRATION_HORIZON
+            project.next_reminder_at = get_next_reminder_at(
+                project.expires_at, now
+            )
+        else:
+            project.expires_at = None
+            project.next_reminder_at = None
+    reset_read_cache()
+    session.commit()
 
 
 # Adding operations
@@ -865,6 +2166,8 @@ def add_project_metadata(args):
     project.description = args['description']
     project.creator = args['creator']
     project.approval = args['approval']
+    project.version = 1
+    schedule_reminders(project, get_now())
     db_add(project, args['creator'], 'create', 0)
 
     project_id = get_project_id(args['name'])
@@ -1089,6 +2392,15 @@ def add_project_comms(
     )
 
 
+# The validation of each auxiliary table's rows, keyed like AUXILIARY_TABLES:
+AUXILIARY_VALIDATORS = {
+    'links': validate_links,
+    'comm_channels': validate_comms,
+    'contacts': validate_contacts,
+    'roles': validate_roles
+}
+
+
 def add_project(
     project_info, creator_kerberos, initial_approval='awaiting_approval'
 ):
@@ -1132,200 +2444,302 @@ def add_project(
         project_id, project_info['contacts'], creator_kerberos
     )
     add_project_roles(project_id, project_info['roles'], creator_kerberos)
+    refresh_project_documents([project_id])
     session.commit()
     return project_id
 
 
-# Update an existing project
+def add_projects(
+    project_info_list, creator_kerberos, initial_approval='awaiting_approval'
+):
+    """Add several projects to the database in one transaction, using a
+    multi-row insert for each table, and commits the change. Either every
+    project is added or none are.
 
-def update_project_metadata(project_id, args, editor_kerberos):
-    """Update the metadata entries for a project in the database.
-    Only the name, description, and status can be changed.
-    Caller is responsible for committing the change.
+    Raises ValueError if a project with one of the names already exists, or
+    if a name is repeated.
 
     Parameters
     ----------
-    project_id : int
-        ID of the project we want to modify
-    args : dict
-        Keys are fields in the Projects table, and values fit the
-        right type and correct value according to schema.
-    editor_kerberos : str
-        The kerb of the user making the edit.
+    project_info_list : list of dict
+        The project info for each project, in the format of add_project.
+    creator_kerberos : str
+        The kerberos of the user who created the projects.
+    initial_approval : {'awaiting_approval', 'approved', 'rejected'}, optional
+        The initial approval status of the projects. Default is
+        'awaiting_approval'.
+
+    Returns
+    -------
+    project_ids : list of int
+        The IDs of the new projects, in the same order as project_info_list.
     """
-    allowed_fields = [
-        'name', 'description', 'status', 'approval', 'approver',
-        'approver_comments'
-    ]
-    metadata = get_project(project_id, True)[0]  # Returns SQL object
-    
-    for field in allowed_fields:  # Only look for changes in the allowed fields
-        if (field in args) and (args[field] != getattr(metadata, field)):
-            setattr(metadata, field, args[field])
-
-    revision_id = get_current_revision(project_id) + 1
-
-    # Log the changes
-    project_history = ProjectsHistory()
-    project_history.project_id = project_id
-    project_history.name = metadata.name
-    project_history.description = metadata.description
-    project_history.status = metadata.status
-    project_history.approval = metadata.approval
-    project_history.creator = metadata.creator
-    project_history.approver = metadata.approver
-    project_history.approver_comments = metadata.approver_comments
-    project_history.author = editor_kerberos
-    project_history.action = 'update'
-    project_history.revision_id = revision_id
-    session.add(project_history)
+    names = [project_info['name'] for project_info in project_info_list]
+    if len(set(name.lower() for name in names)) != len(names):
+        raise ValueError('Project names must be unique!')
+    if len(get_project_ids_by_name(names)) > 0:
+        raise ValueError('Project with that name already exists!')
+    if len(project_info_list) == 0:
+        return []
+
+    now = get_now()
+    project_rows = []
+    for project_info in project_info_list:
+        for key, model, match_key in AUXILIARY_TABLES:
+            AUXILIARY_VALIDATORS[key](project_info[key])
+        # Go through the model so that its validators run:
+        project = Projects(
+            name=project_info['name'],
+            description=project_info['description'],
+            status=project_info['status'],
+            creator=creator_kerberos,
+            approval=initial_approval,
+            version=1
+        )
+        schedule_reminders(project, now)
+        project_rows.append(
+            {
+                key: getattr(project, key)
+                for key in Projects.__table__.columns.keys()
+                if key != 'project_id'
+            }
+        )
+    session.execute(Projects.__table__.insert(), project_rows)
 
-    return revision_id
+    # executemany does not return the new IDs, so look them up:
+    project_ids_by_name = dict(
+        session.query(Projects.name, Projects.project_id).filter(
+            Projects.name.in_(names)
+        ).all()
+    )
+    project_ids = [project_ids_by_name[name] for name in names]
+    history = {
+        'author': creator_kerberos,
+        'action': 'create',
+        'revision_id': 0
+    }
+    session.execute(
+        ProjectsHistory.__table__.insert(),
+        [
+            dict(
+                {
+                    key: value for key, value in row.items()
+                    if key in ProjectsHistory.__table__.columns
+                },
+                project_id=project_id,
+                **history
+            )
+            for row, project_id in zip(project_rows, project_ids)
+        ]
+    )
+    for key, model, match_key in AUXILIARY_TABLES:
+        columns = [
+            column for column in model.__table__.columns.keys()
+            if column not in ('id', 'project_id')
+        ]
+        rows = [
+            dict(
+                {column: entry.get(column) for column in columns},
+                project_id=project_id
+            )
+            for project_info, project_id in zip(project_info_list, project_ids)
+            for entry in project_info[key]
+        ]
+        if len(rows) > 0:
+            session.execute(model.__table__.insert(), rows)
+            session.execute(
+                CLASS_TO_HISTORY_CLASS_MAP[model].__table__.insert(),
+                [dict(row, **history) for row in rows]
+            )
+    invalidate_read_cache()
+    refresh_project_documents(project_ids)
+    session.commit()
+    return project_ids
 
 
-def update_project_table(
-    get_current_fn, form_row_fn, match_key, project_id, args, editor_kerberos,
-    revision_id
-):
-    """Update a given table with new entries. Caller is responsible for
-    committing the change.
+# Update an existing project
+
+def diff_project(project_info, project_id, fields=PROJECT_DETAIL_FIELDS):
+    """Compare the current state of a project with new project info. The
+    current state is loaded once, and the returned change set can be used both
+    to check what changed and (via apply_project_changes) to write the change.
 
     Parameters
     ----------
-    get_current_fn : callable
-        Function which returns the current rows associated with the project.
-    form_row_fn : callable
-        Function which forms a row object given a dict.
-    match_key : str
-        Key to match entries on.
-    project_id : int
-        The ID of the project to operate on.
-    args : list of dict
-        The new rows.
-    editor_kerberos : str
-        The kerb of the user making the edit.
-    revision_id : int
-        The revision ID associated with the edit.
+    project_info : dict
+        The new project info. Auxiliary tables whose key (e.g., 'links') is
+        not present are not loaded or compared.
+    project_id : int or str
+        The project ID for the existing project.
+    fields : list of str, optional
+        The Projects columns to compare. Default is PROJECT_DETAIL_FIELDS.
+
+    Returns
+    -------
+    change_set : diffutils.ChangeSet
+        The changes.
     """
-    current_x = get_current_fn(project_id, get_raw=True)
+    project = get_project(project_id, get_raw=True)
+    if len(project) == 0:
+        raise ValueError('No project with id %d exists!' % int(project_id))
 
-    new_x = []
-    for entry in args:
-        new_x.append(form_row_fn(project_id, entry))
+    tables = {}
+    for key, model, match_key in AUXILIARY_TABLES:
+        if key in project_info:
+            current_rows = get_project_info(
+                model, project_id, raw_input=True, sort_by_index=True
+            )
+            tables[key] = (model, match_key, current_rows)
 
-    db_update(
-        current_x, new_x, match_key, editor_kerberos, revision_id
-    )
+    return diffutils.ChangeSet(project[0], project_info, fields, tables)
 
 
-def update_project_contacts(project_id, args, editor_kerberos, revision_id):
-    """Update the contact email entries for a project in the database.
-    Caller is responsible for committing the change.
+def apply_table_changes(
+    table_changes, project_id, editor_kerberos, revision_id
+):
+    """Write the changes to one auxiliary table, including history logging.
+    Unchanged rows are logged with action 'same' so that every revision has a
+    full snapshot of the project. Caller is responsible for committing the
+    change.
 
     Parameters
     ----------
+    table_changes : diffutils.TableChanges
+        The changes to write.
     project_id : int
-        ID of the project we want to modify
-    args : list of dict
-        - args is a list of dictionaries with keys 'type', 'email', and 'index'
-        - 'type' is either 'primary' or 'secondary'
+        The ID of the project to operate on.
     editor_kerberos : str
         The kerb of the user making the edit.
     revision_id : int
         The revision ID associated with the edit.
     """
-    update_project_table(
-        get_contacts, form_contact_row, 'email', project_id, args,
-        editor_kerberos, revision_id
-    )
-
+    for row in table_changes.deletes:
+        db_delete(row, editor_kerberos, revision_id)
+
+    for row, changes in table_changes.updates:
+        for column, value in changes.items():
+            setattr(row, column, value)
+        session.add(
+            make_history_entry(row, editor_kerberos, 'update', revision_id)
+        )
 
-def update_project_roles(project_id, args, editor_kerberos, revision_id):
-    """Update the roles entries for a project in the database.
-    Caller is responsible for committing the change.
+    for row in table_changes.unchanged:
+        session.add(
+            make_history_entry(row, editor_kerberos, 'same', revision_id)
+        )
 
-    Parameters
-    ----------
-    project_id : int
-        ID of the project we want to modify
-    args : dict
-        - args is a list of dictionaries with keys 'role', 'description', and
-            (optional) 'prereq' 
-        - 'type' is either 'primary' or 'secondary'
-    editor_kerberos : str
-        The kerb of the user making the edit.
-    revision_id : int
-        The revision ID associated with the edit.
-    """
-    update_project_table(
-        get_roles, form_role_row, 'role', project_id, args, editor_kerberos,
-        revision_id
-    )
+    for entry in table_changes.creates:
+        db_add(
+            form_row(table_changes.model, project_id, entry),
+            editor_kerberos, 'create', revision_id
+        )
 
 
-def update_project_links(project_id, args, editor_kerberos, revision_id):
-    """Update the links entries for a project in the database.
-    Caller is responsible for committing the change.
+def apply_project_changes(
+    change_set, editor_kerberos, expected_version=None
+):
+    """Write a change set to the database as a new revision, including history
+    logging. Caller is responsible for committing the change, and for handling
+    the sqlalchemy.orm.exc.StaleDataError which is raised (on flush) if the
+    project is changed concurrently; see commit_project_changes.
 
     Parameters
     ----------
-    project_id : int
-        ID of the project we want to modify
-    args : dict
-        - args is a list of dictionaries with keys 'link' and (optional)
-            'anchortext'.
+    change_set : diffutils.ChangeSet
+        The changes, from diff_project.
     editor_kerberos : str
         The kerb of the user making the edit.
+    expected_version : int or str, optional
+        The version of the project which the edit was based on (e.g., when
+        the edit form was loaded). If provided and the project has changed
+        since, ConcurrentEditError is raised.
+
+    Returns
+    -------
     revision_id : int
-        The revision ID associated with the edit.
+        The revision ID of the new revision.
     """
-    update_project_table(
-        get_links, form_link_row, 'link', project_id, args, editor_kerberos,
-        revision_id
+    project = change_set.project
+    if (
+        (expected_version is not None) and
+        (project.version != int(expected_version))
+    ):
+        raise ConcurrentEditError(
+            'Project %d was changed by someone else!' % project.project_id
+        )
+
+    for field, (old, new) in change_set.fields.items():
+        setattr(project, field, new)
+    schedule_reminders(project, get_now())
+    # Always increment the version, so that the UPDATE checks that nobody else
+    # has written a revision since the project was loaded:
+    project.version = project.version + 1
+
+    # Not get_current_revision: its memoized (and possibly replica) value may
+    # be behind the primary.
+    revision_id = session.query(
+        sa.func.max(ProjectsHistory.revision_id)
+    ).filter_by(project_id=project.project_id).one()[0] + 1
+    session.add(
+        make_history_entry(project, editor_kerberos, 'update', revision_id)
     )
 
+    for key, model, match_key in AUXILIARY_TABLES:
+        if key in change_set.tables:
+            apply_table_changes(
+                change_set.tables[key], project.project_id, editor_kerberos,
+                revision_id
+            )
+    invalidate_read_cache(project.project_id)
+    refresh_project_documents([project.project_id])
+
+    return revision_id
 
-def update_project_comms(project_id, args, editor_kerberos, revision_id):
-    """Update the communication channels entries for a project in the database.
-    Caller is responsible for committing the change.
+
+def commit_project_changes(
+    change_set, editor_kerberos, expected_version=None
+):
+    """Write a change set to the database as a new revision and commits the
+    change. If the project was changed concurrently, nothing is written and
+    ConcurrentEditError is raised.
 
     Parameters
     ----------
-    project_id : int
-        ID of the project we want to modify
-    args : dict
-        - args is a list of dictionaries with keys 'commchannel'
+    change_set : diffutils.ChangeSet
+        The changes, from diff_project.
     editor_kerberos : str
         The kerb of the user making the edit.
+    expected_version : int or str, optional
+        The version of the project which the edit was based on. See
+        apply_project_changes.
+
+    Returns
+    -------
     revision_id : int
-        The revision ID associated with the edit.
+        The revision ID of the new revision.
     """
-    update_project_table(
-        get_comm, form_comms_row, 'commchannel', project_id, args,
-        editor_kerberos, revision_id
-    )
+    project_id = change_set.project.project_id
+    try:
+        revision_id = apply_project_changes(
+            change_set, editor_kerberos, expected_version=expected_version
+        )
+        session.commit()
+    except (ConcurrentEditError, sqlalchemy.orm.exc.StaleDataError):
+        session.rollback()
+        invalidate_read_cache(project_id)
+        raise ConcurrentEditError(
+            'Project %d was changed by someone else!' % project_id
+        )
+    return revision_id
 
 
-def update_project_auxiliary_tables(
-    project_info, project_id, editor_kerberos, revision_id
+def update_project(
+    project_info, project_id, editor_kerberos, change_set=None,
+    expected_version=None
 ):
-    update_project_links(
-        project_id, project_info['links'], editor_kerberos, revision_id
-    )
-    update_project_comms(
-        project_id, project_info['comm_channels'], editor_kerberos, revision_id
-    )
-    update_project_contacts(
-        project_id, project_info['contacts'], editor_kerberos, revision_id
-    )
-    update_project_roles(
-        project_id, project_info['roles'], editor_kerberos, revision_id
-    )
-
-
-def update_project(project_info, project_id, editor_kerberos):
     """Update the information for the given project in the database and commits
-    the change.
+    the change. Only the name, description, and status of the project itself
+    can be changed.
 
     Parameters
     ----------
@@ -1335,32 +2749,25 @@ def update_project(project_info, project_id, editor_kerberos):
         The project ID for the existing project.
     editor_kerberos : str
         The kerberos of the user editing the project.
-        
+    change_set : diffutils.ChangeSet, optional
+        The result of diff_project(project_info, project_id), if the caller
+        has already computed it. Default is to compute it here.
+    expected_version : int or str, optional
+        The version of the project which the edit was based on (from the
+        form). If provided and the project has changed since,
+        ConcurrentEditError is raised and nothing is written.
+
     Returns
     -------
-    original_project : dict, int
-        Return a dictionary formatted like `project_info` representing the view
-        of the project prior to making the update.
+    change_set : diffutils.ChangeSet
+        The changes which were made.
     """
-    project_exists = True if get_project_name(project_id) else False
-    if not project_exists:
-        raise ValueError('No project with id %d exists!' % int(project_id))
-
-    new_metadata = {
-        'name': project_info['name'], 
-        'description': project_info['description'],
-        'status': project_info['status']
-        # `creator` and `approval` fields are intentionally not supplied
-    }
-    orig_project = get_all_info_for_project(project_id)
-    revision_id = update_project_metadata(
-        project_id, new_metadata, editor_kerberos
-    )
-    update_project_auxiliary_tables(
-        project_info, project_id, editor_kerberos, revision_id
+    if change_set is None:
+        change_set = diff_project(project_info, project_id)
+    commit_project_changes(
+        change_set, editor_kerberos, expected_version=expected_version
     )
-    session.commit()
-    return orig_project
+    return change_set
 
 
 def approve_project(
@@ -1380,18 +2787,15 @@ def approve_project(
         The approver's comments on the project.
     """
     # Change status to "approved"
-    new_metadata = {
-        'approval': 'approved',
-        'approver': approver_kerberos,
-        'approver_comments': approver_comments
-    }
-    revision_id = update_project_metadata(
-        project_id, new_metadata, approver_kerberos
+    new_info = dict(project_info)
+    new_info['approval'] = 'approved'
+    new_info['approver'] = approver_kerberos
+    new_info['approver_comments'] = approver_comments
+    change_set = diff_project(
+        new_info, project_id,
+        fields=['approval', 'approver', 'approver_comments']
     )
-    update_project_auxiliary_tables(
-        project_info, project_id, approver_kerberos, revision_id
-    )
-    session.commit()
+    commit_project_changes(change_set, approver_kerberos)
 
 
 def reject_project(
@@ -1411,18 +2815,15 @@ def reject_project(
         The approver's comments on the project.
     """
     # Change status to "rejected"
-    new_metadata = {
-        'approval': 'rejected',
-        'approver': approver_kerberos,
-        'approver_comments': approver_comments
-    }
-    revision_id = update_project_metadata(
-        project_id, new_metadata, approver_kerberos
-    )
-    update_project_auxiliary_tables(
-        project_info, project_id, approver_kerberos, revision_id
+    new_info = dict(project_info)
+    new_info['approval'] = 'rejected'
+    new_info['approver'] = approver_kerberos
+    new_info['approver_comments'] = approver_comments
+    change_set = diff_project(
+        new_info, project_id,
+        fields=['approval', 'approver', 'approver_comments']
     )
-    session.commit()
+    commit_project_changes(change_set, approver_kerberos)
 
 
 def set_project_status_to_awaiting_approval(
@@ -1439,20 +2840,15 @@ def set_project_status_to_awaiting_approval(
     editor_kerberos : str
         The kerberos of the user editing the project.
     """
-    # Change status to "rejected"
-    new_metadata = {
-        'approval': 'awaiting_approval'
-    }
-    revision_id = update_project_metadata(
-        project_id, new_metadata, editor_kerberos
-    )
-    update_project_auxiliary_tables(
-        project_info, project_id, editor_kerberos, revision_id
-    )
-    session.commit()
+    new_info = dict(project_info)
+    new_info['approval'] = 'awaiting_approval'
+    change_set = diff_project(new_info, project_id, fields=['approval'])
+    commit_project_changes(change_set, editor_kerberos)
 
 
-def rollback_project(project_id, revision_id, editor_kerberos):
+def rollback_project(
+    project_id, revision_id, editor_kerberos, change_set=None
+):
     """Roll back a project's state to the given revision ID.
 
     Parameters
@@ -1463,26 +2859,194 @@ def rollback_project(project_id, revision_id, editor_kerberos):
         The revision ID to roll back to.
     editor_kerberos : str
         The username of the person performing the rollback.
+    change_set : diffutils.ChangeSet, optional
+        The result of diff_project for the revision's project info with
+        fields=PROJECT_UPDATE_FIELDS, if the caller has already computed it.
+        Default is to compute it here.
     """
-    project_exists = True if get_project_name(project_id) else False
-    if not project_exists:
-        raise ValueError('No project with id %d exists!' % int(project_id))
+    if change_set is None:
+        project_info = get_all_info_for_project(
+            project_id, revision_id=revision_id
+        )
+        if project_info is None:
+            raise ValueError(
+                'No revision with id %d exists!' % int(revision_id)
+            )
+        change_set = diff_project(
+            project_info, project_id, fields=PROJECT_UPDATE_FIELDS
+        )
 
-    project_info = get_all_info_for_project(
-        project_id, revision_id=revision_id
+    commit_project_changes(change_set, editor_kerberos)
+
+
+def renew_project(project_id, editor_kerberos):
+    """Confirm that a project's details are still correct, resetting its
+    expiration clock, and commits the change.
+
+    This is a single UPDATE of the Projects row regardless of the size of the
+    project: no revision is logged, since nothing about the project changes.
+    Only active projects can be renewed (inactive projects do not expire).
+    The version is incremented, as in deactivate_projects, so that edits
+    which were based on the old version fail with ConcurrentEditError.
+
+    Raises ValueError if there is no active project with the given ID.
+
+    Parameters
+    ----------
+    project_id : int or str
+        The project ID for the existing project.
+    editor_kerberos : str
+        The kerberos of the user confirming the project.
+    """
+    now = get_now()
+    expires_at = now + EXPIRATION_HORIZON
+    num_updated = session.query(Projects).filter(
+        Projects.project_id == int(project_id),
+        Projects.status == 'active'
+    ).update(
+        {
+            'last_confirmed_at': now,
+            'last_confirmed_by': editor_kerberos,
+            'expires_at': expires_at,
+            'next_reminder_at': get_next_reminder_at(expires_at, now),
+            'version': Projects.version + 1
+        },
+        synchronize_session=False
     )
-    if project_info is None:
-        raise ValueError('No revision with id %d exists!' % int(revision_id))
+    if num_updated == 0:
+        session.rollback()
+        raise ValueError(
+            'No active project with id %d exists!' % int(project_id)
+        )
+    # Only scheduling columns changed, so the document is still current.
+    invalidate_read_cache(project_id)
+    session.commit()
+
+
+def copy_auxiliary_tables_to_history(revision_ids, editor_kerberos):
+    """Copy the current links, comm channels, contacts, and roles for a set of
+    projects into the history tables as 'same' entries. This is done with one
+    INSERT ... SELECT per table, so the cost does not depend on the number of
+    projects. Caller is responsible for committing the change.
+
+    Parameters
+    ----------
+    revision_ids : dict
+        Maps each project ID to the revision ID to log the entries under.
+    editor_kerberos : str
+        The kerb of the user making the edit.
+    """
+    for model in [Links, CommChannels, ContactEmails, Roles]:
+        history_table = CLASS_TO_HISTORY_CLASS_MAP[model].__table__
+        columns = [
+            key for key in model.__table__.columns.keys() if key != 'id'
+        ]
+        select = sa.select(
+            [model.__table__.columns[key] for key in columns] + [
+                sa.literal(editor_kerberos),
+                sa.literal('same'),
+                sa.case(revision_ids, value=model.project_id)
+            ]
+        ).where(model.project_id.in_(list(revision_ids.keys())))
+        session.execute(
+            history_table.insert().from_select(
+                columns + ['author', 'action', 'revision_id'], select
+            )
+        )
+
+
+def deactivate_projects(project_ids, editor_kerberos, now=None):
+    """Set the status of several projects to "inactive" in a single
+    transaction and commits the change.
+
+    Unlike update_project, this does not diff the auxiliary tables (which are
+    unchanged by a status transition): the projects are updated with a single
+    UPDATE, one new revision per project is logged with a single multi-row
+    INSERT, and the auxiliary tables are copied into that revision with one
+    INSERT ... SELECT per table.
+
+    The projects are re-read with row locks inside the transaction, so that
+    projects which were deactivated, edited, or renewed since the caller
+    chose them are skipped, and the version of each deactivated project is
+    incremented so that edits which were based on the old version fail with
+    ConcurrentEditError instead of interleaving with the deactivation.
+
+    Parameters
+    ----------
+    project_ids : list of int
+        The IDs of the projects to deactivate.
+    editor_kerberos : str
+        The kerberos of the user (or service) performing the deactivation.
+    now : datetime.datetime, optional
+        If provided, only projects which have expired as of now are
+        deactivated.
 
-    rollback_revision_id = update_project_metadata(
-        project_id, project_info, editor_kerberos
+    Returns
+    -------
+    deactivated_project_ids : list of int
+        The IDs of the projects which were deactivated.
+    """
+    project_ids = [int(project_id) for project_id in project_ids]
+    if len(project_ids) == 0:
+        return []
+
+    current_revisions = session.query(
+        ProjectsHistory.project_id,
+        sa.func.max(ProjectsHistory.revision_id).label('revision_id')
+    ).filter(
+        ProjectsHistory.project_id.in_(project_ids)
+    ).group_by(ProjectsHistory.project_id).subquery()
+    projects = session.query(
+        Projects, current_revisions.c.revision_id
+    ).join(
+        current_revisions,
+        Projects.project_id == current_revisions.c.project_id
+    ).filter(
+        Projects.status == 'active'
     )
-    update_project_auxiliary_tables(
-        project_info, project_id, editor_kerberos, rollback_revision_id
+    if now is not None:
+        projects = projects.filter(Projects.expires_at <= now)
+    projects = projects.with_for_update().all()
+    if len(projects) == 0:
+        session.rollback()
+        return []
+
+    revision_ids = {}
+    history_rows = []
+    for project, current_revision_id in projects:
+        revision_ids[project.project_id] = current_revision_id + 1
+        history_row = {
+            key: getattr(project, key)
+            for key in Projects.__table__.columns.keys()
+            if key in ProjectsHistory.__table__.columns
+        }
+        history_row['status'] = 'inactive'
+        history_row['author'] = editor_kerberos
+        history_row['action'] = 'update'
+        history_row['revision_id'] = current_revision_id + 1
+        history_rows.append(history_row)
+
+    project_ids = list(revision_ids.keys())
+    session.query(Projects).filter(
+        Projects.project_id.in_(project_ids)
+    ).update(
+        {
+            'status': 'inactive',
+            'expires_at': None,
+            'next_reminder_at': None,
+            'version': Projects.version + 1
+        },
+        synchronize_session=False
     )
+    session.execute(ProjectsHistory.__table__.insert().values(history_rows))
+    copy_auxiliary_tables_to_history(revision_ids, editor_kerberos)
+    for project_id in project_ids:
+        invalidate_read_cache(project_id)
+    refresh_project_documents(project_ids)
     session.commit()
+    return project_ids
+
 
-    
 ######################################################################
 # Testing Code 
 ######################################################################
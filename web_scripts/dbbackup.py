@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+"""Back up the whole database (every current and history table) to a
+compressed JSON Lines file, and restore it again.
+
+Usage:
+
+    python dbbackup.py export backup.jsonl.gz [--batch-size 1000]
+    python dbbackup.py restore backup.jsonl.gz [--replace]
+        [--batch-size 1000]
+
+The tables are written in foreign key order (parents first). Each table
+starts with a line holding its name and columns, which is followed by one
+line per row holding the values as a list. Rows are streamed in both
+directions, so memory use does not grow with the size of the database.
+
+A restore runs in one transaction, so a failed restore leaves the database
+unchanged. The database must be empty unless --replace is given, which
+deletes every row first. Both commands report the rows per second, to show
+how long a recovery of the real database would take.
+"""
+
+from __future__ import print_function
+
+import argparse
+import gzip
+import json
+import sys
+import time
+
+import sqlalchemy as sa
+
+import db
+import schema
+
+FORMAT_VERSION = 1
+BATCH_SIZE = 1000
+
+
+def get_tables():
+    """Get the tables to back up, in foreign key order (parents first).
+    """
+    return schema.SQLBase.metadata.sorted_tables
+
+
+def write_line(f, value):
+    f.write(
+        (
+            json.dumps(value, default=db.format_document_value) + '\n'
+        ).encode('utf-8')
+    )
+
+
+def clear_tables(session):
+    """Delete every row of every table, children first so that no foreign
+    key is broken along the way. The caller commits.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+        The session to delete with.
+    """
+    for table in reversed(get_tables()):
+        session.execute(table.delete())
+
+
+def export_database(f, session=None, batch_size=BATCH_SIZE):
+    """Write every table to a backup file.
+
+    Parameters
+    ----------
+    f : file
+        The file to write to, opened in binary mode (e.g., with gzip.open).
+    session : sqlalchemy.orm.Session, optional
+        The session to read with. Default is the main session.
+    batch_size : int, optional
+        The number of rows to fetch from the database at a time. Default is
+        BATCH_SIZE.
+
+    Returns
+    -------
+    stats : list of tuple
+        The (table name, number of rows, seconds) for each table.
+    """
+    if session is None:
+        session = schema.session
+    write_line(
+        f,
+        {
+            'format': 'projectdb-backup',
+            'version': FORMAT_VERSION,
+            'created_at': db.get_now()
+        }
+    )
+    stats = []
+    for table in get_tables():
+        start_time = time.time()
+        columns = table.columns.keys()
+        write_line(f, {'table': table.name, 'columns': columns})
+        num_rows = 0
+        query = session.query(table).order_by(*table.primary_key.columns)
+        for row in query.yield_per(batch_size):
+            write_line(f, list(row))
+            num_rows += 1
+        stats.append((table.name, num_rows, time.time() - start_time))
+    return stats
+
+
+def restore_database(f, session=None, replace=False, batch_size=BATCH_SIZE):
+    """Load a backup file written by export_database, and commit it.
+
+    Parameters
+    ----------
+    f : file
+        The file to read from, opened in binary mode (e.g., with gzip.open).
+    session : sqlalchemy.orm.Session, optional
+        The session to write with. Default is the main session.
+    replace : bool, optional
+        Whether to delete the rows which are already in the database. Default
+        is False, in which case the database must be empty.
+    batch_size : int, optional
+        The number of rows to insert with each statement. Default is
+        BATCH_SIZE.
+
+    Returns
+    -------
+    stats : list of tuple
+        The (table name, number of rows, seconds) for each table.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a backup, does not match the schema, or the
+        database is not empty (without replace). Nothing is changed.
+    """
+    if session is None:
+        session = schema.session
+    tables = {table.name: table for table in get_tables()}
+
+    lines = iter(f)
+    try:
+        header = json.loads(next(lines).decode('utf-8'))
+    except (StopIteration, ValueError):
+        raise ValueError('The file is not a database backup!')
+    if (
+        not isinstance(header, dict) or
+        header.get('format') != 'projectdb-backup'
+    ):
+        raise ValueError('The file is not a database backup!')
+    if header.get('version') != FORMAT_VERSION:
+        raise ValueError(
+            'Cannot restore a backup of version %s!' % header.get('version')
+        )
+
+    stats = []
+    table = None
+    batch = []
+
+    def flush():
+        if len(batch) > 0:
+            session.execute(table.insert(), batch)
+            del batch[:]
+
+    try:
+        if replace:
+            clear_tables(session)
+        else:
+            for existing_table in tables.values():
+                if session.query(existing_table).first() is not None:
+                    raise ValueError(
+                        'Table "%s" is not empty! Use replace to overwrite '
+                        'the database.' % existing_table.name
+                    )
+
+        for line_number, line in enumerate(lines, start=2):
+            try:
+                value = json.loads(line.decode('utf-8'))
+            except ValueError:
+                raise ValueError('Line %d: invalid JSON!' % line_number)
+            if isinstance(value, dict):
+                if table is not None:
+                    flush()
+                    stats.append(
+                        (table.name, num_rows, time.time() - start_time)
+                    )
+                if value.get('table') not in tables:
+                    raise ValueError(
+                        'Line %d: unknown table "%s"!' % (
+                            line_number, value.get('table')
+                        )
+                    )
+                start_time = time.time()
+                table = tables[value['table']]
+                columns = value['columns']
+                unknown_columns = set(columns) - set(table.columns.keys())
+                if len(unknown_columns) > 0:
+                    raise ValueError(
+                        'Line %d: table "%s" has no columns %s!' % (
+                            line_number, table.name,
+                            ', '.join(sorted(unknown_columns))
+                        )
+                    )
+                datetime_columns = [
+                    column for column in columns
+                    if isinstance(table.columns[column].type, sa.DateTime)
+                ]
+                num_rows = 0
+            else:
+                if table is None:
+                    raise ValueError(
+                        'Line %d: row before any table!' % line_number
+                    )
+                row = dict(zip(columns, value))
+                for column in datetime_columns:
+                    row[column] = db.parse_document_datetime(row[column])
+                batch.append(row)
+                num_rows += 1
+                if len(batch) >= batch_size:
+                    flush()
+        if table is not None:
+            flush()
+            stats.append((table.name, num_rows, time.time() - start_time))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    db.reset_read_cache()
+    return stats
+
+
+def print_stats(stats, operation):
+    """Print the rows and rows per second for each table, and in total.
+    """
+    total_rows = 0
+    total_seconds = 0.0
+    for table_name, num_rows, seconds in stats:
+        print(
+            '%-24s %9d rows %9.2f s %11.0f rows/s' % (
+                table_name, num_rows, seconds, num_rows / max(seconds, 1e-9)
+            )
+        )
+        total_rows += num_rows
+        total_seconds += seconds
+    print(
+        '%s %d rows in %.2f s (%.0f rows/s).' % (
+            operation, total_rows, total_seconds,
+            total_rows / max(total_seconds, 1e-9)
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Back up or restore the whole database.'
+    )
+    parser.add_argument(
+        'command', choices=['export', 'restore'], help='what to do'
+    )
+    parser.add_argument('path', help='the backup file (.jsonl.gz)')
+    parser.add_argument(
+        '--replace', action='store_true',
+        help='restore: delete the rows which are already in the database'
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=BATCH_SIZE,
+        help='rows fetched or inserted at a time (default: %(default)s)'
+    )
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        with gzip.open(args.path, 'wb') as f:
+            stats = export_database(f, batch_size=args.batch_size)
+        print_stats(stats, 'Exported')
+    else:
+        try:
+            with gzip.open(args.path, 'rb') as f:
+                stats = restore_database(
+                    f, replace=args.replace, batch_size=args.batch_size
+                )
+        except ValueError as e:
+            print('Could not restore %s: %s' % (args.path, e))
+            print('Nothing was restored.')
+            sys.exit(1)
+        print_stats(stats, 'Restored')
+
+
+if __name__ == '__main__':
+    main()
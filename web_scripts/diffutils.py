@@ -0,0 +1,327 @@
+"""Detection of the changes between the current state of a project (as row
+objects loaded from the database) and a new project_info dict.
+
+The columns which are compared are taken from the schema, so that new columns
+are picked up automatically. A ChangeSet holds everything needed both to
+decide whether an edit changes anything (e.g., for approver notifications) and
+to write the edit, so that the project only has to be read once per request.
+"""
+
+# Columns which identify a row rather than describe it, and so are never
+# compared:
+IDENTITY_COLUMNS = ['id', 'project_id']
+
+
+def values_equal(a, b, ignore_case=False):
+    """Compare two column values.
+
+    Parameters
+    ----------
+    a, b : object
+        The values to compare.
+    ignore_case : bool, optional
+        If True, strings are compared case-insensitively and None is treated
+        as being equivalent to an empty string. Default is False (exact
+        comparison, as used when writing).
+
+    Returns
+    -------
+    is_equal : bool
+        Whether or not the two values are equal.
+    """
+    if not ignore_case:
+        return a == b
+
+    if a is None:
+        a = ''
+    if b is None:
+        b = ''
+    if hasattr(a, 'lower') and hasattr(b, 'lower'):
+        return a.lower() == b.lower()
+    else:
+        return a == b
+
+
+def get_compared_columns(model):
+    """Get the columns of a table which are compared when diffing rows.
+
+    Parameters
+    ----------
+    model : type
+        A type which inherits from SQLBase.
+
+    Returns
+    -------
+    columns : list of str
+        The column names.
+    """
+    return [
+        key for key in model.__table__.columns.keys()
+        if key not in IDENTITY_COLUMNS
+    ]
+
+
+def diff_entries(old_entries, new_entries, match_key, columns):
+    """Compare two snapshots of an auxiliary table (e.g., the links in two
+    consecutive revisions). Entries are matched on match_key, as in the write
+    path.
+
+    Parameters
+    ----------
+    old_entries, new_entries : list of dict
+        The entries in each snapshot.
+    match_key : str
+        The key to match entries on.
+    columns : list of str
+        The keys to compare.
+
+    Returns
+    -------
+    changes : list of dict
+        One dict per created, updated, or deleted entry, with keys 'change'
+        ('create', 'update', or 'delete'), 'old' and 'new' (the entry in each
+        snapshot, or None), and 'columns' (the keys which changed). Creates
+        and updates are listed in the order of new_entries, followed by the
+        deletes.
+    """
+    old_key_entry_map = {entry[match_key]: entry for entry in old_entries}
+    new_keys = set(entry[match_key] for entry in new_entries)
+
+    changes = []
+    for entry in new_entries:
+        old_entry = old_key_entry_map.get(entry[match_key])
+        if old_entry is None:
+            changes.append(
+                {
+                    'change': 'create',
+                    'old': None,
+                    'new': entry,
+                    'columns': list(columns)
+                }
+            )
+        else:
+            changed_columns = [
+                column for column in columns
+                if not values_equal(old_entry.get(column), entry.get(column))
+            ]
+            if len(changed_columns) > 0:
+                changes.append(
+                    {
+                        'change': 'update',
+                        'old': old_entry,
+                        'new': entry,
+                        'columns': changed_columns
+                    }
+                )
+
+    for entry in old_entries:
+        if entry[match_key] not in new_keys:
+            changes.append(
+                {
+                    'change': 'delete',
+                    'old': entry,
+                    'new': None,
+                    'columns': list(columns)
+                }
+            )
+
+    return changes
+
+
+class TableChanges(object):
+    def __init__(self, model, match_key, current_rows, new_entries):
+        """The changes to the rows of one auxiliary table (links, roles, etc.)
+        for a project. Rows are matched on match_key.
+
+        Parameters
+        ----------
+        model : type
+            A type which inherits from SQLBase.
+        match_key : str
+            The column to match rows on.
+        current_rows : list of SQLBase
+            The rows currently in the database, sorted by index.
+        new_entries : list of dict
+            The new entries. Missing keys are treated as None.
+
+        Attributes
+        ----------
+        creates : list of dict
+            New entries which do not match a current row.
+        updates : list of tuple of (SQLBase, dict)
+            Current rows which match a new entry, together with the new values
+            of the columns which changed.
+        unchanged : list of SQLBase
+            Current rows which match a new entry exactly.
+        deletes : list of SQLBase
+            Current rows which do not match any new entry.
+        """
+        self.model = model
+        self.match_key = match_key
+        self.columns = get_compared_columns(model)
+        self.current_rows = current_rows
+        self.new_entries = new_entries
+
+        self.creates = []
+        self.updates = []
+        self.unchanged = []
+        self.deletes = []
+
+        new_keys = set(entry.get(match_key) for entry in new_entries)
+        current_key_row_map = {}
+        for row in current_rows:
+            key = getattr(row, match_key)
+            if key in new_keys:
+                current_key_row_map[key] = row
+            else:
+                self.deletes.append(row)
+
+        for entry in new_entries:
+            row = current_key_row_map.get(entry.get(match_key))
+            if row is None:
+                self.creates.append(entry)
+                continue
+
+            changes = {}
+            for column in self.columns:
+                if not values_equal(getattr(row, column), entry.get(column)):
+                    changes[column] = entry.get(column)
+            if len(changes) > 0:
+                self.updates.append((row, changes))
+            else:
+                self.unchanged.append(row)
+
+    def is_changed(self, ignore_case=False):
+        """Check if the new entries differ from the current rows. Rows are
+        compared in order, so reordering counts as a change.
+
+        Parameters
+        ----------
+        ignore_case : bool, optional
+            Whether to compare strings case-insensitively (see values_equal).
+
+        Returns
+        -------
+        is_changed : bool
+            Whether or not the table has changed.
+        """
+        if len(self.current_rows) != len(self.new_entries):
+            return True
+
+        for row, entry in zip(self.current_rows, self.new_entries):
+            for column in self.columns:
+                if not values_equal(
+                    getattr(row, column), entry.get(column), ignore_case
+                ):
+                    return True
+
+        return False
+
+
+class ChangeSet(object):
+    def __init__(self, project, project_info, fields, tables):
+        """The changes between the current state of a project and a new
+        project_info dict.
+
+        Parameters
+        ----------
+        project : Projects
+            The current project row.
+        project_info : dict
+            The new project info.
+        fields : list of str
+            The Projects columns to compare. Fields which are not in
+            project_info are left alone.
+        tables : dict
+            Maps keys of project_info (e.g., 'links') to tuples of (model,
+            match_key, current_rows). Tables whose key is not in project_info
+            are left alone.
+
+        Attributes
+        ----------
+        project : Projects
+            The current project row.
+        fields : dict
+            Maps each changed Projects column to a tuple of (old, new) values.
+        tables : dict
+            Maps keys of project_info to TableChanges.
+        """
+        self.project = project
+        self.fields = {}
+        for field in fields:
+            if field in project_info:
+                old = getattr(project, field)
+                new = project_info[field]
+                if not values_equal(old, new):
+                    self.fields[field] = (old, new)
+
+        self.tables = {}
+        for key, (model, match_key, current_rows) in tables.items():
+            if key in project_info:
+                self.tables[key] = TableChanges(
+                    model, match_key, current_rows, project_info[key]
+                )
+
+    def field_changed(self, field, ignore_case=True):
+        """Check if a Projects column has changed.
+
+        Parameters
+        ----------
+        field : str
+            The column name.
+        ignore_case : bool, optional
+            Whether to compare strings case-insensitively. Default is True.
+
+        Returns
+        -------
+        is_changed : bool
+            Whether or not the column has changed.
+        """
+        if field not in self.fields:
+            return False
+        old, new = self.fields[field]
+        return not values_equal(old, new, ignore_case)
+
+    def name_changed(self, ignore_case=True):
+        """Check if the project name has changed.
+
+        Parameters
+        ----------
+        ignore_case : bool, optional
+            Whether to compare case-insensitively. Default is True.
+
+        Returns
+        -------
+        is_changed : bool
+            Whether or not the name has changed.
+        """
+        return self.field_changed('name', ignore_case)
+
+    def is_changed(self, ignore_case=True, fields=None):
+        """Check if any of the project details have changed.
+
+        Parameters
+        ----------
+        ignore_case : bool, optional
+            Whether to compare strings case-insensitively. Default is True.
+        fields : list of str, optional
+            If provided, only these Projects columns are considered (together
+            with all of the auxiliary tables). Default is to consider every
+            compared column.
+
+        Returns
+        -------
+        is_changed : bool
+            Whether or not anything has changed.
+        """
+        if fields is None:
+            fields = list(self.fields.keys())
+        for field in fields:
+            if self.field_changed(field, ignore_case):
+                return True
+
+        for table_changes in self.tables.values():
+            if table_changes.is_changed(ignore_case):
+                return True
+
+        return False
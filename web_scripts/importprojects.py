@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import authutils
+import requestutils
+import templateutils
+
+
+def format_import_projects():
+    """Format the import projects interface.
+
+    Returns
+    -------
+    result : str
+        The HTML to display.
+    """
+    jenv = templateutils.get_jenv()
+    user = authutils.get_kerberos()
+    authlink = authutils.get_auth_url(True)
+    deauthlink = authutils.get_auth_url(False)
+    result = ''
+    result += 'Content-type: text/html\n\n'
+    result += jenv.get_template('importprojects.html').render(
+        user=user,
+        can_add=authutils.can_add(user),
+        can_import=authutils.is_admin(user),
+        help_address='sipb-projectdb-team [at] mit [dot] edu',
+        authlink=authlink,
+        deauthlink=deauthlink
+    ).encode('utf-8')
+    return result
+
+
+def main():
+    """Display the import projects interface.
+    """
+    page = format_import_projects()
+    print(page)
+
+
+if __name__ == '__main__':
+    requestutils.run(main)
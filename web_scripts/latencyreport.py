@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""Report the latency of each entry point, and of each phase of handling a
+request, from the timing log written by requestutils.run (including its
+rotated backups).
+
+Usage:
+
+    python latencyreport.py [--hours 24] [--since 2024-05-01T12:00]
+        [--until 2024-05-02] [--json]
+
+By default the window is the last 24 hours. To see whether a deploy changed
+anything, compare the windows before and after it with --since and --until.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import glob
+import json
+import math
+import sys
+import time
+
+import config
+import timingutils
+
+PERCENTILES = [50, 95, 99]
+TIME_FORMATS = ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d']
+
+
+def parse_time(value):
+    """Parse a --since or --until argument (local time) into seconds since
+    the epoch.
+    """
+    for time_format in TIME_FORMATS:
+        try:
+            parsed = datetime.datetime.strptime(value, time_format)
+        except ValueError:
+            continue
+        return time.mktime(parsed.timetuple())
+    raise argparse.ArgumentTypeError(
+        'Cannot parse %r; use YYYY-MM-DD[THH:MM[:SS]].' % value
+    )
+
+
+def load_entries(log_path, since, until):
+    """Load the entries in a window from the timing log and its backups.
+
+    Parameters
+    ----------
+    log_path : str
+        The timing log.
+    since, until : float
+        The window, in seconds since the epoch.
+
+    Returns
+    -------
+    entries : list of dict
+        The log entries. Lines which cannot be parsed are skipped.
+    """
+    entries = []
+    for path in [log_path] + glob.glob(log_path + '.*'):
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except (IOError, OSError):
+            continue
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if since <= entry.get('time', 0) < until:
+                entries.append(entry)
+    return entries
+
+
+def get_percentile(sorted_values, percentile):
+    """Get a percentile of a list of values, using the nearest-rank method.
+
+    Parameters
+    ----------
+    sorted_values : list of float
+        The values, in ascending order. Must not be empty.
+    percentile : float
+        The percentile, between 0 and 100.
+
+    Returns
+    -------
+    value : float
+        The value.
+    """
+    rank = int(math.ceil(percentile / 100.0 * len(sorted_values)))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def summarize(entries):
+    """Compute the percentiles of each phase for each script.
+
+    Parameters
+    ----------
+    entries : list of dict
+        The log entries, from load_entries.
+
+    Returns
+    -------
+    summary : dict
+        Maps each script name to a dict with keys 'requests', 'errors', and
+        'phases'. 'phases' maps each phase to a dict mapping 'p50', 'p95',
+        and 'p99' to the time in seconds.
+    """
+    times = {}
+    errors = {}
+    for entry in entries:
+        script_times = times.setdefault(entry['script'], {})
+        for phase, seconds in entry['phases'].items():
+            script_times.setdefault(phase, []).append(seconds)
+        if not entry.get('ok', True):
+            errors[entry['script']] = errors.get(entry['script'], 0) + 1
+
+    summary = {}
+    for script, script_times in times.items():
+        phases = {}
+        for phase, values in script_times.items():
+            values.sort()
+            phases[phase] = {
+                'p%d' % percentile: get_percentile(values, percentile)
+                for percentile in PERCENTILES
+            }
+        summary[script] = {
+            'requests': len(script_times['total']),
+            'errors': errors.get(script, 0),
+            'phases': phases
+        }
+    return summary
+
+
+def print_summary(summary):
+    header = '%-26s %-8s' % ('script (requests, errors)', 'phase') + ''.join(
+        '%10s' % ('p%d ms' % percentile) for percentile in PERCENTILES
+    )
+    print(header)
+    print('-' * len(header))
+    for script in sorted(summary.keys()):
+        script_summary = summary[script]
+        label = '%s (%d, %d)' % (
+            script, script_summary['requests'], script_summary['errors']
+        )
+        for phase in timingutils.PHASES:
+            if phase not in script_summary['phases']:
+                continue
+            print(
+                '%-26s %-8s' % (label, phase) + ''.join(
+                    '%10.1f' % (
+                        1000 * script_summary['phases'][phase][
+                            'p%d' % percentile
+                        ]
+                    )
+                    for percentile in PERCENTILES
+                )
+            )
+            label = ''
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report request latency percentiles from the timing log.'
+    )
+    parser.add_argument(
+        '--log', default=config.TIMING_LOG,
+        help='the timing log (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--hours', type=float, default=24,
+        help='length of the window ending at --until, if --since is not '
+        'given (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--since', type=parse_time, help='start of the window (local time)'
+    )
+    parser.add_argument(
+        '--until', type=parse_time, help='end of the window (default: now)'
+    )
+    parser.add_argument(
+        '--json', action='store_true', help='print the summary as JSON'
+    )
+    args = parser.parse_args()
+
+    until = args.until if args.until is not None else time.time()
+    since = args.since if args.since is not None else \
+        until - 3600 * args.hours
+    summary = summarize(load_entries(args.log, since, until))
+    if args.json:
+        print(json.dumps(summary, indent=2, sort_keys=True))
+    elif len(summary) == 0:
+        print('No requests were logged in the window.')
+        sys.exit(1)
+    else:
+        print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()
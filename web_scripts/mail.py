@@ -1,19 +1,27 @@
+import os
 import smtplib
 from email.mime.text import MIMEText
 from xml.etree.ElementTree import Comment
 
 import db
 import creds
+import strutils
+import timingutils
 from datetime import datetime
 from config import EXPIRATION_BY_NUM_DAYS
 
 APPROVERS_LIST = "sipb-projectdb-approvers@mit.edu"
 # APPROVERS_LIST = 'markchil@mit.edu'
 SERVICE_EMAIL = "sipb-projectdb-bot@mit.edu" #Email identifying as coming from this service
+# PROJECTS_SMTP_HOST and PROJECTS_SMTP_PORT can point at a local stand-in, e.g.,
+# for load testing:
+SMTP_HOST = os.environ.get('PROJECTS_SMTP_HOST', 'outgoing.mit.edu')
+SMTP_PORT = int(os.environ.get('PROJECTS_SMTP_PORT', 25))
 
 ALL_PROJECTS_URL = "https://{locker}.scripts.mit.edu:444/projectlist.py".format(locker=creds.user)
 AWAITING_APPROVAL_URL = "https://{locker}.scripts.mit.edu:444/projectlist.py?filter_by=awaiting_approval".format(locker=creds.user)
 BASE_EDIT_URL = "https://{locker}.scripts.mit.edu:444/editproject.py?project_id=".format(locker=creds.user) #Need to provide project id at the end
+BASE_CONFIRM_URL = "https://{locker}.scripts.mit.edu:444/confirmproject.py?project_id=".format(locker=creds.user) #Need to provide project id at the end
 BASE_HISTORY_URL = "https://{locker}.scripts.mit.edu:444/projecthistory.py?project_id=".format(locker=creds.user) #Need to provide project id at the end
 
 ## Helper function
@@ -22,11 +30,16 @@ def get_point_of_contacts(project_info):
     """
     Given a project, return a list of strings of all the email contacts 
     associated with the project (including the creator)
+
+    Uses project_info['creator'] when present (e.g., for info loaded from the
+    database), so that no query is needed.
     """
-    creator_email = db.get_project_creator(project_info['project_id']) + '@mit.edu'
-    all_contacts = [creator_email]
+    creator = project_info.get('creator')
+    if creator is None:
+        creator = db.get_project_creator(project_info['project_id'])
+    all_contacts = [creator + '@mit.edu']
     for contact in project_info['contacts']:
-        if contact not in project_info['contacts']: #Avoid duplicates
+        if contact['email'] not in all_contacts: #Avoid duplicates
             all_contacts.append(contact['email'])
     return all_contacts
 
@@ -86,7 +99,8 @@ def format_project_contacts(contacts):
 
 
 def format_project_info(project_info):
-    """Format a string with all of the various project info.
+    """Format a string with all of the various project info. project_info can
+    be either a dict or a viewmodels.Project.
     """
     result = """
     Name: {name}
@@ -143,9 +157,10 @@ def send(recipients, sender, subject, message):
     else:
         raise Exception("Email recipient neither a list or a string")
     
-    s = smtplib.SMTP('outgoing.mit.edu', 25)
-    s.sendmail(sender, recipients, msg.as_string())
-    s.quit()
+    with timingutils.timed('mail'):
+        s = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+        s.sendmail(sender, recipients, msg.as_string())
+        s.quit()
 
 
 def send_to_approvers(project_info):
@@ -176,6 +191,55 @@ def send_to_approvers(project_info):
     send(APPROVERS_LIST,SERVICE_EMAIL,subject,msg)
 
 
+def send_import_summary_to_approvers(
+    project_info_list, importer_kerberos, initial_approval
+):
+    """Send one message to the approver mailing list summarizing a bulk import
+    (see projectimport.py), rather than one per project.
+    """
+    current_time = datetime.now().strftime("%H:%M:%S on %m/%d/%Y")
+    if initial_approval == 'awaiting_approval':
+        subject = "[Action Required] {num} imported SIPB projects need approval".format(
+            num=len(project_info_list)
+        )
+        status = "They are awaiting review. See the list of all projects that are awaiting approval here:\n    {url}".format(
+            url=AWAITING_APPROVAL_URL
+        )
+    else:
+        subject = "[NOTICE] {num} SIPB projects have been imported".format(
+            num=len(project_info_list)
+        )
+        status = "They have been approved. See the list of all projects here:\n    {url}".format(
+            url=ALL_PROJECTS_URL
+        )
+    msg = """
+    Dear SIPB Project Approvers,
+    
+    {importer} has imported the following {num} projects into the database:
+    
+    {names}
+    
+    {status}
+    
+    This email was generated as of {time}.
+    
+    Sincerely,
+    SIPB ProjectDB service bot
+    """.format(
+        importer=importer_kerberos,
+        num=len(project_info_list),
+        # Names loaded from JSON are unicode on Python 2, which would not fit
+        # into the encoded message:
+        names='\n    '.join(
+            strutils.encode_utf(project_info['name'])
+            for project_info in project_info_list
+        ),
+        status=status,
+        time=current_time)
+    
+    send(APPROVERS_LIST,SERVICE_EMAIL,subject,msg)
+
+
 def send_edit_notice_to_approvers(project_info, editor_kerberos):
     """Send a message to the approver mailing list notifying that a project has
     been edited.
@@ -290,10 +354,10 @@ def send_confirm_reminder_message(project_info,num_days_left):
     
     If you fail to renew the status of your project, of which you have {num_days} left, then your project will automatically be set to "inactive".
     
-    You can edit your project using the following link:
+    You can review and renew your project using the following link:
     {url}
     
-    Note: If no edits are needed, you can simply change your project's status back to "active" and click "Update Project" for a new expiration timestamp to be generated.
+    Note: If no edits are needed, you can simply click "Renew without changes" on that page for a new expiration timestamp to be generated.
     
     This email was generated as of {time}.
     
@@ -303,7 +367,7 @@ def send_confirm_reminder_message(project_info,num_days_left):
                time=current_time,
                policy_num_days=EXPIRATION_BY_NUM_DAYS,
                num_days=num_days_left,
-               url= BASE_EDIT_URL + str(project_info['project_id']))
+               url= BASE_CONFIRM_URL + str(project_info['project_id']))
     
     recipients = get_point_of_contacts(project_info) #No need to spam approvers with reminders
     send(recipients,SERVICE_EMAIL,subject,msg)
@@ -10,6 +10,8 @@ import db
 import formutils
 import mail
 import performutils
+import requestutils
+import staticexport
 import strutils
 import valutils
 
@@ -57,6 +59,7 @@ def main():
         else:
             message = None
 
+        staticexport.refresh_static_pages()
         page = performutils.format_success_page(
             project_id, 'Add Project', message=message
         )
@@ -69,4 +72,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    requestutils.run(main)
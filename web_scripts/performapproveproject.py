@@ -9,6 +9,8 @@ import db
 import formutils
 import mail
 import performutils
+import requestutils
+import staticexport
 import strutils
 import valutils
 
@@ -21,6 +23,7 @@ def main():
     arguments = cgi.FieldStorage()
     project_info = formutils.args_to_dict(arguments)
     project_id = formutils.safe_cgi_field_get(arguments, 'project_id')
+    version = formutils.safe_cgi_field_get(arguments, 'version', None)
     approval_action = formutils.safe_cgi_field_get(
         arguments, 'approval_action'
     )
@@ -28,18 +31,29 @@ def main():
         arguments, 'approver_comments'
     )
     approver_kerberos = authutils.get_kerberos()
-    is_ok, status_messages = valutils.validate_project_id(project_id)
+    # Load everything the validation needs from the database at once:
+    context = valutils.ValidationContext(
+        project_id=project_id, name=project_info['name']
+    )
+    is_ok, status_messages = valutils.validate_project_id(
+        project_id, context=context
+    )
     if is_ok:
         is_ok, status_messages = valutils.validate_approve_project(
-            project_info, project_id, approval_action, approver_comments
+            project_info, project_id, approval_action, approver_comments,
+            context=context
         )
 
     if is_ok:
         try:
             db.update_project(
-                project_info, project_id, authutils.get_kerberos()
+                project_info, project_id, authutils.get_kerberos(),
+                expected_version=version
             )
             project_info['project_id'] = project_id
+        except db.ConcurrentEditError:
+            is_ok = False
+            status_messages = [performutils.CONCURRENT_EDIT_MESSAGE]
         except Exception:
             is_ok = False
             status = ''
@@ -80,6 +94,7 @@ def main():
         raise ValueError('Unknown approval action!')
 
     if is_ok:
+        staticexport.refresh_static_pages()
         page = performutils.format_success_page(project_id, title)
         mail_action(project_info, approver_kerberos, approver_comments)
     else:
@@ -91,4 +106,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    requestutils.run(main)
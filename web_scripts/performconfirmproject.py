@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import performutils
+import requestutils
 
 # TODO: May want to turn error listing off once stable?
 import cgitb
@@ -13,4 +14,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    requestutils.run(main)
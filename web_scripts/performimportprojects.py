@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cgi
+import traceback
+
+import authutils
+import formutils
+import performutils
+import projectimport
+import requestutils
+import strutils
+import templateutils
+import valutils
+
+# TODO: May want to turn error listing off once stable?
+import cgitb
+cgitb.enable()
+
+
+def format_success_page(project_info_list, warnings=None):
+    """Format the page listing the imported projects.
+
+    Parameters
+    ----------
+    project_info_list : list of dict
+        The project info for each project, including 'project_id'.
+    warnings : list of str, optional
+        Problems which did not stop the import (e.g., the approvers could not
+        be emailed).
+
+    Returns
+    -------
+    result : str
+        The HTML to display.
+    """
+    jenv = templateutils.get_jenv()
+    user = authutils.get_kerberos()
+    result = ''
+    result += 'Content-type: text/html\n\n'
+    result += jenv.get_template('importprojectssuccess.html').render(
+        projects=strutils.decode_utf_nested_dict_list(project_info_list),
+        warnings=strutils.decode_utf_nested_dict_list(warnings or []),
+        user=user,
+        authlink=authutils.get_auth_url(True),
+        deauthlink=authutils.get_base_url(False) + '/projectlist.py',
+        can_add=authutils.can_add(user)
+    ).encode('utf-8')
+    return result
+
+
+def main():
+    """Respond to an import projects request, displaying the appropriate
+    status message.
+    """
+    arguments = cgi.FieldStorage()
+    is_ok, status_messages = valutils.validate_import_permission()
+
+    if is_ok:
+        if 'projects_file' in arguments:
+            upload = arguments['projects_file']
+            file_format = formutils.safe_cgi_field_get(
+                arguments, 'format'
+            ) or projectimport.get_format(upload.filename or '')
+            try:
+                project_info_list = projectimport.load_projects(
+                    upload.value, file_format
+                )
+            except ValueError as e:
+                is_ok = False
+                status_messages = ['Could not read the file: %s' % e]
+        else:
+            is_ok = False
+            status_messages = ['No file was uploaded!']
+
+    if is_ok:
+        try:
+            # Admins do not need approval, as in performaddproject.py:
+            is_ok, status_messages, project_ids = \
+                projectimport.import_projects(
+                    project_info_list, authutils.get_kerberos(),
+                    initial_approval='approved', send_mail=True
+                )
+        except Exception:
+            is_ok = False
+            status = ''
+            status += 'import_projects failed with the following exception:\n'
+            status += traceback.format_exc()
+            status_messages = [status]
+
+    if is_ok:
+        for project_info, project_id in zip(project_info_list, project_ids):
+            project_info['project_id'] = project_id
+        page = format_success_page(project_info_list, status_messages)
+    else:
+        page = performutils.format_failure_page(
+            strutils.html_listify(status_messages), 'Import Projects'
+        )
+
+    print(page)
+
+
+if __name__ == '__main__':
+    requestutils.run(main)
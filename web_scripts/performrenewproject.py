@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cgi
+import traceback
+
+import authutils
+import db
+import formutils
+import performutils
+import requestutils
+import strutils
+import valutils
+
+# TODO: May want to turn error listing off once stable?
+import cgitb
+cgitb.enable()
+
+
+def main():
+    """Respond to a renew project request, displaying the appropriate status
+    message.
+    """
+    arguments = cgi.FieldStorage()
+    project_id = formutils.safe_cgi_field_get(arguments, 'project_id')
+    editor_kerberos = authutils.get_kerberos()
+    # Load everything the validation needs from the database at once:
+    context = valutils.ValidationContext(
+        project_id=project_id, user=editor_kerberos
+    )
+    is_ok, status_messages = valutils.validate_project_id(
+        project_id, context=context
+    )
+    if is_ok:
+        is_ok, status_messages = valutils.validate_renew_project(
+            project_id, context=context
+        )
+
+    if is_ok:
+        try:
+            db.renew_project(project_id, editor_kerberos)
+        except Exception:
+            is_ok = False
+            status = ''
+            status += 'renew_project failed with the following exception:\n'
+            status += traceback.format_exc()
+            status_messages = [status]
+
+    if is_ok:
+        page = performutils.format_success_page(
+            project_id, 'Renew Project',
+            message=(
+                'The project has been renewed. Its expiration date is now '
+                'calculated from today.'
+            )
+        )
+    else:
+        page = performutils.format_failure_page(
+            strutils.html_listify(status_messages), 'Renew Project'
+        )
+
+    print(page)
+
+
+if __name__ == '__main__':
+    requestutils.run(main)
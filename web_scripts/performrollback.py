@@ -9,6 +9,8 @@ import db
 import formutils
 import mail
 import performutils
+import requestutils
+import staticexport
 import strutils
 import valutils
 
@@ -32,16 +34,19 @@ def main():
             project_id, revision_id=revision_id
         )
         requires_approval = authutils.requires_approval(editor_kerberos)
-        if requires_approval:
-            name_changed = performutils.check_for_name_change(
-                project_info, project_id
-            )
-            details_changed = performutils.check_for_info_change(
-                project_info, project_id
-            )
 
         try:
-            db.rollback_project(project_id, revision_id, editor_kerberos)
+            change_set = db.diff_project(
+                project_info, project_id, fields=db.PROJECT_UPDATE_FIELDS
+            )
+            name_changed = change_set.name_changed(ignore_case=True)
+            details_changed = change_set.is_changed(
+                ignore_case=True, fields=db.PROJECT_DETAIL_FIELDS
+            )
+            db.rollback_project(
+                project_id, revision_id, editor_kerberos,
+                change_set=change_set
+            )
         except Exception:
             is_ok = False
             status = ''
@@ -94,6 +99,7 @@ def main():
         else:
             message = None
 
+        staticexport.refresh_static_pages()
         page = performutils.format_success_page(
             project_id, 'Roll Back Project', message=message
         )
@@ -106,4 +112,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    requestutils.run(main)
@@ -3,12 +3,20 @@ import traceback
 
 import authutils
 import db
+import diffutils
 import formutils
 import mail
+import staticexport
 import strutils
 import templateutils
 import valutils
 
+CONCURRENT_EDIT_MESSAGE = (
+    'Someone else changed this project while you were editing it, so your '
+    'changes have not been saved. Please reload the project and make your '
+    'changes again.'
+)
+
 
 def check_for_name_change(project_info, project_id):
     """Check if the project name in the provided project_info dict matches the
@@ -27,9 +35,10 @@ def check_for_name_change(project_info, project_id):
         Whether or not the project name in the provided project_info dict
         matches the name in the database.
     """
-    return (
-        project_info['name'].lower() != db.get_project_name(project_id).lower()
+    change_set = db.diff_project(
+        {'name': project_info['name']}, project_id, fields=['name']
     )
+    return change_set.name_changed(ignore_case=True)
 
 
 def nullable_case_insensitive_equals(a, b):
@@ -47,22 +56,17 @@ def nullable_case_insensitive_equals(a, b):
     is_equal : bool
         Whether or not the two strings are equal.
     """
-    if (a is None) and (b is None):
-        return True
-    elif (a is not None) and (b is not None):
-        return a.lower() == b.lower()
-    elif (a is None) and (b is not None) and (len(b) == 0):
-        return True
-    elif (b is None) and (a is not None) and (len(a) == 0):
-        return True
-    else:
-        return False
+    return diffutils.values_equal(a, b, ignore_case=True)
 
 
 def check_for_info_change(project_info, project_id):
     """Check if the fields in the provided project_info dict have changed from
     the values in the database. The check is case-insensitive.
 
+    When the project is also going to be updated, prefer calling
+    db.diff_project directly and passing the change set on, so that the
+    project is only read once.
+
     Parameters
     ----------
     project_info : dict
@@ -76,93 +80,8 @@ def check_for_info_change(project_info, project_id):
         Whether or not the project details in the provided project_info dict
         match those in the database.
     """
-    # TODO: Would be better for this to crawl the schema and build the checks
-    # automatically...
-    db_project_info = db.get_all_info_for_project(project_id)
-
-    if db_project_info['name'].lower() != project_info['name'].lower():
-        return True
-
-    if (
-        db_project_info['description'].lower() !=
-        project_info['description'].lower()
-    ):
-        return True
-
-    if db_project_info['status'] != project_info['status']:
-        return True
-
-    if len(db_project_info['links']) != len(project_info['links']):
-        return True
-    else:
-        for db_link, link in zip(
-            db_project_info['links'], project_info['links']
-        ):
-            if db_link['link'].lower() != link['link'].lower():
-                return True
-
-            if db_link['index'] != link['index']:
-                return True
-
-            if not nullable_case_insensitive_equals(
-                db_link['anchortext'], link['anchortext']
-            ):
-                return True
-
-    if (
-        len(db_project_info['comm_channels']) !=
-        len(project_info['comm_channels'])
-    ):
-        return True
-    else:
-        for db_comm_channel, comm_channel in zip(
-            db_project_info['comm_channels'], project_info['comm_channels']
-        ):
-            if (
-                db_comm_channel['commchannel'].lower() !=
-                comm_channel['commchannel'].lower()
-            ):
-                return True
-
-            if db_comm_channel['index'] != comm_channel['index']:
-                return True
-
-    if len(db_project_info['roles']) != len(project_info['roles']):
-        return True
-    else:
-        for db_role, role in zip(
-            db_project_info['roles'], project_info['roles']
-        ):
-            if db_role['role'].lower() != role['role'].lower():
-                return True
-
-            if db_role['description'].lower() != role['description'].lower():
-                return True
-
-            if not nullable_case_insensitive_equals(
-                db_role['prereq'], role['prereq']
-            ):
-                return True
-
-            if db_role['index'] != role['index']:
-                return True
-
-    if len(db_project_info['contacts']) != len(project_info['contacts']):
-        return True
-    else:
-        for db_contact, contact in zip(
-            db_project_info['contacts'], project_info['contacts']
-        ):
-            if db_contact['type'] != contact['type']:
-                return True
-
-            if db_contact['email'].lower() != contact['email'].lower():
-                return True
-
-            if db_contact['index'] != contact['index']:
-                return True
-
-    return False
+    change_set = db.diff_project(project_info, project_id)
+    return change_set.is_changed(ignore_case=True)
 
 
 def format_success_page(project_id, operation, message=None):
@@ -239,22 +158,37 @@ def edit_confirm_main(task):
     arguments = cgi.FieldStorage()
     project_info = formutils.args_to_dict(arguments)
     project_id = formutils.safe_cgi_field_get(arguments, 'project_id')
+    version = formutils.safe_cgi_field_get(arguments, 'version', None)
     editor_kerberos = authutils.get_kerberos()
-    is_ok, status_messages = valutils.validate_project_id(project_id)
+    # Load everything the validation needs from the database at once:
+    context = valutils.ValidationContext(
+        project_id=project_id, name=project_info['name'], user=editor_kerberos
+    )
+    is_ok, status_messages = valutils.validate_project_id(
+        project_id, context=context
+    )
     if is_ok:
         is_ok, status_messages = valutils.validate_edit_project(
-            project_info, project_id
+            project_info, project_id, context=context
         )
 
     if is_ok:
         requires_approval = authutils.requires_approval(editor_kerberos)
-        if requires_approval:
-            name_changed = check_for_name_change(project_info, project_id)
-            details_changed = check_for_info_change(project_info, project_id)
 
         try:
-            db.update_project(project_info, project_id, editor_kerberos)
+            # The same change set drives the approver notifications below and
+            # the write, so the project is only read once:
+            change_set = db.diff_project(project_info, project_id)
+            name_changed = change_set.name_changed(ignore_case=True)
+            details_changed = change_set.is_changed(ignore_case=True)
+            db.update_project(
+                project_info, project_id, editor_kerberos,
+                change_set=change_set, expected_version=version
+            )
             project_info['project_id'] = project_id
+        except db.ConcurrentEditError:
+            is_ok = False
+            status_messages = [CONCURRENT_EDIT_MESSAGE]
         except Exception:
             is_ok = False
             status = ''
@@ -303,6 +237,7 @@ def edit_confirm_main(task):
         else:
             message = None
 
+        staticexport.refresh_static_pages()
         page = format_success_page(
             project_id, '%s Project' % task, message=message
         )
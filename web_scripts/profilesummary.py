@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""Summarize the profiles which admins have requested with ?profile=1 (see
+requestutils.run), combining the most recent ones.
+
+Usage:
+
+    python profilesummary.py [--script projectlist.py] [--recent 10]
+        [--top 25] [--sort cumulative]
+
+Prints the profiles used, then the top functions across all of them.
+"""
+
+from __future__ import print_function
+
+import argparse
+import glob
+import os
+import pstats
+import sys
+
+import config
+
+
+def find_profiles(profile_dir, script=None, num_recent=10):
+    """Find the most recent profiles.
+
+    Parameters
+    ----------
+    profile_dir : str
+        The directory the profiles are in.
+    script : str, optional
+        Only include the profiles of this script (e.g., 'projectlist.py').
+        Default is to include all of them.
+    num_recent : int, optional
+        The number of profiles to return. Default is 10.
+
+    Returns
+    -------
+    paths : list of str
+        The profiles, newest first.
+    """
+    pattern = '%s-*.prof' % (script if script is not None else '*')
+    paths = glob.glob(os.path.join(profile_dir, pattern))
+    paths.sort(key=os.path.getmtime, reverse=True)
+    return paths[:num_recent]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Summarize the most recent request profiles.'
+    )
+    parser.add_argument(
+        '--dir', default=config.PROFILE_DIR,
+        help='directory containing the profiles (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--script', help='only include profiles of this script'
+    )
+    parser.add_argument(
+        '--recent', type=int, default=10,
+        help='number of recent profiles to combine (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--top', type=int, default=25,
+        help='number of functions to list (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--sort', default='cumulative',
+        choices=['cumulative', 'tottime', 'calls'],
+        help='order to list the functions in (default: %(default)s)'
+    )
+    args = parser.parse_args()
+
+    paths = find_profiles(args.dir, args.script, args.recent)
+    if len(paths) == 0:
+        print('No profiles found in %s.' % args.dir)
+        sys.exit(1)
+
+    print('Combining %d profile(s):' % len(paths))
+    for path in paths:
+        print('    ' + os.path.basename(path))
+    stats = pstats.Stats(*paths)
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,53 +6,114 @@ import cgi
 import authutils
 import db
 import formutils
+import requestutils
 import strutils
 import templateutils
+import valutils
 
 # TODO: May want to turn error listing off once stable?
 import cgitb
 cgitb.enable()
 
 
-def format_project_history(project_history, project_id):
-    """Format a list of project revisions into an HTML page.
+def format_project_history(
+    project_history, project_id, page=0, has_older=False, snapshot=False
+):
+    """Format a list of project revisions into an HTML page for the current
+    user.
 
     Parameters
     ----------
     project_history : list of dict
-        The project revisions to list.
+        The project revisions to list (see render_project_history).
+    project_id : int
+        The project ID.
+    page : int, optional
+        The page of revisions being shown. Default is 0 (the newest).
+    has_older : bool, optional
+        Whether or not there are older revisions on later pages. Default is
+        False.
+    snapshot : bool, optional
+        If True, the full contents of each revision are shown instead of the
+        changes. Default is False.
 
     Returns
     -------
     result : str
         The HTML to display.
     """
-    jenv = templateutils.get_jenv()
-    user = authutils.get_kerberos()
-    user_email = authutils.get_email()
-    authlink = authutils.get_auth_url(True)
-    deauthlink = authutils.get_auth_url(False)
-    can_add = authutils.can_add(user)
-    can_edit = authutils.can_edit(user, project_id)
-
     result = ''
     result += 'Content-type: text/html\n\n'
-    result += jenv.get_template('projecthistory.html').render(
+    result += render_project_history(
+        project_history,
+        project_id,
+        authutils.get_kerberos(),
+        authutils.get_email(),
+        authutils.get_auth_url(True),
+        authutils.get_auth_url(False),
+        page=page,
+        has_older=has_older,
+        snapshot=snapshot
+    )
+    return result
+
+
+def render_project_history(
+    project_history, project_id, user, user_email, authlink, deauthlink,
+    page=0, has_older=False, snapshot=False
+):
+    """Render the HTML for a list of project revisions, as seen by the given
+    user.
+
+    Parameters
+    ----------
+    project_history : list of dict
+        The project revisions to list. Unless snapshot is True, each revision
+        must have the output of db.diff_revisions in its 'changes' key.
+    project_id : int
+        The project ID.
+    user : str or None
+        The kerberos of the user, or None for an anonymous visitor.
+    user_email : str or None
+        The email of the user.
+    authlink, deauthlink : str
+        The URLs to sign in and out.
+    page : int, optional
+        The page of revisions being shown. Default is 0 (the newest).
+    has_older : bool, optional
+        Whether or not there are older revisions on later pages. Default is
+        False.
+    snapshot : bool, optional
+        If True, the full contents of each revision are shown instead of the
+        changes. Default is False.
+
+    Returns
+    -------
+    html : str
+        The encoded HTML, without the Content-type header.
+    """
+    jenv = templateutils.get_jenv()
+    return jenv.get_template('projecthistory.html').render(
         project_history=project_history,
         user=user,
         user_email=user_email,
         authlink=authlink,
         deauthlink=deauthlink,
-        can_add=can_add,
-        can_edit=can_edit,
-        project_id=project_id
+        can_add=authutils.can_add(user),
+        can_edit=authutils.can_edit(user, project_id),
+        project_id=project_id,
+        page=page,
+        has_older=has_older,
+        snapshot=snapshot
     ).encode('utf-8')
-    return result
 
 
 def main():
-    """Display the info for all project revisions.
+    """Display the changes made by each revision of a project, newest first
+    and one page at a time, or the full contents of a single revision if
+    revision_id is given.
     """
+    db.allow_replica_reads()
     arguments = cgi.FieldStorage()
     project_id = formutils.safe_cgi_field_get(
         arguments, 'project_id', default=None
@@ -61,11 +122,41 @@ def main():
     if project_id is None:
         raise RuntimeError('No project ID specified!')
 
-    project_history = db.get_project_history(project_id)
-    project_history = strutils.decode_utf_nested_dict_list(project_history)
-    page = format_project_history(project_history, project_id)
+    revision_id = formutils.safe_cgi_field_get(
+        arguments, 'revision_id', default=None
+    )
+    if revision_id is not None:
+        is_ok, status_messages = valutils.validate_revision_id(
+            project_id, revision_id
+        )
+        # TODO: this should show a proper error page
+        if not is_ok:
+            raise RuntimeError('; '.join(status_messages))
+        project_history = db.get_revision_snapshot(project_id, revision_id)
+        project_history = strutils.decode_utf_nested_dict_list(
+            project_history
+        )
+        page = format_project_history(
+            project_history, project_id, snapshot=True
+        )
+    else:
+        try:
+            page_num = max(
+                int(formutils.safe_cgi_field_get(arguments, 'page', '0')), 0
+            )
+        except ValueError:
+            page_num = 0
+        project_history, has_older = db.get_project_history_page(
+            project_id, page=page_num
+        )
+        project_history = strutils.decode_utf_nested_dict_list(
+            project_history
+        )
+        page = format_project_history(
+            project_history, project_id, page=page_num, has_older=has_older
+        )
     print(page)
 
 
 if __name__ == '__main__':
-    main()
+    requestutils.run(main)
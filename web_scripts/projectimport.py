@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+"""Import many projects at once from a JSON Lines or CSV file, e.g., to seed
+or migrate the database. The whole file is validated with the same rules as
+the add project form before anything is written, then every project is added
+in one transaction and the approvers get one summary email.
+
+Usage:
+
+    python projectimport.py projects.jsonl --creator KERB
+        [--format jsonl|csv] [--approval awaiting_approval|approved]
+        [--dry-run] [--no-mail]
+
+Each line of a JSON Lines file is a project, e.g.:
+
+    {"name": "...", "description": "...", "status": "active",
+     "contacts": ["kerb@mit.edu"], "comm_channels": ["list@mit.edu"],
+     "links": [{"link": "https://...", "anchortext": "..."}],
+     "roles": [{"role": "...", "description": "...", "prereq": null}]}
+
+Links may also be given as plain URLs. The columns of a CSV file are the
+fields of the add project form: name, description, status, contacts and
+comm_channels (comma-separated), link_N and anchortext_N, and role_name_N,
+role_description_N, and role_prereqs_N. Admins can also import a file
+through importprojects.py.
+"""
+
+from __future__ import print_function
+
+import argparse
+import cgi
+import csv
+import json
+import sys
+import traceback
+
+import db
+import formutils
+import mail
+import staticexport
+import strutils
+import valutils
+
+FORMATS = ['jsonl', 'csv']
+
+
+class RowFields(object):
+    def __init__(self, row):
+        """Adapter which lets formutils read a CSV row as if it were the
+        cgi.FieldStorage of the add project form.
+
+        Parameters
+        ----------
+        row : dict
+            The row, from csv.DictReader.
+        """
+        self.row = {
+            key: value for key, value in row.items()
+            if (key is not None) and (value is not None)
+        }
+
+    def __contains__(self, key):
+        return key in self.row
+
+    def __getitem__(self, key):
+        return cgi.MiniFieldStorage(key, self.row[key])
+
+    def keys(self):
+        return list(self.row.keys())
+
+
+def get_format(path):
+    """Guess the format of a file from its name.
+    """
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def get_text(entry):
+    """Get the text of a list entry in a JSON Lines project, which may be a
+    plain string or a dict with the text under a single key.
+    """
+    if isinstance(entry, dict):
+        if len(entry) != 1:
+            raise ValueError('Expected a string, got %r.' % entry)
+        return list(entry.values())[0]
+    return entry
+
+
+def project_from_json(value):
+    """Convert a project from a JSON Lines file to the project info format
+    used by the add project form.
+
+    Parameters
+    ----------
+    value : dict
+        The project, as decoded from JSON.
+
+    Returns
+    -------
+    project_info : dict
+        The project info dict.
+    """
+    if not isinstance(value, dict):
+        raise ValueError('Each line must be a JSON object.')
+
+    links = []
+    for index, link in enumerate(value.get('links', [])):
+        if not isinstance(link, dict):
+            link = {'link': link}
+        links.append(
+            {
+                'link': strutils.make_url_absolute(link.get('link', '')),
+                'anchortext': link.get('anchortext') or None,
+                'index': index
+            }
+        )
+    roles = []
+    for index, role in enumerate(value.get('roles', [])):
+        roles.append(
+            {
+                'role': role.get('role', ''),
+                'description': role.get('description', ''),
+                'prereq': role.get('prereq') or None,
+                'index': index
+            }
+        )
+    return {
+        'name': value.get('name', ''),
+        'description': value.get('description', ''),
+        'status': value.get('status', 'active'),
+        'links': links,
+        'comm_channels': formutils.index_dictify_list(
+            [get_text(channel) for channel in value.get('comm_channels', [])],
+            'commchannel'
+        ),
+        'contacts': formutils.contact_list_to_dict_list(
+            [get_text(contact) for contact in value.get('contacts', [])]
+        ),
+        'roles': roles
+    }
+
+
+def load_projects(data, file_format):
+    """Parse the projects in a file.
+
+    Parameters
+    ----------
+    data : str
+        The contents of the file.
+    file_format : {'jsonl', 'csv'}
+        The format of the file.
+
+    Returns
+    -------
+    project_info_list : list of dict
+        The project info for each project, in the format used by the add
+        project form.
+
+    Raises
+    ------
+    ValueError
+        If the file cannot be parsed. The message says where.
+    """
+    if not isinstance(data, str):
+        data = data.decode('utf-8')
+
+    project_info_list = []
+    if file_format == 'csv':
+        # Keep the line endings, in case a quoted field spans lines:
+        for row in csv.DictReader(data.splitlines(True)):
+            project_info_list.append(formutils.args_to_dict(RowFields(row)))
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(data.splitlines(), start=1):
+            if len(line.strip()) == 0:
+                continue
+            try:
+                project_info_list.append(project_from_json(json.loads(line)))
+            except (ValueError, AttributeError, TypeError) as e:
+                raise ValueError('Line %d: %s' % (line_number, e))
+    else:
+        raise ValueError('Unknown format "%s"!' % file_format)
+    return project_info_list
+
+
+def import_projects(
+    project_info_list, creator_kerberos, initial_approval='awaiting_approval',
+    send_mail=True
+):
+    """Validate and add several projects, then refresh the static pages and
+    send the approvers one summary email. Nothing is added unless every
+    project is valid. The projects are committed before the email is sent, so
+    if it cannot be sent the import still succeeds, with a warning.
+
+    Parameters
+    ----------
+    project_info_list : list of dict
+        The project info for each project, from load_projects.
+    creator_kerberos : str
+        The kerberos of the user importing the projects, who is recorded as
+        their creator.
+    initial_approval : {'awaiting_approval', 'approved'}, optional
+        The approval status of the new projects. Default is
+        'awaiting_approval'.
+    send_mail : bool, optional
+        Whether or not to email the approvers. Default is True.
+
+    Returns
+    -------
+    is_ok : bool
+        Whether or not the projects were added.
+    status_messages : list of str
+        The problems with the projects, if they were not added, or a warning
+        if they were added but the approvers could not be emailed.
+    project_ids : list of int
+        The IDs of the new projects.
+    """
+    is_ok, status_messages = valutils.validate_import_projects(
+        project_info_list
+    )
+    if not is_ok:
+        return False, status_messages, []
+
+    project_ids = db.add_projects(
+        project_info_list, creator_kerberos, initial_approval=initial_approval
+    )
+    staticexport.refresh_static_pages()
+    status_messages = []
+    if send_mail:
+        try:
+            mail.send_import_summary_to_approvers(
+                project_info_list, creator_kerberos, initial_approval
+            )
+        except Exception:
+            print(
+                'Could not email the approvers about the import:\n' +
+                traceback.format_exc(),
+                file=sys.stderr
+            )
+            status_messages.append(
+                'The projects were imported, but the approvers could not be '
+                'emailed about them.'
+            )
+    return True, status_messages, project_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Import projects from a JSON Lines or CSV file.'
+    )
+    parser.add_argument('path', help='the file to import')
+    parser.add_argument(
+        '--creator', required=True,
+        help='kerberos to record as the creator of the projects'
+    )
+    parser.add_argument(
+        '--format', choices=FORMATS,
+        help='format of the file (default: from its extension)'
+    )
+    parser.add_argument(
+        '--approval', choices=['awaiting_approval', 'approved'],
+        default='awaiting_approval',
+        help='approval status of the new projects (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help='only validate the file'
+    )
+    parser.add_argument(
+        '--no-mail', action='store_true',
+        help='do not email the approvers'
+    )
+    args = parser.parse_args()
+    # staticexport imports projectlist, which enables cgitb, which would turn
+    # tracebacks into HTML:
+    sys.excepthook = sys.__excepthook__
+
+    with open(args.path, 'rb') as f:
+        data = f.read()
+    try:
+        project_info_list = load_projects(
+            data, args.format or get_format(args.path)
+        )
+    except ValueError as e:
+        print('Could not read %s: %s' % (args.path, e))
+        sys.exit(1)
+
+    if args.dry_run:
+        is_ok, status_messages = valutils.validate_import_projects(
+            project_info_list
+        )
+        project_ids = []
+    else:
+        is_ok, status_messages, project_ids = import_projects(
+            project_info_list, args.creator, initial_approval=args.approval,
+            send_mail=not args.no_mail
+        )
+    for message in status_messages:
+        print(message)
+    if not is_ok:
+        print('Nothing was imported.')
+        sys.exit(1)
+    elif args.dry_run:
+        print('All %d projects are valid.' % len(project_info_list))
+    else:
+        print('Imported %d projects.' % len(project_ids))
+
+
+if __name__ == '__main__':
+    main()
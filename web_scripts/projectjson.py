@@ -2,28 +2,33 @@
 # -*- coding: utf-8 -*-
 
 import db
-import json
-import templateutils
+import requestutils
 
 # TODO: May want to turn error listing off once stable?
 import cgitb
 cgitb.enable()
 
+def format_project_json():
+    """Format the info for all approved projects as JSON.
+
+    The stored document of each project is copied into the output as it is,
+    rather than being loaded and serialized again. Datetimes are strings in
+    the format str() gives them.
+    """
+    return '{"projects": [%s]}' % ', '.join(
+        db.get_project_list_documents('approved')
+    )
+
+
 def main():
     """Display the info for all projects.
     """
-    
-    jenv = templateutils.get_jenv()
-    all_projects_list = db.list_dict_convert(db.get_all_project_info('approved') ,remove_sql_ref=True)
-    # https://stackoverflow.com/a/36142844/5031798, converts datetimes to str although
-    # not in a very machine parseable way
-    all_projects_json = json.dumps({"projects": all_projects_list}, default=str)
-    
+    db.allow_replica_reads()
     result = ''
     result += 'Content-type: application/json\n\n'
-    result += all_projects_json
+    result += format_project_json()
     print(result)
 
 
 if __name__ == '__main__':
-    main()
+    requestutils.run(main, html=False)
@@ -6,7 +6,7 @@ import cgi
 import authutils
 import db
 import formutils
-import strutils
+import requestutils
 import templateutils
 
 # TODO: May want to turn error listing off once stable?
@@ -15,11 +15,11 @@ cgitb.enable()
 
 
 def format_project_list(project_list, filter_method, contact_email):
-    """Format a list of projects into an HTML page.
+    """Format a list of projects into an HTML page for the current user.
 
     Parameters
     ----------
-    project_list : list of dict
+    project_list : list of viewmodels.Project
         The projects to list.
 
     Returns
@@ -27,15 +27,82 @@ def format_project_list(project_list, filter_method, contact_email):
     result : str
         The HTML to display.
     """
-    jenv = templateutils.get_jenv()
-    user = authutils.get_kerberos()
-    user_email = authutils.get_email()
+    result = ''
+    result += 'Content-type: text/html\n\n'
+    result += render_project_list(
+        project_list,
+        filter_method,
+        contact_email,
+        authutils.get_kerberos(),
+        authutils.get_email(),
+        authutils.get_auth_url(True),
+        authutils.get_auth_url(False)
+    )
+    return result
+
+
+def render_project_rows(project_list, user):
+    """Render the table rows (projectrow.html) for each of a list of projects,
+    as seen by the given user.
+
+    Parameters
+    ----------
+    project_list : list of viewmodels.Project
+        The projects.
+    user : str or None
+        The kerberos of the user, or None for an anonymous visitor.
+
+    Returns
+    -------
+    rendered_rows : list of str
+        The (unicode) HTML fragment for each project.
+    """
+    template = templateutils.get_jenv().get_template('projectrow.html')
     project_list = authutils.enrich_project_list_with_permissions(
         user, project_list
     )
-    project_list = strutils.decode_utf_nested_dict_list(project_list)
-    authlink = authutils.get_auth_url(True)
-    deauthlink = authutils.get_auth_url(False)
+    return [
+        template.render(project=project, user=user)
+        for project in project_list
+    ]
+
+
+def render_project_list(
+    project_list, filter_method, contact_email, user, user_email, authlink,
+    deauthlink, rendered_rows=None
+):
+    """Render the HTML for a list of projects, as seen by the given user.
+
+    Parameters
+    ----------
+    project_list : list of viewmodels.Project
+        The projects to list. Ignored if rendered_rows is provided.
+    filter_method : str
+        The filter the projects were selected with (see
+        db.get_all_project_info).
+    contact_email : str or None
+        The contact email, when filter_method is 'contact'.
+    user : str or None
+        The kerberos of the user, or None for an anonymous visitor.
+    user_email : str or None
+        The email of the user.
+    authlink, deauthlink : str
+        The URLs to sign in and out.
+    rendered_rows : list of str, optional
+        The rows for each project, already rendered for the given user with
+        render_project_rows (e.g., from a cache). Default is to render the
+        rows of project_list.
+
+    Returns
+    -------
+    html : str
+        The encoded HTML, without the Content-type header.
+    """
+    jenv = templateutils.get_jenv()
+    if rendered_rows is None:
+        project_list = authutils.enrich_project_list_with_permissions(
+            user, project_list
+        )
     can_add = authutils.can_add(user)
     can_approve = authutils.can_approve(user)
 
@@ -52,10 +119,9 @@ def format_project_list(project_list, filter_method, contact_email):
     else:
         raise ValueError('Unknown filter method!')
 
-    result = ''
-    result += 'Content-type: text/html\n\n'
-    result += jenv.get_template('projectlist.html').render(
+    return jenv.get_template('projectlist.html').render(
         project_list=project_list,
+        rendered_rows=rendered_rows,
         user=user,
         user_email=user_email,
         authlink=authlink,
@@ -64,12 +130,12 @@ def format_project_list(project_list, filter_method, contact_email):
         title=title,
         can_approve=can_approve
     ).encode('utf-8')
-    return result
 
 
 def main():
     """Display the info for all projects.
     """
+    db.allow_replica_reads()
     arguments = cgi.FieldStorage()
     filter_method = formutils.safe_cgi_field_get(
         arguments, 'filter_by', default='active'
@@ -82,7 +148,7 @@ def main():
     else:
         contact_email = None
 
-    project_list = db.get_all_project_info(
+    project_list = db.get_all_project_views(
         filter_method=filter_method, contact_email=contact_email
     )
     page = format_project_list(project_list, filter_method, contact_email)
@@ -90,4 +156,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    requestutils.run(main)
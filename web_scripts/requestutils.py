@@ -0,0 +1,244 @@
+import cProfile
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import time
+import traceback
+
+try:
+    from urllib.parse import parse_qs
+except ImportError:
+    from urlparse import parse_qs
+
+import authutils
+import config
+import sqlstats
+import timingutils
+
+timing_logger = logging.getLogger('projectdb.timing')
+timing_logger.propagate = False
+timing_logger.setLevel(logging.INFO)
+
+
+def write_log_line(line):
+    """Append a line to config.SQL_STATS_LOG, or to stderr (the server's
+    error log) if it is None. Logging must never break a page, so errors are
+    ignored.
+    """
+    try:
+        if config.SQL_STATS_LOG is None:
+            sys.stderr.write(line + '\n')
+        else:
+            log_dir = os.path.dirname(os.path.abspath(config.SQL_STATS_LOG))
+            if not os.path.isdir(log_dir):
+                os.makedirs(log_dir)
+            with open(config.SQL_STATS_LOG, 'a') as f:
+                f.write(line + '\n')
+    except (IOError, OSError):
+        pass
+
+
+def get_timing_handler():
+    """Get the handler which writes to config.TIMING_LOG, (re)creating it if
+    the setting has changed.
+    """
+    path = os.path.abspath(config.TIMING_LOG)
+    for handler in list(timing_logger.handlers):
+        if handler.baseFilename == path:
+            return handler
+        timing_logger.removeHandler(handler)
+        handler.close()
+
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    # Several processes may append to the log at once, and each line is
+    # written whole. Rotation is not coordinated between processes, so a few
+    # lines may land in a backup at the moment the log rotates.
+    handler = logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=config.TIMING_LOG_MAX_BYTES,
+        backupCount=config.TIMING_LOG_BACKUP_COUNT
+    )
+    timing_logger.addHandler(handler)
+    return handler
+
+
+def get_phase_times(start_time, main_start_time, end_time, db_seconds):
+    """Work out the time spent in each phase of a request.
+
+    Parameters
+    ----------
+    start_time : float
+        When the process started.
+    main_start_time : float
+        When main was called.
+    end_time : float
+        When main returned.
+    db_seconds : float
+        The time spent executing SQL.
+
+    Returns
+    -------
+    phases : dict
+        Maps each of timingutils.PHASES to the time spent in it, in seconds.
+    """
+    phases = {
+        'startup': main_start_time - start_time,
+        'db': db_seconds,
+        'render': timingutils.phase_seconds.get('render', 0.0),
+        'mail': timingutils.phase_seconds.get('mail', 0.0),
+        'total': end_time - start_time
+    }
+    phases['other'] = max(
+        end_time - main_start_time -
+        phases['db'] - phases['render'] - phases['mail'],
+        0.0
+    )
+    return phases
+
+
+def log_timing(script, phases, is_ok):
+    """Append the phase timings of a request to config.TIMING_LOG, as one
+    line of JSON. Logging must never break a page, so errors go to stderr.
+
+    Parameters
+    ----------
+    script : str
+        The name of the script which handled the request.
+    phases : dict
+        The output of get_phase_times.
+    is_ok : bool
+        Whether or not main returned without raising.
+    """
+    try:
+        get_timing_handler()
+        timing_logger.info(
+            json.dumps(
+                {
+                    'time': time.time(),
+                    'script': script,
+                    'ok': is_ok,
+                    'phases': dict(
+                        (phase, round(seconds, 6))
+                        for phase, seconds in phases.items()
+                    )
+                },
+                sort_keys=True
+            )
+        )
+    except (IOError, OSError):
+        sys.stderr.write(
+            'Could not log timing:\n' + traceback.format_exc()
+        )
+
+
+def get_script_name():
+    return os.path.basename(sys.argv[0])
+
+
+def is_profiling_requested():
+    """Determine whether the request should be profiled: the user must be an
+    admin, and have asked for it with the query parameter profile=1 or the
+    environment variable PROJECTS_PROFILE=1.
+
+    Returns
+    -------
+    is_requested : bool
+        Whether or not to profile the request.
+    """
+    query = parse_qs(os.environ.get('QUERY_STRING', ''))
+    if (
+        (query.get('profile') != ['1']) and
+        (os.environ.get('PROJECTS_PROFILE') != '1')
+    ):
+        return False
+    return authutils.is_admin(authutils.get_kerberos())
+
+
+def save_profile(profiler):
+    """Write a profile to config.PROFILE_DIR, named after the script and the
+    time. See profilesummary.py for reading them.
+
+    Parameters
+    ----------
+    profiler : cProfile.Profile
+        The profile.
+
+    Returns
+    -------
+    path : str or None
+        The file written, or None if it could not be written (the error goes
+        to stderr).
+    """
+    path = os.path.join(
+        config.PROFILE_DIR,
+        '%s-%s-%d.prof' % (
+            get_script_name(), time.strftime('%Y%m%d-%H%M%S'), os.getpid()
+        )
+    )
+    try:
+        if not os.path.isdir(config.PROFILE_DIR):
+            os.makedirs(config.PROFILE_DIR)
+        profiler.dump_stats(path)
+    except (IOError, OSError):
+        sys.stderr.write(
+            'Could not save profile:\n' + traceback.format_exc()
+        )
+        return None
+    return path
+
+
+def run(main, html=True):
+    """Handle a CGI request with the given main function, then report on it:
+
+    * The SQL statements it made (see sqlstats), as a line in
+      config.SQL_STATS_LOG for every request and as an HTML comment at the
+      end of the page for admins.
+    * The time spent in each phase (see timingutils.PHASES), as a line in
+      config.TIMING_LOG.
+
+    Admins can also have the request profiled (see is_profiling_requested).
+
+    Parameters
+    ----------
+    main : callable
+        The script's main function, which prints the response.
+    html : bool, optional
+        Whether the response is an HTML page (default). The comment is only
+        added to HTML pages.
+    """
+    main_start_time = time.time()
+    sqlstats.reset()
+    timingutils.reset()
+    if is_profiling_requested():
+        profiler = cProfile.Profile()
+    else:
+        profiler = None
+    profile_path = None
+    is_ok = False
+    try:
+        if profiler is None:
+            main()
+        else:
+            profiler.runcall(main)
+        is_ok = True
+    finally:
+        end_time = time.time()
+        if profiler is not None:
+            profile_path = save_profile(profiler)
+        summary = sqlstats.get_summary()
+        write_log_line(sqlstats.format_log_line(summary, get_script_name()))
+        log_timing(
+            get_script_name(),
+            get_phase_times(
+                timingutils.get_process_start_time(), main_start_time,
+                end_time, summary['seconds']
+            ),
+            is_ok
+        )
+    if html and authutils.is_admin(authutils.get_kerberos()):
+        print(sqlstats.format_html_comment(summary))
+        if profile_path is not None:
+            print('<!-- Profile written to %s -->' % profile_path)
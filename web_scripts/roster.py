@@ -1,4 +1,10 @@
-ROSTER_LOCATION = '/afs/sipb/admin/text/members/members_and_prospectives'
+import os
+
+# PROJECTS_ROSTER can point at a copy of the roster, e.g., for running the
+# scripts away from AFS:
+ROSTER_LOCATION = os.environ.get(
+    'PROJECTS_ROSTER', '/afs/sipb/admin/text/members/members_and_prospectives'
+)
 
 sipb_roster = {}
 with open(ROSTER_LOCATION) as f:
@@ -1,24 +1,119 @@
+import os
+
 import sqlalchemy as db
 import sqlalchemy.ext.declarative
 import sqlalchemy.orm
+import config
 import creds
+import sqlstats
 
 DATABASE_NAME = creds.database_name
-SQL_URL = "mysql://%s:%s@sql.mit.edu/%s" % (
-    creds.user, creds.password, DATABASE_NAME
-)
+
+
+def get_database_url():
+    """Get the URL of the database to use. In order of precedence, this is:
+
+    1. The PROJECTS_DATABASE_URL environment variable.
+    2. database_url in creds.py.
+    3. The Scripts MySQL database named by the user, password, and
+       database_name in creds.py.
+
+    Any URL SQLAlchemy supports can be used, but only MySQL and SQLite are
+    tested. A local SQLite file (e.g., "sqlite:///projectdb.sqlite") is
+    enough to run the tests, benchmarks, and static export on a development
+    machine.
+
+    Returns
+    -------
+    url : str
+        The database URL.
+    """
+    url = os.environ.get('PROJECTS_DATABASE_URL')
+    if not url:
+        url = getattr(creds, 'database_url', None)
+    if not url:
+        url = "mysql://%s:%s@sql.mit.edu/%s" % (
+            creds.user, creds.password, DATABASE_NAME
+        )
+    return url
+
+
+def get_replica_url():
+    """Get the URL of the read replica, if there is one: the
+    PROJECTS_DATABASE_REPLICA_URL environment variable, or
+    database_replica_url in creds.py. Returns None if neither is set or
+    config.USE_READ_REPLICA is False.
+
+    Returns
+    -------
+    url : str or None
+        The replica URL.
+    """
+    if not config.USE_READ_REPLICA:
+        return None
+    url = os.environ.get('PROJECTS_DATABASE_REPLICA_URL')
+    if not url:
+        url = getattr(creds, 'database_replica_url', None)
+    return url or None
+
+
+SQL_URL = get_database_url()
+REPLICA_URL = get_replica_url()
+
+
+def varchar(length):
+    """Make the type of a string column. MySQL compares strings without
+    regard to case (with its default collation), so on SQLite the column
+    uses the NOCASE collation to behave the same (e.g., so that project names
+    which only differ in case still collide).
+
+    Parameters
+    ----------
+    length : int
+        The maximum length of the string.
+    """
+    return db.String(length).with_variant(
+        db.String(length, collation='NOCASE'), 'sqlite'
+    )
 
 
 ##############################################################
 # Setup Stages
 ##############################################################
 
+def enable_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def make_engine(url):
+    engine = db.create_engine(url)
+    sqlstats.install(engine)
+    if engine.dialect.name == 'sqlite':
+        # SQLite only enforces foreign keys when asked to, for each
+        # connection:
+        db.event.listen(engine, 'connect', enable_foreign_keys)
+    return engine
+
+
 # Initialization Steps
 SQLBase = db.ext.declarative.declarative_base()
-sqlengine = db.create_engine(SQL_URL)
+sqlengine = make_engine(SQL_URL)
 SQLBase.metadata.bind = sqlengine
 session = db.orm.sessionmaker(bind=sqlengine)()  # main object used for queries
 
+# Session for the read-only getters in db.py, bound to the read replica if
+# there is one. Without a replica, this is the main session. The replica's
+# schema is maintained by replication, so create_all is not run on it. See
+# db.get_read_session for which reads use it.
+if REPLICA_URL is not None:
+    read_engine = make_engine(REPLICA_URL)
+    read_session = db.orm.sessionmaker(bind=read_engine)()
+else:
+    read_engine = sqlengine
+    read_session = session
+
 # Implement schema
 SQLBase.metadata.create_all(sqlengine)
 
@@ -34,15 +129,63 @@ SQLBase.metadata.create_all(sqlengine)
 # history table must be defined in the subclasses.) 
 
 
+def auxiliary_relationship(model_name):
+    """Make a read-only relationship from Projects to the rows of an auxiliary
+    table, in index order. Writes go through db.py, which maintains the
+    history tables explicitly, so the relationships never cascade.
+
+    Parameters
+    ----------
+    model_name : str
+        The name of the auxiliary table class (e.g., 'Links').
+    """
+    return db.orm.relationship(
+        model_name, order_by='%s.index' % model_name, viewonly=True
+    )
+
+
+def auxiliary_history_relationship(model_name):
+    """Make a read-only relationship from ProjectsHistory to the rows of an
+    auxiliary history table which belong to the same revision, in index
+    order. This includes rows with action 'delete'.
+
+    Parameters
+    ----------
+    model_name : str
+        The name of the auxiliary history table class (e.g., 'LinksHistory').
+    """
+    return db.orm.relationship(
+        model_name,
+        primaryjoin=(
+            'and_('
+            'ProjectsHistory.project_id == foreign({0}.project_id), '
+            'ProjectsHistory.revision_id == foreign({0}.revision_id)'
+            ')'
+        ).format(model_name),
+        order_by='%s.index' % model_name,
+        viewonly=True
+    )
+
+
 class HistoryMixin(object):
-    author = db.Column(db.String(50), nullable=False)
+    author = db.Column(varchar(50), nullable=False)
     # action can be 'create', 'update', 'delete', 'same'
-    action = db.Column(db.String(25), nullable=False)
+    action = db.Column(varchar(25), nullable=False)
     revision_id = db.Column(db.Integer(), nullable=False)
     timestamp = db.Column(
         db.TIMESTAMP, nullable=False, server_default=db.func.now()
     )
 
+    # Revisions are always looked up by project, so index on both:
+    @sqlalchemy.ext.declarative.declared_attr
+    def __table_args__(cls):
+        return (
+            db.Index(
+                'ix_%s_project_id_revision_id' % cls.__tablename__,
+                'project_id', 'revision_id'
+            ),
+        )
+
     @sqlalchemy.orm.validates('author')
     def validate_author(self, key, author):
         if len(author) > self.__table__.columns[key].type.length:
@@ -66,13 +209,13 @@ class ProjectsBase(object):
 
     description = db.Column(db.Text(), nullable=False)
     # status can be "active" or "inactive"
-    status = db.Column(db.String(25), nullable=False)
+    status = db.Column(varchar(25), nullable=False)
     # approval can be "awaiting_approval" or "approved" or "rejected"
-    approval = db.Column(db.String(25), nullable=False)
+    approval = db.Column(varchar(25), nullable=False)
     # Kerb of user who registered the project:
-    creator = db.Column(db.String(50), nullable=False)
+    creator = db.Column(varchar(50), nullable=False)
     # Kerb of user who approved the project:
-    approver = db.Column(db.String(50), nullable=True)
+    approver = db.Column(varchar(50), nullable=True)
     # Comments from user who approved the project:
     approver_comments = db.Column(db.Text(), nullable=True)
 
@@ -125,7 +268,37 @@ class Projects(SQLBase, ProjectsBase):
     project_id = db.Column(
         db.Integer(), nullable=False, primary_key=True, autoincrement=True
     )
-    name = db.Column(db.String(50), nullable=False, unique=True)
+    name = db.Column(varchar(50), nullable=False, unique=True)
+    # Time and kerb of the most recent confirmation that the project details
+    # are still correct. Confirmations are not logged in the history table;
+    # they only reset the expiration clock (see db.get_stale_projects).
+    last_confirmed_at = db.Column(db.DateTime(), nullable=True)
+    last_confirmed_by = db.Column(varchar(50), nullable=True)
+    # When the project will be set to "inactive" unless it is edited or
+    # confirmed, and when sendreminders next needs to act on it (send a
+    # reminder or deactivate it). Both are null for inactive projects, and are
+    # maintained by db.schedule_reminders on every write.
+    expires_at = db.Column(db.DateTime(), nullable=True)
+    next_reminder_at = db.Column(db.DateTime(), nullable=True, index=True)
+    # Incremented on every change to the project's details, and on renewal.
+    # Every UPDATE made through the ORM checks that the version is still the
+    # one which was loaded (compare-and-swap), so concurrent edits cannot both
+    # succeed. The version is incremented explicitly (see
+    # db.apply_project_changes) so that an edit which does not change any
+    # columns still takes part.
+    version = db.Column(db.Integer(), nullable=False, server_default='1')
+
+    __mapper_args__ = {
+        'version_id_col': version,
+        'version_id_generator': False
+    }
+
+    # Load these with db.PROJECT_GRAPH_OPTIONS to fetch the auxiliary tables
+    # for any number of projects with one query per table:
+    links = auxiliary_relationship('Links')
+    comm_channels = auxiliary_relationship('CommChannels')
+    contacts = auxiliary_relationship('ContactEmails')
+    roles = auxiliary_relationship('Roles')
 
 
 class ProjectsHistory(SQLBase, ProjectsBase, HistoryMixin):
@@ -133,7 +306,7 @@ class ProjectsHistory(SQLBase, ProjectsBase, HistoryMixin):
     id = db.Column(
         db.Integer(), nullable=False, primary_key=True, autoincrement=True
     )
-    name = db.Column(db.String(50), nullable=False)
+    name = db.Column(varchar(50), nullable=False)
 
     # Foreign key constraint requires special handling.
     @sqlalchemy.ext.declarative.declared_attr
@@ -142,6 +315,11 @@ class ProjectsHistory(SQLBase, ProjectsBase, HistoryMixin):
             db.Integer(), db.ForeignKey('projects.project_id'), nullable=False
         )
 
+    links = auxiliary_history_relationship('LinksHistory')
+    comm_channels = auxiliary_history_relationship('CommChannelsHistory')
+    contacts = auxiliary_history_relationship('ContactEmailsHistory')
+    roles = auxiliary_history_relationship('RolesHistory')
+
 
 class ContactEmailsBase(object):
     id = db.Column(
@@ -149,8 +327,8 @@ class ContactEmailsBase(object):
     )
     # type can be either "primary" or "secondary". By convention, there should
     # be exactly one primary contact for each project.
-    type = db.Column(db.String(25), nullable=False)
-    email = db.Column(db.String(50), nullable=False)
+    type = db.Column(varchar(25), nullable=False)
+    email = db.Column(varchar(50), nullable=False)
     # index sets the order which contacts are listed in. By convention, the one
     # primary contact should have index 0.
     index = db.Column(db.Integer(), nullable=False)
@@ -192,7 +370,7 @@ class RolesBase(object):
         sqlalchemy.Integer(), nullable=False, primary_key=True,
         autoincrement=True
     )
-    role = db.Column(db.String(50), nullable=False)
+    role = db.Column(varchar(50), nullable=False)
     description = db.Column(db.Text(), nullable=False)
     prereq = db.Column(db.Text(), nullable=True)
     # index sets the order which roles are listed in:
@@ -273,6 +451,62 @@ class CommChannelsHistory(SQLBase, CommChannelsBase, HistoryMixin):
     __tablename__ = 'commchannelshistory'
 
 
+class ReminderLog(SQLBase):
+    # Log of the messages sendreminders has decided to send. Entries are
+    # created as "pending" when a reminder falls due and are marked "sent" (or
+    # "skipped", if the project was renewed or reactivated in the meantime)
+    # once handled, so that an interrupted or repeated run picks up where the
+    # previous one left off without sending anything twice.
+    __tablename__ = 'reminderlog'
+    __table_args__ = (
+        db.UniqueConstraint('project_id', 'reminder_kind', 'deadline'),
+    )
+    id = db.Column(
+        db.Integer(), nullable=False, primary_key=True, autoincrement=True
+    )
+    project_id = db.Column(
+        db.Integer(), db.ForeignKey('projects.project_id'), nullable=False
+    )
+    # reminder_kind is "reminder_<N>" for the reminder sent N days before
+    # expiration, or "deactivation":
+    reminder_kind = db.Column(varchar(25), nullable=False)
+    # The expiration time the message refers to:
+    deadline = db.Column(db.DateTime(), nullable=False)
+    # status can be "pending", "sent", or "skipped"
+    status = db.Column(varchar(25), nullable=False)
+    created_at = db.Column(
+        db.TIMESTAMP, nullable=False, server_default=db.func.now()
+    )
+    processed_at = db.Column(db.DateTime(), nullable=True)
+
+    @sqlalchemy.orm.validates('status')
+    def validate_status(self, key, status):
+        if status not in ['pending', 'sent', 'skipped']:
+            raise ValueError(
+                'Value of "%s" for key "status" is invalid!' % status
+            )
+        return status
+
+
+class ProjectDocuments(SQLBase):
+    # Serialized (JSON) copy of the current state of each project, in the
+    # format of db.get_all_project_info, so that the list views can read one
+    # row per project instead of reassembling each project from five tables.
+    # Only the public fields are included (see db.SCHEDULING_COLUMNS), since
+    # the documents also make up the JSON feed. The documents hold no
+    # information of their own: db.py rewrites them in the same transaction
+    # as every write which changes a public field, and checkdocuments.py
+    # verifies (and can rebuild) them from the normalized tables.
+    __tablename__ = 'projectdocuments'
+    project_id = db.Column(
+        db.Integer(), db.ForeignKey('projects.project_id'), nullable=False,
+        primary_key=True, autoincrement=False
+    )
+    # The revision the document was built from:
+    revision_id = db.Column(db.Integer(), nullable=False)
+    document = db.Column(db.Text(), nullable=False)
+
+
 # Implement schema
 SQLBase.metadata.create_all(sqlengine)
 
@@ -1,34 +1,340 @@
 #!/usr/bin/env python
 
-import datetime
+from __future__ import print_function
 
+import sys
+import threading
+import time
+import traceback
+from multiprocessing.pool import ThreadPool
+
+import config
 import db
 import mail
+import staticexport
+import timingutils
+
+REMINDER_AUTHOR = 'projects-database-admin'
+
+
+class RateLimiter(object):
+    def __init__(self, max_per_second):
+        """Thread-safe limiter which spaces out events so that no more than
+        max_per_second of them happen per second.
+
+        Parameters
+        ----------
+        max_per_second : float or None
+            The maximum rate. Pass None (or 0) to disable the limit.
+        """
+        self.interval = 1.0 / max_per_second if max_per_second else 0.0
+        self.next_time = time.time()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next event is allowed to happen.
+        """
+        with self.lock:
+            start_time = max(time.time(), self.next_time)
+            self.next_time = start_time + self.interval
+        delay = start_time - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_due_reminder(project, now):
+    """Determine which reminder (if any) is due for a project.
+
+    Parameters
+    ----------
+    project : dict
+        The project info, including 'expires_at'.
+    now : datetime.datetime
+        The current time. Get this using db.get_now().
+
+    Returns
+    -------
+    num_days_left : int or None
+        The number of days left for the most recent reminder deadline which
+        has passed, 0 if the project has expired, or None if no deadline has
+        passed yet.
+    """
+    num_days_left = None
+    for days, deadline in db.get_reminder_deadlines(project['expires_at']):
+        if deadline <= now:
+            num_days_left = days
+    return num_days_left
+
+
+def get_reminder_kind(num_days_left):
+    """Get the reminder log kind for a reminder.
+
+    Parameters
+    ----------
+    num_days_left : int
+        The number of days left before expiration, or 0 for deactivation.
+
+    Returns
+    -------
+    reminder_kind : str
+        The reminder kind.
+    """
+    if num_days_left == 0:
+        return 'deactivation'
+    else:
+        return 'reminder_%d' % num_days_left
 
-from config import EXPIRATION_BY_NUM_DAYS
-EXPIRATION_HORIZON = datetime.timedelta(days=EXPIRATION_BY_NUM_DAYS)
-REMIND_DAYS = set(datetime.timedelta(days=(EXPIRATION_BY_NUM_DAYS-d)) for d in [30, 21, 14, 7, 3, 2, 1])
 
+def get_num_days_left(reminder_kind):
+    """Get the number of days left before expiration for a reminder kind. This
+    is the inverse of get_reminder_kind.
 
-def round_timedelta(in_timedelta):
-    """Round a time difference to the nearest whole number of days.
+    Parameters
+    ----------
+    reminder_kind : str
+        The reminder kind.
+
+    Returns
+    -------
+    num_days_left : int
+        The number of days left before expiration, or 0 for deactivation.
     """
-    if in_timedelta.days < 0:
-        sign = -1
+    if reminder_kind == 'deactivation':
+        return 0
     else:
-        sign = +1
-    in_timedelta = abs(in_timedelta)
+        return int(reminder_kind[len('reminder_'):])
+
+
+def plan_reminders(now):
+    """Log a pending reminder for each project which has reached a reminder
+    deadline, deactivate projects which have expired, and advance the next
+    reminder time for the rest.
+
+    If cron was not run for a while, only the most recent missed reminder is
+    logged for each project. Reminders which are already in the log are not
+    logged again, so this can safely be repeated.
+
+    Parameters
+    ----------
+    now : datetime.datetime
+        The current time. Get this using db.get_now().
 
-    fractional_part = datetime.timedelta(
-        seconds=in_timedelta.seconds, microseconds=in_timedelta.microseconds
+    Returns
+    -------
+    deactivated_project_ids : list of int
+        The IDs of the projects which were deactivated.
+    """
+    reminders = []
+    stale_project_ids = []
+    next_reminder_times = {}
+    for project in db.get_projects_due_for_reminder(now):
+        num_days_left = get_due_reminder(project, now)
+        if num_days_left is not None:
+            reminders.append(
+                {
+                    'project_id': project['project_id'],
+                    'reminder_kind': get_reminder_kind(num_days_left),
+                    'deadline': project['expires_at']
+                }
+            )
+
+        if num_days_left == 0:
+            stale_project_ids.append(project['project_id'])
+        else:
+            next_reminder_times[project['project_id']] = \
+                db.get_next_reminder_at(project['expires_at'], now)
+
+    # The log is written first so that a run which is interrupted before the
+    # deactivations or notifications complete still sends them when resumed:
+    db.log_reminders(reminders)
+    db.set_next_reminder_times(next_reminder_times)
+    return db.deactivate_projects(
+        stale_project_ids, REMINDER_AUTHOR, now=now
     )
-    floor = datetime.timedelta(days=in_timedelta.days)
-    if fractional_part >= datetime.timedelta(days=0.5):
-        rounded = floor + datetime.timedelta(days=1)
+
+
+def is_reminder_current(reminder, project_info):
+    """Check whether a pending reminder still applies to a project (i.e., the
+    project has not been renewed or reactivated since it was logged).
+
+    Parameters
+    ----------
+    reminder : dict
+        The reminder log entry.
+    project_info : dict
+        The current project info.
+
+    Returns
+    -------
+    is_current : bool
+        Whether or not the reminder should be sent.
+    """
+    if reminder['reminder_kind'] == 'deactivation':
+        return project_info['status'] == 'inactive'
     else:
-        rounded = floor
+        return (
+            (project_info['status'] == 'active') and
+            (project_info['expires_at'] == reminder['deadline'])
+        )
+
 
-    return rounded * sign
+def send_reminder_message(job):
+    """Format and send the message for a single reminder. This does not touch
+    the database, so it is safe to call from worker threads.
+
+    Parameters
+    ----------
+    job : tuple of (dict, viewmodels.Project, RateLimiter)
+        The reminder log entry, the project info, and the rate limiter to
+        respect.
+
+    Returns
+    -------
+    reminder : dict
+        The reminder log entry.
+    error : str or None
+        The traceback if sending failed, otherwise None.
+    """
+    reminder, project_info, rate_limiter = job
+    try:
+        rate_limiter.wait()
+        num_days_left = get_num_days_left(reminder['reminder_kind'])
+        if num_days_left == 0:
+            mail.send_deactivation_message(project_info)
+        else:
+            mail.send_confirm_reminder_message(project_info, num_days_left)
+    except Exception:
+        return reminder, traceback.format_exc()
+    else:
+        return reminder, None
+
+
+def deliver_reminders(
+    jobs, num_workers=1, max_messages_per_second=None, callback=None
+):
+    """Send the messages for a list of reminders, optionally using a pool of
+    worker threads. Failures are collected rather than aborting the remaining
+    messages. The wall time of the whole delivery counts towards the 'mail'
+    phase (see timingutils), however many workers send at once.
+
+    Parameters
+    ----------
+    jobs : list of tuple of (dict, dict)
+        The reminder log entry and project info for each message.
+    num_workers : int, optional
+        The number of messages to send concurrently. Default is 1, which sends
+        the messages one after another on the calling thread.
+    max_messages_per_second : float, optional
+        The maximum rate at which to send messages. Default is no limit.
+    callback : callable, optional
+        Called on the calling thread as callback(reminder, error) as each
+        message completes, where error is the traceback or None.
+
+    Returns
+    -------
+    failures : list of tuple of (dict, str)
+        The reminder log entry and traceback for each message which failed.
+    """
+    rate_limiter = RateLimiter(max_messages_per_second)
+    jobs = [
+        (reminder, project_info, rate_limiter)
+        for reminder, project_info in jobs
+    ]
+
+    failures = []
+    with timingutils.timed('mail'):
+        if num_workers > 1:
+            pool = ThreadPool(num_workers)
+            results = pool.imap_unordered(send_reminder_message, jobs)
+        else:
+            pool = None
+            results = (send_reminder_message(job) for job in jobs)
+
+        try:
+            for reminder, error in results:
+                if error is not None:
+                    failures.append((reminder, error))
+                if callback is not None:
+                    callback(reminder, error)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    return failures
+
+
+def send_pending_reminders(
+    num_workers=config.REMINDER_WORKERS,
+    max_messages_per_second=config.REMINDER_MAX_MESSAGES_PER_SECOND
+):
+    """Send the messages for every pending entry in the reminder log, marking
+    each one as it is handled.
+
+    All database access happens on the calling thread: the project info for
+    every pending entry is loaded at once before the messages are handed to
+    the workers, and each entry is marked as the corresponding message
+    completes. Entries whose message failed are left pending so the next run
+    retries them.
+
+    Parameters
+    ----------
+    num_workers : int, optional
+        The number of messages to send concurrently. Default is
+        config.REMINDER_WORKERS.
+    max_messages_per_second : float, optional
+        The maximum rate at which to send messages. Default is
+        config.REMINDER_MAX_MESSAGES_PER_SECOND.
+
+    Returns
+    -------
+    failures : list of tuple of (dict, str)
+        The reminder log entry and traceback for each message which failed.
+    """
+    reminders = db.get_pending_reminders()
+    project_info_map = db.get_project_views(
+        set(reminder['project_id'] for reminder in reminders)
+    )
+    jobs = []
+    for reminder in reminders:
+        project_info = project_info_map[reminder['project_id']]
+        if is_reminder_current(reminder, project_info):
+            jobs.append((reminder, project_info))
+        else:
+            db.mark_reminder(reminder['id'], 'skipped')
+
+    def mark_sent(reminder, error):
+        if error is None:
+            db.mark_reminder(reminder['id'], 'sent')
+
+    return deliver_reminders(
+        jobs,
+        num_workers=num_workers,
+        max_messages_per_second=max_messages_per_second,
+        callback=mark_sent
+    )
+
+
+def report_failures(failures):
+    """Print a summary of the messages which could not be sent.
+
+    Parameters
+    ----------
+    failures : list of tuple of (dict, str)
+        The reminder log entry and traceback for each message which failed.
+    """
+    print(
+        '%d reminder(s) could not be sent and will be retried on the next '
+        'run:' % len(failures),
+        file=sys.stderr
+    )
+    for reminder, error in failures:
+        print(
+            'Project %d (%s):\n%s' % (
+                reminder['project_id'], reminder['reminder_kind'], error
+            ),
+            file=sys.stderr
+        )
 
 
 def main():
@@ -41,30 +347,27 @@ def main():
             edit link, and a reminder that they should change the status back
             to active if they want their project to appear in the list of
             active projects.
+
+    Only projects whose next_reminder_at deadline has passed are loaded, so
+    the cost of a run depends on the number of projects which are due rather
+    than the total number of projects. Every message goes through the reminder
+    log, so the script can be rerun at any time (e.g., after a crash or a
+    missed day) without duplicating or losing messages.
+
+    If any projects were deactivated, the static pages are exported again so
+    that they leave the public list of active projects.
     """
+    # staticexport imports projectlist, which enables cgitb and would turn
+    # tracebacks into HTML:
+    sys.excepthook = sys.__excepthook__
     now = db.get_now()
-    projects_needing_edits = db.get_stale_projects(
-        now,
-        time_horizon=EXPIRATION_HORIZON - max(REMIND_DAYS)
-    )
-    for project in projects_needing_edits:
-        last_edit_age_rounded = round_timedelta(
-            now - project['last_edit_timestamp']
-        )
-        if last_edit_age_rounded in REMIND_DAYS:
-            num_days_left = EXPIRATION_BY_NUM_DAYS - last_edit_age_rounded.days
-            mail.send_confirm_reminder_message(project, num_days_left)
-
-    stale_projects = db.get_stale_projects(
-        now,
-        time_horizon=EXPIRATION_HORIZON
-    )
-    for project in stale_projects:
-        project['status'] = 'inactive'
-        db.update_project(
-            project, project['project_id'], 'projects-database-admin'
-        )
-        mail.send_deactivation_message(project)
+    deactivated_project_ids = plan_reminders(now)
+    if len(deactivated_project_ids) > 0:
+        staticexport.refresh_static_pages()
+    failures = send_pending_reminders()
+    if len(failures) > 0:
+        report_failures(failures)
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,175 @@
+"""Per-request SQL instrumentation. schema.py installs these hooks on every
+engine, and they record how many statements the process (i.e., the CGI
+request) sends, how long they take, and which statement shapes repeat. A
+shape which is executed more than config.SQL_REPEAT_THRESHOLD times usually
+means a query is being made inside a loop (an N+1 pattern). See
+requestutils.run for how the summary is reported.
+"""
+
+import json
+import re
+import time
+
+import sqlalchemy
+
+import config
+
+# Maps each normalized statement to a dict with keys 'count' and 'seconds':
+_statements = {}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+# Parameter lists of any length, e.g., from expanding IN parameters:
+_PARAMETER_LIST_RE = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)')
+
+
+def normalize_statement(statement):
+    """Reduce a statement to its shape, so that executions which only differ
+    in their values are counted together.
+
+    Parameters
+    ----------
+    statement : str
+        The SQL sent to the database.
+
+    Returns
+    -------
+    shape : str
+        The statement with literals replaced by "?", parameter lists of any
+        length collapsed to "(?)", and whitespace collapsed.
+    """
+    shape = _WHITESPACE_RE.sub(' ', statement).strip()
+    shape = _STRING_RE.sub('?', shape)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _PARAMETER_LIST_RE.sub('(?)', shape)
+    return shape.replace('%s', '?')
+
+
+def before_cursor_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    connection.info.setdefault('sqlstats_start_times', []).append(time.time())
+
+
+def after_cursor_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    elapsed = time.time() - connection.info['sqlstats_start_times'].pop()
+    entry = _statements.setdefault(
+        normalize_statement(statement), {'count': 0, 'seconds': 0.0}
+    )
+    entry['count'] += 1
+    entry['seconds'] += elapsed
+
+
+def install(engine):
+    """Record the statements executed through an engine.
+
+    Parameters
+    ----------
+    engine : sqlalchemy.engine.Engine
+        The engine to instrument.
+    """
+    sqlalchemy.event.listen(
+        engine, 'before_cursor_execute', before_cursor_execute
+    )
+    sqlalchemy.event.listen(
+        engine, 'after_cursor_execute', after_cursor_execute
+    )
+
+
+def reset():
+    """Forget the statements recorded so far.
+    """
+    _statements.clear()
+
+
+def get_summary(threshold=None):
+    """Summarize the statements recorded since the last reset.
+
+    Parameters
+    ----------
+    threshold : int, optional
+        Statement shapes executed more than this many times are reported as
+        repeated. Default is config.SQL_REPEAT_THRESHOLD.
+
+    Returns
+    -------
+    summary : dict
+        With keys 'queries' (the number of statements), 'seconds' (their
+        total time), and 'repeated' (a list of dicts with keys 'statement',
+        'count', and 'seconds' for each repeated shape, most frequent first).
+    """
+    if threshold is None:
+        threshold = config.SQL_REPEAT_THRESHOLD
+    repeated = [
+        {
+            'statement': statement,
+            'count': entry['count'],
+            'seconds': entry['seconds']
+        }
+        for statement, entry in _statements.items()
+        if entry['count'] > threshold
+    ]
+    repeated.sort(key=lambda entry: (-entry['count'], entry['statement']))
+    return {
+        'queries': sum(entry['count'] for entry in _statements.values()),
+        'seconds': sum(entry['seconds'] for entry in _statements.values()),
+        'repeated': repeated
+    }
+
+
+def format_html_comment(summary):
+    """Format a summary as an HTML comment, to append to a page.
+
+    Parameters
+    ----------
+    summary : dict
+        The output of get_summary.
+
+    Returns
+    -------
+    comment : str
+        The comment.
+    """
+    lines = [
+        'SQL: %d queries in %.1f ms' % (
+            summary['queries'], 1000 * summary['seconds']
+        )
+    ]
+    for entry in summary['repeated']:
+        lines.append(
+            'Repeated %d times (%.1f ms): %s' % (
+                entry['count'], 1000 * entry['seconds'], entry['statement']
+            )
+        )
+    # "--" cannot appear inside a comment:
+    return '<!--\n%s\n-->' % '\n'.join(lines).replace('--', '- -')
+
+
+def format_log_line(summary, script):
+    """Format a summary as one line of JSON, for offline aggregation.
+
+    Parameters
+    ----------
+    summary : dict
+        The output of get_summary.
+    script : str
+        The name of the script which handled the request.
+
+    Returns
+    -------
+    line : str
+        The log line, without a trailing newline.
+    """
+    return 'sqlstats ' + json.dumps(
+        {
+            'time': time.time(),
+            'script': script,
+            'queries': summary['queries'],
+            'seconds': round(summary['seconds'], 6),
+            'repeated': summary['repeated']
+        },
+        sort_keys=True
+    )
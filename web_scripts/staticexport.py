@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+"""Export the public project lists and the JSON feed to static files, which
+.htaccess serves to visitors who have not signed in without starting Python.
+
+The export runs after every write which commits (see refresh_static_pages),
+including the deactivations made by sendreminders.py, and from cron (run this
+script from web_scripts with no arguments), which also catches up on any
+changes made some other way. Visitors who have signed in (port 444) always
+get the dynamic pages, which include their edit links.
+
+Exports run one at a time (see export_lock) and read from the primary
+database, so an export which read older data can never replace the files of
+a newer one. The files go to STATIC_DIR, which can be moved with the
+PROJECTS_STATIC_DIR environment variable (e.g., by benchmarks/loadtest.py, so
+that synthetic data stays out of the directory .htaccess serves).
+push.sh never deploys it.
+"""
+
+from __future__ import print_function
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import traceback
+
+import creds
+import db
+import projectjson
+import projectlist
+
+STATIC_DIR = os.environ.get('PROJECTS_STATIC_DIR', 'static')
+# Held while exporting, in STATIC_DIR:
+LOCK_FILE = '.export.lock'
+
+# Maps the filter_by values of the public project lists to their files. The
+# names must match the rewrite rules in .htaccess.
+STATIC_PAGES = [
+    ('active', 'projectlist-active.html'),
+    ('approved', 'projectlist-approved.html'),
+    ('inactive', 'projectlist-inactive.html')
+]
+STATIC_JSON = 'projects.json'
+# Cache of the rendered row of each project in the lists, keyed on its
+# revision:
+FRAGMENT_MANIFEST = 'fragments.json'
+
+BASE_URL = "https://{locker}.scripts.mit.edu".format(locker=creds.user)
+AUTH_BASE_URL = "https://{locker}.scripts.mit.edu:444".format(
+    locker=creds.user
+)
+
+
+def write_atomic(filename, data):
+    """Write a file in STATIC_DIR such that readers see either the old or the
+    new contents, never a partial file.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file.
+    data : str
+        The contents. Unicode strings are encoded as UTF-8.
+    """
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+
+    if not os.path.isdir(STATIC_DIR):
+        os.makedirs(STATIC_DIR)
+    fd, temp_path = tempfile.mkstemp(dir=STATIC_DIR, prefix='.' + filename)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates the file readable only by us, but Apache needs to
+        # read it:
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, os.path.join(STATIC_DIR, filename))
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+def get_template_hash():
+    """Get a hash of the row template, so that cached rows are discarded when
+    it changes.
+    """
+    with open(os.path.join('templates', 'projectrow.html'), 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_fragment_manifest(template_hash):
+    """Load the cached rows.
+
+    Parameters
+    ----------
+    template_hash : str
+        The hash of the current row template. The cache is discarded if it was
+        built with a different template.
+
+    Returns
+    -------
+    fragments : dict
+        Maps project IDs (as strings) to dicts with keys 'revision_id' and
+        'html'.
+    """
+    try:
+        with open(os.path.join(STATIC_DIR, FRAGMENT_MANIFEST), 'rb') as f:
+            manifest = json.loads(f.read().decode('utf-8'))
+    except (IOError, OSError, ValueError):
+        return {}
+    if manifest.get('template_hash') != template_hash:
+        return {}
+    return manifest['fragments']
+
+
+@contextlib.contextmanager
+def export_lock():
+    """Context manager which holds an exclusive lock on LOCK_FILE, waiting
+    for any other export (e.g., from another perform* script which committed
+    at the same time) to finish first.
+    """
+    if not os.path.isdir(STATIC_DIR):
+        os.makedirs(STATIC_DIR)
+    with open(os.path.join(STATIC_DIR, LOCK_FILE), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def export_static_pages(incremental=True):
+    """Render the public project lists and the JSON feed to STATIC_DIR.
+
+    The rendered row of each project is cached in FRAGMENT_MANIFEST together
+    with the revision it was rendered from, and only the rows of projects
+    whose revision has changed since the last export are rendered again.
+
+    Parameters
+    ----------
+    incremental : bool, optional
+        Whether to reuse the cached rows (default). If False, every row is
+        rendered again.
+
+    Returns
+    -------
+    num_rendered : int
+        The number of rows which were rendered.
+    """
+    # Everything is read inside the lock, and from the primary (a replica may
+    # lag behind), so each export sees at least the data of the one before:
+    db.pin_reads_to_primary()
+    with export_lock():
+        return export_static_pages_locked(incremental)
+
+
+def export_static_pages_locked(incremental):
+    """Do the work of export_static_pages, which holds the lock.
+    """
+    template_hash = get_template_hash()
+    if incremental:
+        fragments = load_fragment_manifest(template_hash)
+    else:
+        fragments = {}
+
+    list_revisions = {
+        filter_method: db.get_project_list_revisions(filter_method)
+        for filter_method, filename in STATIC_PAGES
+    }
+    current_revisions = {}
+    for revisions in list_revisions.values():
+        current_revisions.update(revisions)
+    stale_project_ids = [
+        project_id for project_id, revision_id in current_revisions.items()
+        if (revision_id is None) or (
+            fragments.get(str(project_id), {}).get('revision_id') !=
+            revision_id
+        )
+    ]
+
+    project_views = db.get_project_views(stale_project_ids)
+    project_list = [
+        project_views[project_id] for project_id in stale_project_ids
+        if project_id in project_views
+    ]
+    rendered_rows = projectlist.render_project_rows(project_list, None)
+    for project, html in zip(project_list, rendered_rows):
+        fragments[str(project.project_id)] = {
+            'revision_id': current_revisions[project.project_id],
+            'html': html
+        }
+
+    # Drop the rows of projects which are no longer listed:
+    fragments = {
+        key: fragment for key, fragment in fragments.items()
+        if int(key) in current_revisions
+    }
+
+    for filter_method, filename in STATIC_PAGES:
+        uri = '/projectlist.py?filter_by=%s' % filter_method
+        write_atomic(
+            filename,
+            projectlist.render_project_list(
+                [],
+                filter_method,
+                None,
+                None,
+                None,
+                AUTH_BASE_URL + uri,
+                BASE_URL + uri,
+                rendered_rows=[
+                    fragments[str(project_id)]['html']
+                    for project_id, revision_id
+                    in list_revisions[filter_method]
+                    if str(project_id) in fragments
+                ]
+            )
+        )
+    write_atomic(STATIC_JSON, projectjson.format_project_json())
+    write_atomic(
+        FRAGMENT_MANIFEST,
+        json.dumps({'template_hash': template_hash, 'fragments': fragments})
+    )
+    return len(rendered_rows)
+
+
+def remove_static_pages():
+    """Remove the exported files, so that every request goes to the dynamic
+    pages.
+    """
+    filenames = [filename for _, filename in STATIC_PAGES] + [
+        STATIC_JSON, FRAGMENT_MANIFEST
+    ]
+    for filename in filenames:
+        try:
+            os.remove(os.path.join(STATIC_DIR, filename))
+        except OSError:
+            pass
+
+
+def refresh_static_pages():
+    """Re-export the static files after a write. This never raises: if the
+    export fails, the details go to stderr (the server log) and the old files
+    are removed, so that visitors get the dynamic pages rather than stale
+    ones.
+
+    Returns
+    -------
+    is_ok : bool
+        Whether or not the export succeeded.
+    """
+    try:
+        export_static_pages()
+    except Exception:
+        print(
+            'Static export failed, serving dynamic pages:\n' +
+            traceback.format_exc(),
+            file=sys.stderr
+        )
+        remove_static_pages()
+        return False
+    return True
+
+
+def main():
+    # projectlist and projectjson enable cgitb on import, which would turn
+    # tracebacks into HTML:
+    sys.excepthook = sys.__excepthook__
+    if not refresh_static_pages():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -141,6 +141,29 @@ def make_url_absolute(url):
     return url
 
 
+def decode_utf(value):
+    """Decode a UTF-8 encoded string. Values which are not encoded strings
+    (including strings which have already been decoded) are returned
+    unchanged.
+    """
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    else:
+        return value
+
+
+def encode_utf(value):
+    """Encode a text string as UTF-8 on Python 2, where the rest of the code
+    (e.g., the email messages) works with encoded strings. Values which are
+    not text strings, including every string on Python 3, are returned
+    unchanged.
+    """
+    if isinstance(value, type(u'')) and not isinstance(value, str):
+        return value.encode('utf-8')
+    else:
+        return value
+
+
 def decode_utf_nested_dict_list(args):
     """Decode all strings in a nested list of dicts.
     """
@@ -152,7 +175,4 @@ def decode_utf_nested_dict_list(args):
     elif type(args) == list:
         return [decode_utf_nested_dict_list(value) for value in args]
     else:
-        try:
-            return args.decode('utf-8')
-        except AttributeError:
-            return args
+        return decode_utf(args)
@@ -2,12 +2,35 @@ import jinja2
 from django.utils import html
 
 import strutils
+import timingutils
+
+
+class TimedTemplate(jinja2.Template):
+    """Template which counts the time spent rendering it towards the 'render'
+    phase (see timingutils).
+    """
+    def render(self, *args, **kwargs):
+        with timingutils.timed('render'):
+            return super(TimedTemplate, self).render(*args, **kwargs)
+
+
+class TimedEnvironment(jinja2.Environment):
+    """Environment which counts the time spent loading (and compiling)
+    templates towards the 'render' phase.
+    """
+    template_class = TimedTemplate
+
+    def get_template(self, *args, **kwargs):
+        with timingutils.timed('render'):
+            return super(TimedEnvironment, self).get_template(
+                *args, **kwargs
+            )
 
 
 def get_jenv():
     """Get the jinja environment.
     """
-    jenv = jinja2.Environment(
+    jenv = TimedEnvironment(
         loader=jinja2.FileSystemLoader('templates'),
         autoescape=True
     )
@@ -0,0 +1,693 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import copy
+import datetime
+import os
+import unittest
+
+import sqlalchemy as sa
+
+import authutils
+import db
+import schema
+import sqlstats
+import valutils
+
+
+class Test_read_cache(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_read_cache, self).setUp()
+        self.project_info = copy.deepcopy(self.project_info_list[0])
+        self.project_id = self.project_info['project_id']
+        db.reset_read_cache()
+
+    def test_hits(self):
+        name = db.get_project_name(self.project_id)
+        self.assertEqual(name, 'test1')
+        self.assertEqual(db.get_read_cache_stats(), {'hits': 0, 'misses': 1})
+
+        name = db.get_project_name(self.project_id)
+        self.assertEqual(name, 'test1')
+        self.assertEqual(db.get_read_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_copies(self):
+        project_info = db.get_all_info_for_project(self.project_id)
+        project_info['contacts'].append({'email': 'bar@mit.edu'})
+        project_info = db.get_all_info_for_project(self.project_id)
+        self.assertEqual(len(project_info['contacts']), 1)
+        self.assertGreater(db.get_read_cache_stats()['hits'], 0)
+
+    def test_raw_uncached(self):
+        db.get_contacts(self.project_id, get_raw=True)
+        db.get_contacts(self.project_id, get_raw=True)
+        self.assertEqual(db.get_read_cache_stats(), {'hits': 0, 'misses': 0})
+
+    def test_invalidated_by_update(self):
+        revision_id = db.get_current_revision(self.project_id)
+        self.project_info['name'] = 'test3'
+        self.project_info['contacts'].append(
+            {'email': 'bar@mit.edu', 'type': 'secondary', 'index': 1}
+        )
+        self.assertIsNone(db.get_project_id('test3'))
+
+        db.update_project(self.project_info, self.project_id, 'editor')
+        self.assertEqual(db.get_project_name(self.project_id), 'test3')
+        self.assertEqual(db.get_project_id('test3'), self.project_id)
+        self.assertEqual(len(db.get_contacts(self.project_id)), 2)
+        self.assertEqual(
+            db.get_current_revision(self.project_id), revision_id + 1
+        )
+
+    def test_stale_revision_not_used_by_update(self):
+        revision_id = db.get_current_revision(self.project_id)
+
+        # Another process writes a revision, which does not invalidate this
+        # process's cache:
+        other_session = sa.orm.sessionmaker(bind=schema.sqlengine)()
+        try:
+            project = other_session.query(schema.Projects).filter_by(
+                project_id=self.project_id
+            ).one()
+            other_session.add(
+                db.make_history_entry(
+                    project, 'other', 'update', revision_id + 1
+                )
+            )
+            other_session.commit()
+        finally:
+            other_session.close()
+        self.assertEqual(db.get_current_revision(self.project_id), revision_id)
+
+        self.project_info['name'] = 'test3'
+        db.update_project(self.project_info, self.project_id, 'editor')
+        self.assertEqual(
+            db.get_current_revision(self.project_id), revision_id + 2
+        )
+
+    def test_invalidated_by_renew(self):
+        project_info = db.get_all_info_for_project(self.project_id)
+        self.assertIsNone(project_info['last_confirmed_by'])
+        db.renew_project(self.project_id, 'editor')
+        project_info = db.get_all_info_for_project(self.project_id)
+        self.assertEqual(project_info['last_confirmed_by'], 'editor')
+
+
+class Test_get_project_history_page(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_get_project_history_page, self).setUp()
+        self.project_info = copy.deepcopy(self.project_info_list[0])
+        self.project_id = self.project_info['project_id']
+        for idx in range(4):
+            self.project_info['description'] = 'description %d' % idx
+            db.update_project(self.project_info, self.project_id, 'editor')
+
+    def test_newest_first(self):
+        revisions, has_older = db.get_project_history_page(
+            self.project_id, page=0, page_size=2
+        )
+        self.assertEqual(
+            [revision['revision_id'] for revision in revisions], [4, 3]
+        )
+        self.assertTrue(has_older)
+        self.assertEqual(
+            revisions[0]['changes']['fields'],
+            [
+                {
+                    'field': 'description',
+                    'old': 'description 2',
+                    'new': 'description 3'
+                }
+            ]
+        )
+        self.assertEqual(revisions[0]['changes']['contacts'], [])
+
+    def test_last_page(self):
+        revisions, has_older = db.get_project_history_page(
+            self.project_id, page=2, page_size=2
+        )
+        self.assertEqual(
+            [revision['revision_id'] for revision in revisions], [0]
+        )
+        self.assertFalse(has_older)
+        # The first revision is diffed against an empty project:
+        changes = revisions[0]['changes']['contacts']
+        self.assertEqual([change['change'] for change in changes], ['create'])
+
+
+class Test_project_graph(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_project_graph, self).setUp()
+        db.reset_read_cache()
+
+    def add_projects(self, num_projects, first=0):
+        for i in range(first, first + num_projects):
+            db.add_project(
+                {
+                    'name': 'graph%d' % i,
+                    'description': 'some test description',
+                    'status': 'active',
+                    'links': [
+                        {'link': 'https://a.mit.edu', 'index': 0},
+                        {'link': 'https://b.mit.edu', 'index': 1}
+                    ],
+                    'comm_channels': [],
+                    'contacts': [
+                        {'email': 'foo@mit.edu', 'type': 'primary', 'index': 0}
+                    ],
+                    'roles': []
+                },
+                'creator',
+                initial_approval='approved'
+            )
+
+    def count_list_queries(self):
+        sqlstats.reset()
+        project_list = db.get_all_project_info('approved')
+        return sqlstats.get_summary()['queries'], project_list
+
+    def test_constant_queries(self):
+        self.add_projects(1)
+        num_queries, project_list = self.count_list_queries()
+        self.assertEqual(len(project_list), 2)
+
+        self.add_projects(5, first=1)
+        num_queries_more, project_list = self.count_list_queries()
+        self.assertEqual(len(project_list), 7)
+        self.assertEqual(num_queries_more, num_queries)
+
+    def test_matches_revision(self):
+        self.add_projects(1)
+        project_id = db.get_project_id('graph0')
+        project_info = db.get_all_info_for_project(project_id)
+        self.assertEqual(
+            [link['link'] for link in project_info['links']],
+            ['https://a.mit.edu', 'https://b.mit.edu']
+        )
+        self.assertEqual(
+            project_info['revision_info']['editor'], 'creator'
+        )
+
+        revision_info = db.get_all_info_for_project(
+            project_id, revision_id=db.get_current_revision(project_id)
+        )
+        for key in ['links', 'contacts', 'comm_channels', 'roles']:
+            self.assertEqual(
+                [entry['index'] for entry in project_info[key]],
+                [entry['index'] for entry in revision_info[key]]
+            )
+        self.assertEqual(
+            project_info['revision_info'], revision_info['revision_info']
+        )
+
+    def test_bulk_missing(self):
+        project_id = self.project_info_list[0]['project_id']
+        project_info_map = db.get_all_info_for_projects([project_id, -1])
+        self.assertEqual(list(project_info_map.keys()), [project_id])
+        self.assertEqual(
+            project_info_map[project_id]['contacts'][0]['email'],
+            'foo@mit.edu'
+        )
+
+
+class Test_core_read_path(testutils.DatabaseWipeTestCase):
+    def test_matches_orm(self):
+        for filter_method in ['approved', 'awaiting_approval']:
+            orm_list = db.projects_to_dicts(
+                db.get_all_projects(db.PROJECT_GRAPH_OPTIONS)
+            )
+            orm_list = [
+                db.get_document_info(project_info)
+                for project_info in orm_list
+                if project_info['approval'] == filter_method
+            ]
+            core_list = db.get_all_project_info(filter_method)
+            self.assertEqual(len(core_list), 1)
+            self.assertEqual(core_list, orm_list)
+
+    def test_contact(self):
+        project_list = db.get_all_project_info(
+            'contact', contact_email='foo@mit.edu'
+        )
+        self.assertEqual(
+            [project_info['name'] for project_info in project_list],
+            ['test1']
+        )
+
+    def test_compiled_once(self):
+        db.get_all_project_info('approved')
+        num_compiled = len(db._compiled_cache)
+        db.get_all_project_info('approved')
+        self.assertEqual(len(db._compiled_cache), num_compiled)
+
+
+class Test_project_documents(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_project_documents, self).setUp()
+        self.project_info = copy.deepcopy(self.project_info_list[0])
+        self.project_id = self.project_info['project_id']
+
+    def assertDocumentsCurrent(self):
+        self.assertEqual(db.check_project_documents(), [])
+
+    def test_written_on_add(self):
+        self.assertDocumentsCurrent()
+        document = schema.session.query(schema.ProjectDocuments).get(
+            self.project_id
+        )
+        self.assertEqual(
+            db.deserialize_document(document.document),
+            db.get_document_info(
+                db.get_all_info_for_projects([self.project_id])[
+                    self.project_id
+                ]
+            )
+        )
+
+    def test_written_on_update(self):
+        self.project_info['links'].append(
+            {'link': 'https://a.mit.edu', 'index': 0}
+        )
+        db.update_project(self.project_info, self.project_id, 'editor')
+        self.assertDocumentsCurrent()
+        project_info = db.get_all_project_info(
+            'contact', contact_email='foo@mit.edu'
+        )[0]
+        self.assertEqual(project_info['links'][0]['link'], 'https://a.mit.edu')
+
+    def test_written_on_approve_and_rollback(self):
+        db.approve_project(self.project_info, self.project_id, 'approver', '')
+        self.assertDocumentsCurrent()
+        self.assertEqual(
+            [
+                project_info['name']
+                for project_info in db.get_all_project_info('approved')
+            ],
+            ['test1', 'test2']
+        )
+        db.rollback_project(self.project_id, 0, 'editor')
+        self.assertDocumentsCurrent()
+
+    def test_written_on_renew_and_deactivate(self):
+        db.renew_project(self.project_id, 'editor')
+        self.assertDocumentsCurrent()
+        db.deactivate_projects([self.project_id], 'projects-database-admin')
+        self.assertDocumentsCurrent()
+
+    def test_checker(self):
+        schema.session.execute(
+            schema.Projects.__table__.update().where(
+                schema.Projects.project_id == self.project_id
+            ).values(description='changed behind our back')
+        )
+        schema.session.execute(
+            schema.ProjectDocuments.__table__.delete().where(
+                schema.ProjectDocuments.project_id ==
+                self.project_info_list[1]['project_id']
+            )
+        )
+        self.assertEqual(
+            sorted(db.check_project_documents()),
+            [
+                (self.project_id, 'stale'),
+                (self.project_info_list[1]['project_id'], 'missing')
+            ]
+        )
+
+        # Projects without a document are still listed:
+        self.assertEqual(
+            [
+                project_info['name']
+                for project_info in db.get_all_project_info('approved')
+            ],
+            ['test2']
+        )
+
+        db.refresh_project_documents()
+        self.assertDocumentsCurrent()
+
+    def test_datetime_round_trip(self):
+        project_info = db.get_document_info(
+            db.get_all_info_for_projects([self.project_id])[self.project_id]
+        )
+        for value in [
+            datetime.datetime(2021, 5, 1, 12, 30),
+            datetime.datetime(2021, 5, 1, 12, 30, 15, 250)
+        ]:
+            project_info['revision_info']['timestamp'] = value
+            self.assertEqual(
+                db.deserialize_document(db.serialize_document(project_info)),
+                project_info
+            )
+
+    def test_scheduling_columns_private(self):
+        db.renew_project(self.project_id, 'editor')
+        for project_info in db.get_all_project_info('contact', 'foo@mit.edu'):
+            for key in db.SCHEDULING_COLUMNS:
+                self.assertNotIn(key, project_info)
+
+    def test_scheduling_leaves_documents(self):
+        document = schema.session.query(
+            schema.ProjectDocuments.document
+        ).filter_by(project_id=self.project_id).scalar()
+        now = db.get_now()
+        sqlstats.reset()
+        db.set_next_reminder_times({self.project_id: now})
+        num_queries = sqlstats.get_summary()['queries']
+        # Just the UPDATE:
+        self.assertEqual(num_queries, 1)
+        db.renew_project(self.project_id, 'editor')
+        self.assertEqual(
+            schema.session.query(
+                schema.ProjectDocuments.document
+            ).filter_by(project_id=self.project_id).scalar(),
+            document
+        )
+        self.assertDocumentsCurrent()
+
+
+class Test_concurrent_edits(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_concurrent_edits, self).setUp()
+        self.project_info = copy.deepcopy(self.project_info_list[0])
+        self.project_id = self.project_info['project_id']
+        self.project_info['description'] = 'a new description'
+
+    def test_version_incremented(self):
+        version = db.get_project(self.project_id)[0]['version']
+        db.update_project(
+            self.project_info, self.project_id, 'editor',
+            expected_version=version
+        )
+        self.assertEqual(
+            db.get_project(self.project_id)[0]['version'], version + 1
+        )
+
+    def test_stale_form(self):
+        version = db.get_project(self.project_id)[0]['version']
+        revision_id = db.get_current_revision(self.project_id)
+        with self.assertRaises(db.ConcurrentEditError):
+            db.update_project(
+                self.project_info, self.project_id, 'editor',
+                expected_version=version - 1
+            )
+        self.assertEqual(db.get_current_revision(self.project_id), revision_id)
+        self.assertEqual(
+            db.get_project(self.project_id)[0]['description'],
+            'some test description'
+        )
+
+    def test_concurrent_write(self):
+        revision_id = db.get_current_revision(self.project_id)
+        change_set = db.diff_project(self.project_info, self.project_id)
+
+        # Another writer commits a new version after the project was read:
+        schema.session.execute(
+            schema.Projects.__table__.update().where(
+                schema.Projects.project_id == self.project_id
+            ).values(version=schema.Projects.version + 1)
+        )
+
+        with self.assertRaises(db.ConcurrentEditError):
+            db.update_project(
+                self.project_info, self.project_id, 'editor',
+                change_set=change_set
+            )
+        self.assertEqual(db.get_current_revision(self.project_id), revision_id)
+
+    def test_renew_increments_version(self):
+        version = db.get_project(self.project_id)[0]['version']
+        db.renew_project(self.project_id, 'editor')
+        self.assertEqual(
+            db.get_project(self.project_id)[0]['version'], version + 1
+        )
+        # An edit form loaded before the renewal is stale:
+        with self.assertRaises(db.ConcurrentEditError):
+            db.update_project(
+                self.project_info, self.project_id, 'editor',
+                expected_version=version
+            )
+
+    def test_renew_inactive(self):
+        db.deactivate_projects([self.project_id], 'editor')
+        version = db.get_project(self.project_id)[0]['version']
+        with self.assertRaises(ValueError):
+            db.renew_project(self.project_id, 'editor')
+        project = db.get_project(self.project_id)[0]
+        self.assertIsNone(project['expires_at'])
+        self.assertIsNone(project['next_reminder_at'])
+        self.assertIsNone(project['last_confirmed_by'])
+        self.assertEqual(project['version'], version)
+
+    def test_deactivate_skips_renewed(self):
+        now = db.get_now()
+        db.renew_project(self.project_id, 'editor')
+        deactivated = db.deactivate_projects(
+            [self.project_id], 'projects-database-admin',
+            now=now + datetime.timedelta(days=1)
+        )
+        self.assertEqual(deactivated, [])
+        project = db.get_project(self.project_id)[0]
+        self.assertEqual(project['status'], 'active')
+
+        version = project['version']
+        deactivated = db.deactivate_projects(
+            [self.project_id], 'projects-database-admin'
+        )
+        self.assertEqual(deactivated, [self.project_id])
+        project = db.get_project(self.project_id)[0]
+        self.assertEqual(project['status'], 'inactive')
+        self.assertEqual(project['version'], version + 1)
+
+
+
+
+class ReplicaUsedError(Exception):
+    pass
+
+
+class ForbiddenSession(object):
+    """Stand-in for the replica session which fails if it is used at all.
+    """
+    def __getattr__(self, name):
+        raise ReplicaUsedError('The read replica was used!')
+
+
+class Test_read_routing(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_read_routing, self).setUp()
+        # Stand in for the replica with a second session on the same
+        # database:
+        self.original_read_session = db.read_session
+        self.replica_session = sa.orm.sessionmaker(bind=schema.sqlengine)()
+        db.read_session = self.replica_session
+        db.reset_read_routing()
+        db.reset_read_cache()
+
+    def tearDown(self):
+        self.replica_session.close()
+        db.read_session = self.original_read_session
+        db.reset_read_routing()
+        super(Test_read_routing, self).tearDown()
+
+    def test_primary_by_default(self):
+        self.assertIs(db.get_read_session(), db.session)
+
+    def test_reads_use_replica(self):
+        db.allow_replica_reads()
+        self.assertIs(db.get_read_session(), self.replica_session)
+        self.assertEqual(
+            [
+                project_info['name']
+                for project_info in db.get_all_project_info('approved')
+            ],
+            ['test2']
+        )
+        self.assertEqual(
+            db.get_project_id('test2'), self.project_info_list[1]['project_id']
+        )
+
+    def test_primary_after_write(self):
+        db.allow_replica_reads()
+        db.renew_project(self.project_info_list[1]['project_id'], 'editor')
+        self.assertIs(db.get_read_session(), db.session)
+
+    def test_primary_with_pending_changes(self):
+        project = schema.Projects(
+            name='test3', description='', status='active',
+            approval='approved', creator='foo'
+        )
+        db.allow_replica_reads()
+        db.session.add(project)
+        try:
+            self.assertIs(db.get_read_session(), db.session)
+        finally:
+            db.session.rollback()
+        self.assertIs(db.get_read_session(), self.replica_session)
+
+    def test_edit_path_uses_primary(self):
+        db.read_session = ForbiddenSession()
+        db.allow_replica_reads()
+        with self.assertRaises(ReplicaUsedError):
+            db.get_project_name(self.project_info_list[0]['project_id'])
+        db.reset_read_routing()
+
+        # What the edit form loads, and what validating and saving it reads:
+        project_id = self.project_info_list[0]['project_id']
+        project_info = db.get_all_info_for_project(project_id)
+        project_info['roles'] = [
+            {'role': 'foo', 'description': 'bar', 'prereq': '', 'index': 0}
+        ]
+        with testutils.EnvironmentOverrider(keys=['SSL_CLIENT_S_DN_Email']):
+            os.environ['SSL_CLIENT_S_DN_Email'] = 'foo@mit.edu'
+            context = valutils.ValidationContext(
+                project_id=project_id, name=project_info['name'], user='foo'
+            )
+            is_ok, status_messages = valutils.validate_project_id(
+                project_id, context=context
+            )
+            self.assertTrue(is_ok)
+            is_ok, status_messages = valutils.validate_edit_project(
+                project_info, project_id, context=context
+            )
+            self.assertTrue(is_ok, status_messages)
+        self.assertTrue(authutils.can_edit('foo', project_id))
+        db.update_project(
+            project_info, project_id, 'foo',
+            expected_version=project_info['version']
+        )
+
+    def test_switch(self):
+        with testutils.EnvironmentOverrider(
+            keys=['PROJECTS_DATABASE_REPLICA_URL']
+        ):
+            os.environ['PROJECTS_DATABASE_REPLICA_URL'] = 'sqlite://'
+            self.assertEqual(schema.get_replica_url(), 'sqlite://')
+            original_use_read_replica = schema.config.USE_READ_REPLICA
+            schema.config.USE_READ_REPLICA = False
+            try:
+                self.assertIsNone(schema.get_replica_url())
+            finally:
+                schema.config.USE_READ_REPLICA = original_use_read_replica
+
+
+class Test_add_projects(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_add_projects, self).setUp()
+        self.new_project_info_list = [
+            {
+                'name': 'import%d' % index,
+                'description': 'an imported project',
+                'status': 'active',
+                'links': [
+                    {
+                        'link': 'https://example.com/%d' % index,
+                        'anchortext': None,
+                        'index': 0
+                    }
+                ],
+                'comm_channels': [
+                    {'commchannel': 'import%d@mit.edu' % index, 'index': 0}
+                ],
+                'contacts': [
+                    {'email': 'foo@mit.edu', 'type': 'primary', 'index': 0}
+                ],
+                'roles': [
+                    {
+                        'role': 'role%d' % role_index,
+                        'description': 'a role',
+                        'prereq': None,
+                        'index': role_index
+                    }
+                    for role_index in range(index)
+                ]
+            }
+            for index in range(3)
+        ]
+
+    def test_added(self):
+        project_ids = db.add_projects(
+            self.new_project_info_list, 'importer',
+            initial_approval='approved'
+        )
+        self.assertEqual(len(project_ids), 3)
+        for project_info, project_id in zip(
+            self.new_project_info_list, project_ids
+        ):
+            added_info = db.get_all_info_for_project(project_id)
+            self.assertEqual(added_info['name'], project_info['name'])
+            self.assertEqual(added_info['creator'], 'importer')
+            self.assertEqual(added_info['approval'], 'approved')
+            self.assertEqual(
+                [link['link'] for link in added_info['links']],
+                [link['link'] for link in project_info['links']]
+            )
+            self.assertEqual(
+                len(added_info['roles']), len(project_info['roles'])
+            )
+            self.assertEqual(db.get_current_revision(project_id), 0)
+            self.assertEqual(
+                schema.session.query(schema.RolesHistory).filter(
+                    schema.RolesHistory.project_id == project_id
+                ).count(),
+                len(project_info['roles'])
+            )
+        self.assertEqual(
+            db.get_project_id('import1'), project_ids[1]
+        )
+
+    def test_name_taken(self):
+        self.new_project_info_list[1]['name'] = 'TEST1'
+        with self.assertRaises(ValueError):
+            db.add_projects(self.new_project_info_list, 'importer')
+        self.assertIsNone(db.get_project_id('import0'))
+
+    def test_name_repeated(self):
+        self.new_project_info_list[2]['name'] = 'Import0'
+        with self.assertRaises(ValueError):
+            db.add_projects(self.new_project_info_list, 'importer')
+        self.assertIsNone(db.get_project_id('import0'))
+
+    def test_get_project_ids_by_name(self):
+        project_ids = db.get_project_ids_by_name(['TEST1', 'test2', 'foo'])
+        self.assertEqual(
+            project_ids,
+            {
+                'test1': self.project_info_list[0]['project_id'],
+                'test2': self.project_info_list[1]['project_id']
+            }
+        )
+
+
+class Test_get_database_url(unittest.TestCase):
+    def setUp(self):
+        self.original_url = getattr(schema.creds, 'database_url', None)
+
+    def tearDown(self):
+        schema.creds.database_url = self.original_url
+
+    def test_precedence(self):
+        with testutils.EnvironmentOverrider(keys=['PROJECTS_DATABASE_URL']):
+            os.environ.pop('PROJECTS_DATABASE_URL', None)
+            schema.creds.database_url = None
+            self.assertTrue(schema.get_database_url().startswith('mysql://'))
+
+            schema.creds.database_url = 'sqlite:///creds.sqlite'
+            self.assertEqual(
+                schema.get_database_url(), 'sqlite:///creds.sqlite'
+            )
+
+            os.environ['PROJECTS_DATABASE_URL'] = 'sqlite:///env.sqlite'
+            self.assertEqual(
+                schema.get_database_url(), 'sqlite:///env.sqlite'
+            )
+
+    def test_get_now(self):
+        self.assertIsInstance(db.get_now(), datetime.datetime)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import copy
+import gzip
+import io
+import unittest
+
+import db
+import dbbackup
+import schema
+
+
+def get_all_rows():
+    """Get the contents of every table, for comparing the database before and
+    after a restore.
+    """
+    return {
+        table.name: schema.session.query(table).order_by(
+            *table.primary_key.columns
+        ).all()
+        for table in dbbackup.get_tables()
+    }
+
+
+class Test_backup(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_backup, self).setUp()
+        project_info = copy.deepcopy(self.project_info_list[0])
+        project_info['description'] = 'a new description'
+        project_info['roles'] = [
+            {
+                'role': 'foo',
+                'description': 'bar',
+                'prereq': None,
+                'index': 0
+            }
+        ]
+        db.update_project(
+            project_info, project_info['project_id'], 'editor'
+        )
+        db.renew_project(project_info['project_id'], 'editor')
+
+    def export(self, batch_size=dbbackup.BATCH_SIZE):
+        f = io.BytesIO()
+        with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+            stats = dbbackup.export_database(gz, batch_size=batch_size)
+        f.seek(0)
+        return f, stats
+
+    def restore(self, f, **kwargs):
+        with gzip.GzipFile(fileobj=f, mode='rb') as gz:
+            return dbbackup.restore_database(gz, **kwargs)
+
+    def test_round_trip(self):
+        rows = get_all_rows()
+        f, stats = self.export(batch_size=2)
+        self.assertEqual(
+            [table_name for table_name, num_rows, seconds in stats],
+            [table.name for table in dbbackup.get_tables()]
+        )
+        self.assertEqual(
+            {table_name: num_rows for table_name, num_rows, seconds in stats},
+            {table_name: len(value) for table_name, value in rows.items()}
+        )
+
+        dbbackup.clear_tables(schema.session)
+        schema.session.commit()
+        self.assertEqual(db.get_project_ids_by_name(['test1', 'test2']), {})
+
+        stats = self.restore(f, batch_size=2)
+        self.assertEqual(get_all_rows(), rows)
+        self.assertEqual(
+            sum(num_rows for table_name, num_rows, seconds in stats),
+            sum(len(value) for value in rows.values())
+        )
+        self.assertEqual(db.check_project_documents(), [])
+
+    def test_not_empty(self):
+        f, stats = self.export()
+        with self.assertRaises(ValueError):
+            self.restore(f)
+
+    def test_replace(self):
+        rows = get_all_rows()
+        f, stats = self.export()
+        db.deactivate_projects(
+            [self.project_info_list[1]['project_id']], 'editor'
+        )
+        self.restore(f, replace=True)
+        self.assertEqual(get_all_rows(), rows)
+
+    def test_invalid(self):
+        rows = get_all_rows()
+        f = io.BytesIO()
+        with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+            gz.write(b'{"table": "projects"}\n')
+        f.seek(0)
+        with self.assertRaises(ValueError):
+            self.restore(f, replace=True)
+        self.assertEqual(get_all_rows(), rows)
+
+    def test_unknown_table(self):
+        rows = get_all_rows()
+        f = io.BytesIO()
+        with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+            dbbackup.write_line(
+                gz, {'format': 'projectdb-backup', 'version': 1}
+            )
+            dbbackup.write_line(gz, {'table': 'foo', 'columns': ['bar']})
+        f.seek(0)
+        with self.assertRaises(ValueError):
+            self.restore(f, replace=True)
+        # The rows deleted by replace are rolled back:
+        self.assertEqual(get_all_rows(), rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import copy
+import unittest
+
+import db
+import diffutils
+import schema
+
+
+class Test_values_equal(unittest.TestCase):
+    def test_exact(self):
+        self.assertTrue(diffutils.values_equal('foo', 'foo'))
+        self.assertFalse(diffutils.values_equal('foo', 'FOO'))
+        self.assertFalse(diffutils.values_equal(None, ''))
+
+    def test_ignore_case(self):
+        self.assertTrue(diffutils.values_equal('foo', 'FOO', True))
+        self.assertTrue(diffutils.values_equal(None, '', True))
+        self.assertTrue(diffutils.values_equal(None, None, True))
+        self.assertTrue(diffutils.values_equal(1, 1, True))
+        self.assertFalse(diffutils.values_equal(None, 'foo', True))
+        self.assertFalse(diffutils.values_equal(0, 1, True))
+
+
+class Test_diff_entries(unittest.TestCase):
+    def test_changes(self):
+        old_entries = [
+            {'email': 'a@mit.edu', 'type': 'primary', 'index': 0},
+            {'email': 'b@mit.edu', 'type': 'secondary', 'index': 1}
+        ]
+        new_entries = [
+            {'email': 'b@mit.edu', 'type': 'primary', 'index': 0},
+            {'email': 'c@mit.edu', 'type': 'secondary', 'index': 1}
+        ]
+        changes = diffutils.diff_entries(
+            old_entries, new_entries, 'email', ['email', 'type', 'index']
+        )
+        self.assertEqual(
+            [(change['change'], change['columns']) for change in changes],
+            [
+                ('update', ['type', 'index']),
+                ('create', ['email', 'type', 'index']),
+                ('delete', ['email', 'type', 'index'])
+            ]
+        )
+        self.assertEqual(changes[2]['old']['email'], 'a@mit.edu')
+        self.assertIsNone(changes[2]['new'])
+
+    def test_unchanged(self):
+        entries = [{'email': 'a@mit.edu', 'type': 'primary', 'index': 0}]
+        changes = diffutils.diff_entries(
+            entries, entries, 'email', ['email', 'type', 'index']
+        )
+        self.assertEqual(changes, [])
+
+
+class Test_TableChanges(unittest.TestCase):
+    def setUp(self):
+        self.current_rows = [
+            schema.Links(link='https://a.mit.edu', index=0, anchortext='A'),
+            schema.Links(link='https://b.mit.edu', index=1, anchortext=None),
+            schema.Links(link='https://c.mit.edu', index=2, anchortext='C')
+        ]
+
+    def get_changes(self, new_entries):
+        return diffutils.TableChanges(
+            schema.Links, 'link', self.current_rows, new_entries
+        )
+
+    def test_unchanged(self):
+        changes = self.get_changes(
+            [
+                {'link': 'https://a.mit.edu', 'index': 0, 'anchortext': 'A'},
+                {'link': 'https://b.mit.edu', 'index': 1},
+                {'link': 'https://c.mit.edu', 'index': 2, 'anchortext': 'C'}
+            ]
+        )
+        self.assertEqual(len(changes.unchanged), 3)
+        self.assertEqual(changes.creates, [])
+        self.assertEqual(changes.updates, [])
+        self.assertEqual(changes.deletes, [])
+        self.assertFalse(changes.is_changed())
+
+    def test_create_update_delete(self):
+        changes = self.get_changes(
+            [
+                {'link': 'https://a.mit.edu', 'index': 0, 'anchortext': 'a'},
+                {'link': 'https://c.mit.edu', 'index': 1, 'anchortext': 'C'},
+                {'link': 'https://d.mit.edu', 'index': 2, 'anchortext': None}
+            ]
+        )
+        self.assertEqual(
+            [entry['link'] for entry in changes.creates],
+            ['https://d.mit.edu']
+        )
+        self.assertEqual(
+            [(row.link, update) for row, update in changes.updates],
+            [
+                ('https://a.mit.edu', {'anchortext': 'a'}),
+                ('https://c.mit.edu', {'index': 1})
+            ]
+        )
+        self.assertEqual(
+            [row.link for row in changes.deletes], ['https://b.mit.edu']
+        )
+        self.assertTrue(changes.is_changed())
+
+    def test_case_only(self):
+        changes = self.get_changes(
+            [
+                {'link': 'https://a.mit.edu', 'index': 0, 'anchortext': 'a'},
+                {'link': 'https://b.mit.edu', 'index': 1, 'anchortext': ''},
+                {'link': 'https://c.mit.edu', 'index': 2, 'anchortext': 'C'}
+            ]
+        )
+        self.assertEqual(len(changes.updates), 2)
+        self.assertTrue(changes.is_changed())
+        self.assertFalse(changes.is_changed(ignore_case=True))
+
+
+class Test_diff_project(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_diff_project, self).setUp()
+        self.project_info = copy.deepcopy(self.project_info_list[0])
+        self.project_id = self.project_info['project_id']
+
+    def test_unchanged(self):
+        change_set = db.diff_project(self.project_info, self.project_id)
+        self.assertEqual(change_set.fields, {})
+        self.assertFalse(change_set.is_changed())
+        self.assertFalse(change_set.name_changed())
+
+    def test_name_case(self):
+        self.project_info['name'] = 'TEST1'
+        change_set = db.diff_project(self.project_info, self.project_id)
+        self.assertEqual(change_set.fields, {'name': ('test1', 'TEST1')})
+        self.assertFalse(change_set.name_changed())
+        self.assertTrue(change_set.name_changed(ignore_case=False))
+        self.assertFalse(change_set.is_changed())
+
+    def test_details_changed(self):
+        self.project_info['roles'] = [
+            {'role': 'foo', 'description': 'bar', 'prereq': None, 'index': 0}
+        ]
+        change_set = db.diff_project(self.project_info, self.project_id)
+        self.assertFalse(change_set.name_changed())
+        self.assertTrue(change_set.is_changed())
+        self.assertEqual(len(change_set.tables['roles'].creates), 1)
+
+    def test_ignored_fields(self):
+        # Fields which are not compared do not count as changes:
+        self.project_info['approval'] = 'rejected'
+        change_set = db.diff_project(self.project_info, self.project_id)
+        self.assertFalse(change_set.is_changed())
+
+    def test_missing_project(self):
+        with self.assertRaises(ValueError):
+            db.diff_project(self.project_info, -1)
+
+    def test_update_project(self):
+        self.project_info['description'] = 'a new description'
+        self.project_info['contacts'].append(
+            {'email': 'bar@mit.edu', 'type': 'secondary', 'index': 1}
+        )
+        db.update_project(self.project_info, self.project_id, 'editor')
+
+        project_info = db.get_all_info_for_project(self.project_id)
+        self.assertEqual(project_info['description'], 'a new description')
+        self.assertEqual(
+            [contact['email'] for contact in project_info['contacts']],
+            ['foo@mit.edu', 'bar@mit.edu']
+        )
+
+        # Every revision has a full snapshot of the auxiliary tables:
+        revision_id = db.get_current_revision(self.project_id)
+        contacts = db.get_contacts_revision(
+            self.project_id, revision_id=revision_id
+        )
+        self.assertEqual(
+            [contact['action'] for contact in contacts], ['same', 'create']
+        )
+        self.assertFalse(
+            db.diff_project(self.project_info, self.project_id).is_changed()
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import latencyreport
+
+
+def make_entry(script, time, total, ok=True):
+    return {
+        'time': time,
+        'script': script,
+        'ok': ok,
+        'phases': {'db': total / 2.0, 'total': total}
+    }
+
+
+class Test_get_percentile(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(latencyreport.get_percentile(values, 50), 50)
+        self.assertEqual(latencyreport.get_percentile(values, 95), 95)
+        self.assertEqual(latencyreport.get_percentile(values, 99), 99)
+        self.assertEqual(latencyreport.get_percentile(values, 100), 100)
+
+    def test_single_value(self):
+        self.assertEqual(latencyreport.get_percentile([3.0], 50), 3.0)
+        self.assertEqual(latencyreport.get_percentile([3.0], 0), 3.0)
+
+
+class Test_load_entries(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.log_dir, 'timing.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir)
+
+    def write_log(self, path, entries):
+        with open(path, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+
+    def test_window_and_backups(self):
+        self.write_log(
+            self.log_path,
+            [
+                make_entry('projectlist.py', 150.0, 0.1),
+                make_entry('projectlist.py', 250.0, 0.1)
+            ]
+        )
+        self.write_log(
+            self.log_path + '.1',
+            [
+                make_entry('projectlist.py', 50.0, 0.1),
+                make_entry('editproject.py', 100.0, 0.1)
+            ]
+        )
+        with open(self.log_path, 'a') as f:
+            f.write('not json\n')
+
+        entries = latencyreport.load_entries(self.log_path, 100.0, 200.0)
+        self.assertEqual(
+            sorted(entry['time'] for entry in entries), [100.0, 150.0]
+        )
+
+    def test_missing_log(self):
+        self.assertEqual(
+            latencyreport.load_entries(self.log_path, 0.0, 1000.0), []
+        )
+
+
+class Test_summarize(unittest.TestCase):
+    def test_summarize(self):
+        entries = [
+            make_entry('projectlist.py', 0.0, total)
+            for total in [0.4, 0.1, 0.3, 0.2]
+        ] + [make_entry('editproject.py', 0.0, 1.0, ok=False)]
+        summary = latencyreport.summarize(entries)
+
+        self.assertEqual(
+            sorted(summary.keys()), ['editproject.py', 'projectlist.py']
+        )
+        projectlist = summary['projectlist.py']
+        self.assertEqual(projectlist['requests'], 4)
+        self.assertEqual(projectlist['errors'], 0)
+        self.assertEqual(
+            projectlist['phases']['total'],
+            {'p50': 0.2, 'p95': 0.4, 'p99': 0.4}
+        )
+        self.assertEqual(projectlist['phases']['db']['p50'], 0.1)
+        self.assertEqual(summary['editproject.py']['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import db
+import mail
+import projectimport
+import staticexport
+import strutils
+
+
+class Test_load_projects(unittest.TestCase):
+    def test_jsonl(self):
+        data = (
+            '{"name": "foo", "description": "a test project", '
+            '"contacts": ["foo@mit.edu", {"email": "bar@mit.edu"}], '
+            '"comm_channels": ["foo@mit.edu"], '
+            '"links": ["example.com", '
+            '{"link": "https://example.org", "anchortext": "docs"}], '
+            '"roles": [{"role": "dev", "description": "writes code"}]}\n'
+            '\n'
+            '{"name": "bar", "description": "another test project", '
+            '"status": "inactive"}\n'
+        )
+        project_info_list = projectimport.load_projects(data, 'jsonl')
+        self.assertEqual(len(project_info_list), 2)
+        project_info = project_info_list[0]
+        self.assertEqual(project_info['name'], 'foo')
+        self.assertEqual(project_info['status'], 'active')
+        self.assertEqual(
+            project_info['contacts'],
+            [
+                {'email': 'foo@mit.edu', 'type': 'primary', 'index': 0},
+                {'email': 'bar@mit.edu', 'type': 'secondary', 'index': 1}
+            ]
+        )
+        self.assertEqual(
+            project_info['comm_channels'],
+            [{'commchannel': 'foo@mit.edu', 'index': 0}]
+        )
+        self.assertEqual(
+            project_info['links'],
+            [
+                {'link': 'http://example.com', 'anchortext': None, 'index': 0},
+                {
+                    'link': 'https://example.org',
+                    'anchortext': 'docs',
+                    'index': 1
+                }
+            ]
+        )
+        self.assertEqual(
+            project_info['roles'],
+            [
+                {
+                    'role': 'dev',
+                    'description': 'writes code',
+                    'prereq': None,
+                    'index': 0
+                }
+            ]
+        )
+        self.assertEqual(project_info_list[1]['status'], 'inactive')
+        self.assertEqual(project_info_list[1]['contacts'], [])
+
+    def test_jsonl_error(self):
+        data = '{"name": "foo"}\n{"name": \n'
+        with self.assertRaises(ValueError) as cm:
+            projectimport.load_projects(data, 'jsonl')
+        self.assertTrue(str(cm.exception).startswith('Line 2: '))
+
+    def test_csv(self):
+        data = (
+            'name,description,status,contacts,comm_channels,link_0,'
+            'anchortext_0,role_name_0,role_description_0,role_prereqs_0\n'
+            'foo,"a test project, with a comma",active,'
+            '"foo@mit.edu, bar@mit.edu",foo@mit.edu,example.com,,dev,'
+            'writes code,\n'
+        )
+        project_info_list = projectimport.load_projects(
+            data.encode('utf-8'), 'csv'
+        )
+        self.assertEqual(len(project_info_list), 1)
+        project_info = project_info_list[0]
+        self.assertEqual(project_info['name'], 'foo')
+        self.assertEqual(
+            project_info['description'], 'a test project, with a comma'
+        )
+        self.assertEqual(
+            [contact['email'] for contact in project_info['contacts']],
+            ['foo@mit.edu', 'bar@mit.edu']
+        )
+        self.assertEqual(
+            [link['link'] for link in project_info['links']],
+            ['http://example.com']
+        )
+        self.assertEqual(
+            [role['role'] for role in project_info['roles']], ['dev']
+        )
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            projectimport.load_projects('', 'xml')
+
+    def test_get_format(self):
+        self.assertEqual(projectimport.get_format('projects.CSV'), 'csv')
+        self.assertEqual(projectimport.get_format('projects.jsonl'), 'jsonl')
+
+
+class Test_import_projects(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_import_projects, self).setUp()
+        # The import refreshes the static pages, whose templates are loaded
+        # relative to web_scripts:
+        self.static_dir = tempfile.mkdtemp()
+        self.original_static_dir = staticexport.STATIC_DIR
+        self.original_cwd = os.getcwd()
+        os.chdir(os.path.join(os.path.dirname(__file__), '..'))
+        staticexport.STATIC_DIR = os.path.join(self.static_dir, 'static')
+        self.original_send = mail.send
+        self.sent = []
+
+        def fake_send(recipients, sender, subject, msg):
+            self.sent.append((recipients, subject, msg))
+
+        mail.send = fake_send
+
+    def tearDown(self):
+        mail.send = self.original_send
+        staticexport.STATIC_DIR = self.original_static_dir
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.static_dir)
+        super(Test_import_projects, self).tearDown()
+
+    def test_import(self):
+        data = (
+            '{"name": "foo", "description": "a test project", '
+            '"contacts": ["foo@mit.edu"], '
+            '"roles": [{"role": "dev", "description": "writes code"}]}\n'
+            '{"name": "bar", "description": "another test project", '
+            '"contacts": ["bar@mit.edu"], '
+            '"roles": [{"role": "dev", "description": "writes code"}]}\n'
+        )
+        project_info_list = projectimport.load_projects(data, 'jsonl')
+        is_ok, status_messages, project_ids = projectimport.import_projects(
+            project_info_list, 'importer', send_mail=False
+        )
+        self.assertTrue(is_ok)
+        self.assertEqual(status_messages, [])
+        self.assertEqual(
+            [db.get_project_name(project_id) for project_id in project_ids],
+            ['foo', 'bar']
+        )
+        self.assertTrue(
+            os.path.isfile(
+                os.path.join(staticexport.STATIC_DIR, staticexport.STATIC_JSON)
+            )
+        )
+
+    def test_non_ascii_name(self):
+        data = (
+            '{"name": "Caf\\u00e9", "description": "a test project", '
+            '"contacts": ["foo@mit.edu"], '
+            '"roles": [{"role": "dev", "description": "writes code"}]}\n'
+        )
+        project_info_list = projectimport.load_projects(data, 'jsonl')
+        is_ok, status_messages, project_ids = projectimport.import_projects(
+            project_info_list, 'importer', initial_approval='approved'
+        )
+        self.assertTrue(is_ok)
+        self.assertEqual(status_messages, [])
+        self.assertEqual(db.get_project_name(project_ids[0]), u'Caf\xe9')
+        self.assertEqual(len(self.sent), 1)
+        recipients, subject, msg = self.sent[0]
+        self.assertEqual(recipients, mail.APPROVERS_LIST)
+        self.assertIn(u'Caf\xe9', strutils.decode_utf(msg))
+
+    def test_mail_failure(self):
+        def failing_send(recipients, sender, subject, msg):
+            raise RuntimeError('SMTP failure')
+
+        mail.send = failing_send
+        data = (
+            '{"name": "foo", "description": "a test project", '
+            '"contacts": ["foo@mit.edu"], '
+            '"roles": [{"role": "dev", "description": "writes code"}]}\n'
+        )
+        project_info_list = projectimport.load_projects(data, 'jsonl')
+        original_stderr = sys.stderr
+        sys.stderr = tempfile.TemporaryFile(mode='w+')
+        try:
+            is_ok, status_messages, project_ids = \
+                projectimport.import_projects(project_info_list, 'importer')
+            sys.stderr.seek(0)
+            self.assertIn('SMTP failure', sys.stderr.read())
+        finally:
+            sys.stderr.close()
+            sys.stderr = original_stderr
+        # The projects were committed, so the import still succeeded:
+        self.assertTrue(is_ok)
+        self.assertEqual(len(status_messages), 1)
+        self.assertIn('could not be emailed', status_messages[0])
+        self.assertEqual(db.get_project_name(project_ids[0]), 'foo')
+
+    def test_invalid(self):
+        data = (
+            '{"name": "test1", "description": "a test project", '
+            '"contacts": ["foo@mit.edu"], '
+            '"roles": [{"role": "dev", "description": "writes code"}]}\n'
+            '{"name": "bar", "description": "another test project", '
+            '"contacts": ["bar@mit.edu"], '
+            '"roles": [{"role": "dev", "description": "writes code"}]}\n'
+        )
+        project_info_list = projectimport.load_projects(data, 'jsonl')
+        is_ok, status_messages, project_ids = projectimport.import_projects(
+            project_info_list, 'importer', send_mail=False
+        )
+        self.assertFalse(is_ok)
+        self.assertEqual(project_ids, [])
+        self.assertIsNone(db.get_project_id('bar'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import config
+import profilesummary
+import requestutils
+import timingutils
+
+
+class Test_profiling(testutils.EnvironmentOverrideTestCase):
+    def setUp(self):
+        super(Test_profiling, self).setUp()
+        self.profile_dir = tempfile.mkdtemp()
+        self.original_profile_dir = config.PROFILE_DIR
+        config.PROFILE_DIR = os.path.join(self.profile_dir, 'profiles')
+        self.original_log = config.SQL_STATS_LOG
+        config.SQL_STATS_LOG = os.path.join(self.profile_dir, 'sqlstats.log')
+        self.original_timing_log = config.TIMING_LOG
+        config.TIMING_LOG = os.path.join(self.profile_dir, 'timing.log')
+        self.original_profile_env = os.environ.pop('PROJECTS_PROFILE', None)
+        self.original_query = os.environ.get('QUERY_STRING')
+        os.environ['QUERY_STRING'] = ''
+
+    def tearDown(self):
+        testutils.restore_env('PROJECTS_PROFILE', self.original_profile_env)
+        testutils.restore_env('QUERY_STRING', self.original_query)
+        config.PROFILE_DIR = self.original_profile_dir
+        config.SQL_STATS_LOG = self.original_log
+        config.TIMING_LOG = self.original_timing_log
+        shutil.rmtree(self.profile_dir)
+        super(Test_profiling, self).tearDown()
+
+    def run_page(self):
+        output = tempfile.TemporaryFile(mode='w+')
+        original_stdout = sys.stdout
+        sys.stdout = output
+        try:
+            requestutils.run(lambda: sys.stdout.write('<html></html>\n'))
+        finally:
+            sys.stdout = original_stdout
+        output.seek(0)
+        page = output.read()
+        output.close()
+        return page
+
+    def get_profiles(self):
+        return profilesummary.find_profiles(config.PROFILE_DIR, num_recent=100)
+
+    def test_admin_query(self):
+        os.environ['SSL_CLIENT_S_DN_Email'] = (
+            config.ADMIN_USERS[0] + '@mit.edu'
+        )
+        os.environ['QUERY_STRING'] = 'filter_by=active&profile=1'
+        page = self.run_page()
+        profiles = self.get_profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertIn('Profile written to %s' % profiles[0], page)
+
+    def test_admin_environment(self):
+        os.environ['SSL_CLIENT_S_DN_Email'] = (
+            config.ADMIN_USERS[0] + '@mit.edu'
+        )
+        os.environ['PROJECTS_PROFILE'] = '1'
+        self.run_page()
+        self.assertEqual(len(self.get_profiles()), 1)
+
+    def test_not_requested(self):
+        os.environ['SSL_CLIENT_S_DN_Email'] = (
+            config.ADMIN_USERS[0] + '@mit.edu'
+        )
+        self.run_page()
+        self.assertEqual(self.get_profiles(), [])
+
+    def test_not_admin(self):
+        os.environ['SSL_CLIENT_S_DN_Email'] = 'someone@mit.edu'
+        os.environ['QUERY_STRING'] = 'profile=1'
+        page = self.run_page()
+        self.assertEqual(self.get_profiles(), [])
+        self.assertNotIn('<!--', page)
+
+
+class Test_write_log_line(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.original_log = config.SQL_STATS_LOG
+
+    def tearDown(self):
+        config.SQL_STATS_LOG = self.original_log
+        shutil.rmtree(self.log_dir)
+
+    def test_default_is_file(self):
+        self.assertIsNotNone(self.original_log)
+        self.assertEqual(
+            os.path.dirname(self.original_log),
+            os.path.dirname(config.TIMING_LOG)
+        )
+
+    def test_file(self):
+        config.SQL_STATS_LOG = os.path.join(
+            self.log_dir, 'logs', 'sqlstats.log'
+        )
+        requestutils.write_log_line('first')
+        requestutils.write_log_line('second')
+        with open(config.SQL_STATS_LOG) as f:
+            self.assertEqual(f.read(), 'first\nsecond\n')
+
+    def test_stderr(self):
+        config.SQL_STATS_LOG = None
+        original_stderr = sys.stderr
+        sys.stderr = tempfile.TemporaryFile(mode='w+')
+        try:
+            requestutils.write_log_line('first')
+            sys.stderr.seek(0)
+            self.assertEqual(sys.stderr.read(), 'first\n')
+        finally:
+            sys.stderr.close()
+            sys.stderr = original_stderr
+
+
+class Test_timing(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.original_log = config.SQL_STATS_LOG
+        config.SQL_STATS_LOG = os.path.join(self.log_dir, 'sqlstats.log')
+        self.original_timing_log = config.TIMING_LOG
+        config.TIMING_LOG = os.path.join(self.log_dir, 'logs', 'timing.log')
+
+    def tearDown(self):
+        config.SQL_STATS_LOG = self.original_log
+        config.TIMING_LOG = self.original_timing_log
+        for handler in list(requestutils.timing_logger.handlers):
+            requestutils.timing_logger.removeHandler(handler)
+            handler.close()
+        shutil.rmtree(self.log_dir)
+
+    def run_page(self, main):
+        output = tempfile.TemporaryFile(mode='w+')
+        original_stdout = sys.stdout
+        sys.stdout = output
+        try:
+            requestutils.run(main, html=False)
+        finally:
+            sys.stdout = original_stdout
+            output.close()
+        with open(config.TIMING_LOG) as f:
+            return [json.loads(line) for line in f]
+
+    def test_timed(self):
+        timingutils.reset()
+        with timingutils.timed('render'):
+            pass
+        first = timingutils.phase_seconds['render']
+        with timingutils.timed('render'):
+            pass
+        self.assertGreaterEqual(timingutils.phase_seconds['render'], first)
+        timingutils.reset()
+        self.assertEqual(timingutils.phase_seconds, {})
+
+    def test_timed_overlapping(self):
+        timingutils.reset()
+
+        def time_mail():
+            with timingutils.timed('mail'):
+                pass
+
+        with timingutils.timed('mail'):
+            time_mail()
+            thread = threading.Thread(target=time_mail)
+            thread.start()
+            thread.join()
+            self.assertNotIn('mail', timingutils.phase_seconds)
+        self.assertIn('mail', timingutils.phase_seconds)
+        timingutils.reset()
+
+    def test_replaces_stale_handlers(self):
+        for name in ['old1.log', 'old2.log']:
+            requestutils.timing_logger.addHandler(
+                logging.FileHandler(os.path.join(self.log_dir, name))
+            )
+        handler = requestutils.get_timing_handler()
+        self.assertEqual(requestutils.timing_logger.handlers, [handler])
+        self.assertEqual(handler.baseFilename, config.TIMING_LOG)
+
+    def test_log_line(self):
+        def main():
+            with timingutils.timed('render'):
+                sys.stdout.write('<html></html>\n')
+
+        entries = self.run_page(main)
+        self.assertEqual(len(entries), 1)
+        self.assertTrue(entries[0]['ok'])
+        self.assertEqual(entries[0]['script'], requestutils.get_script_name())
+        self.assertEqual(
+            sorted(entries[0]['phases'].keys()), sorted(timingutils.PHASES)
+        )
+        self.assertGreaterEqual(
+            entries[0]['phases']['total'], entries[0]['phases']['render']
+        )
+
+    def test_error(self):
+        def main():
+            raise ValueError('Oops')
+
+        with self.assertRaises(ValueError):
+            self.run_page(main)
+        with open(config.TIMING_LOG) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(len(entries), 1)
+        self.assertFalse(entries[0]['ok'])
+
+    def test_get_phase_times(self):
+        timingutils.reset()
+        timingutils.phase_seconds['mail'] = 0.5
+        phases = requestutils.get_phase_times(10.0, 11.0, 14.0, 1.0)
+        self.assertEqual(phases['startup'], 1.0)
+        self.assertEqual(phases['total'], 4.0)
+        self.assertEqual(phases['other'], 1.5)
+        timingutils.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
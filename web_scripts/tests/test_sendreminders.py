@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import datetime
+import time
+import unittest
+
+import config
+import db
+import mail
+import schema
+import sendreminders
+import staticexport
+import timingutils
+
+
+class Test_get_due_reminder(unittest.TestCase):
+    def setUp(self):
+        self.expires_at = datetime.datetime(2023, 6, 1, 12, 0, 0)
+
+    def test_none_due(self):
+        now = self.expires_at - datetime.timedelta(days=100)
+        result = sendreminders.get_due_reminder(
+            {'expires_at': self.expires_at}, now
+        )
+        self.assertIsNone(result)
+
+    def test_first_reminder(self):
+        num_days = max(config.REMIND_DAYS_BEFORE_EXPIRATION)
+        now = self.expires_at - datetime.timedelta(days=num_days)
+        result = sendreminders.get_due_reminder(
+            {'expires_at': self.expires_at}, now
+        )
+        self.assertEqual(result, num_days)
+
+    def test_missed_reminders(self):
+        # Only the most recent of several missed reminders is due:
+        num_days = min(config.REMIND_DAYS_BEFORE_EXPIRATION)
+        now = self.expires_at - datetime.timedelta(days=num_days)
+        result = sendreminders.get_due_reminder(
+            {'expires_at': self.expires_at}, now
+        )
+        self.assertEqual(result, num_days)
+
+    def test_expired(self):
+        now = self.expires_at + datetime.timedelta(days=3)
+        result = sendreminders.get_due_reminder(
+            {'expires_at': self.expires_at}, now
+        )
+        self.assertEqual(result, 0)
+
+
+class Test_get_reminder_kind(unittest.TestCase):
+    def test_reminder(self):
+        kind = sendreminders.get_reminder_kind(7)
+        self.assertEqual(kind, 'reminder_7')
+        self.assertEqual(sendreminders.get_num_days_left(kind), 7)
+
+    def test_deactivation(self):
+        kind = sendreminders.get_reminder_kind(0)
+        self.assertEqual(kind, 'deactivation')
+        self.assertEqual(sendreminders.get_num_days_left(kind), 0)
+
+
+class Test_is_reminder_current(unittest.TestCase):
+    def setUp(self):
+        self.deadline = datetime.datetime(2023, 6, 1, 12, 0, 0)
+
+    def test_reminder_current(self):
+        result = sendreminders.is_reminder_current(
+            {'reminder_kind': 'reminder_7', 'deadline': self.deadline},
+            {'status': 'active', 'expires_at': self.deadline}
+        )
+        self.assertTrue(result)
+
+    def test_reminder_renewed(self):
+        result = sendreminders.is_reminder_current(
+            {'reminder_kind': 'reminder_7', 'deadline': self.deadline},
+            {
+                'status': 'active',
+                'expires_at': self.deadline + datetime.timedelta(days=10)
+            }
+        )
+        self.assertFalse(result)
+
+    def test_deactivation_current(self):
+        result = sendreminders.is_reminder_current(
+            {'reminder_kind': 'deactivation', 'deadline': self.deadline},
+            {'status': 'inactive', 'expires_at': None}
+        )
+        self.assertTrue(result)
+
+    def test_deactivation_reactivated(self):
+        result = sendreminders.is_reminder_current(
+            {'reminder_kind': 'deactivation', 'deadline': self.deadline},
+            {
+                'status': 'active',
+                'expires_at': self.deadline + datetime.timedelta(days=365)
+            }
+        )
+        self.assertFalse(result)
+
+
+class Test_deliver_reminders(unittest.TestCase):
+    def setUp(self):
+        self.original_send = mail.send_confirm_reminder_message
+        self.sent = []
+
+        def fake_send(project_info, num_days_left):
+            if project_info['project_id'] == 2:
+                raise RuntimeError('SMTP failure')
+            self.sent.append(project_info['project_id'])
+
+        mail.send_confirm_reminder_message = fake_send
+        self.jobs = [
+            (
+                {'project_id': project_id, 'reminder_kind': 'reminder_7'},
+                {'project_id': project_id}
+            )
+            for project_id in range(5)
+        ]
+
+    def tearDown(self):
+        mail.send_confirm_reminder_message = self.original_send
+
+    def test_serial(self):
+        failures = sendreminders.deliver_reminders(self.jobs)
+        self.assertEqual(self.sent, [0, 1, 3, 4])
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0][0]['project_id'], 2)
+        self.assertIn('SMTP failure', failures[0][1])
+
+    def test_parallel(self):
+        completed = []
+        failures = sendreminders.deliver_reminders(
+            self.jobs,
+            num_workers=3,
+            callback=lambda reminder, error: completed.append(
+                (reminder['project_id'], error is None)
+            )
+        )
+        self.assertEqual(sorted(self.sent), [0, 1, 3, 4])
+        self.assertEqual(
+            sorted(completed),
+            [(0, True), (1, True), (2, False), (3, True), (4, True)]
+        )
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0][0]['project_id'], 2)
+
+    def test_parallel_mail_time(self):
+        def fake_send(project_info, num_days_left):
+            with timingutils.timed('mail'):
+                time.sleep(0.02)
+
+        mail.send_confirm_reminder_message = fake_send
+        timingutils.reset()
+        start_time = time.time()
+        sendreminders.deliver_reminders(self.jobs, num_workers=5)
+        wall_seconds = time.time() - start_time
+        # The workers send at once, so adding up their times would exceed the
+        # wall time:
+        self.assertLessEqual(timingutils.phase_seconds['mail'], wall_seconds)
+        timingutils.reset()
+
+
+class Test_main(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_main, self).setUp()
+        self.original_send = mail.send
+        self.sent = []
+
+        def fake_send(recipients, sender, subject, msg):
+            self.sent.append((sorted(recipients), subject))
+
+        mail.send = fake_send
+        self.original_refresh = staticexport.refresh_static_pages
+        self.num_refreshes = 0
+
+        def fake_refresh():
+            self.num_refreshes += 1
+            return True
+
+        staticexport.refresh_static_pages = fake_refresh
+
+        # test1 is one day from expiring, and test2 has expired:
+        self.now = db.get_now()
+        for project_info, expires_at in zip(
+            self.project_info_list,
+            [
+                self.now + datetime.timedelta(days=1),
+                self.now - datetime.timedelta(days=1)
+            ]
+        ):
+            schema.session.query(schema.Projects).filter_by(
+                project_id=project_info['project_id']
+            ).update(
+                {'expires_at': expires_at, 'next_reminder_at': self.now},
+                synchronize_session=False
+            )
+        schema.session.commit()
+        db.reset_read_cache()
+
+    def tearDown(self):
+        mail.send = self.original_send
+        staticexport.refresh_static_pages = self.original_refresh
+        super(Test_main, self).tearDown()
+
+    def test_messages(self):
+        # The messages need each project's name, contacts, and creator, which
+        # the reminder scan does not load:
+        sendreminders.plan_reminders(self.now)
+        failures = sendreminders.send_pending_reminders(num_workers=1)
+        self.assertEqual(failures, [])
+        self.assertEqual(
+            sorted(self.sent),
+            sorted(
+                [
+                    (
+                        ['creator@mit.edu', 'foo@mit.edu'],
+                        "[ACTION NEEDED] SIPB project 'test1' needs to be "
+                        "renewed"
+                    ),
+                    (
+                        sorted(
+                            [
+                                'creator@mit.edu',
+                                'this_is_definitely_not_a_valid_kerb@mit.edu',
+                                mail.APPROVERS_LIST
+                            ]
+                        ),
+                        "[NOTICE] SIPB project 'test2' has been marked as "
+                        "inactive"
+                    )
+                ]
+            )
+        )
+        project = db.get_project(self.project_info_list[1]['project_id'])[0]
+        self.assertEqual(project['status'], 'inactive')
+
+        # Nothing is sent twice:
+        del self.sent[:]
+        sendreminders.plan_reminders(self.now)
+        sendreminders.send_pending_reminders(num_workers=1)
+        self.assertEqual(self.sent, [])
+
+    def test_deactivation_refreshes_static_pages(self):
+        sendreminders.main()
+        self.assertEqual(self.num_refreshes, 1)
+        self.assertEqual(len(self.sent), 2)
+
+        # A run which deactivates nothing leaves the pages alone:
+        sendreminders.main()
+        self.assertEqual(self.num_refreshes, 1)
+        self.assertEqual(len(self.sent), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import config
+import db
+import requestutils
+import sqlstats
+
+
+class Test_normalize_statement(unittest.TestCase):
+    def test_values(self):
+        self.assertEqual(
+            sqlstats.normalize_statement(
+                "SELECT name FROM projects\n  WHERE project_id = 12 "
+                "AND status = 'active'"
+            ),
+            'SELECT name FROM projects WHERE project_id = ? AND status = ?'
+        )
+
+    def test_parameter_lists(self):
+        self.assertEqual(
+            sqlstats.normalize_statement(
+                'SELECT * FROM links WHERE project_id IN (?, ?, ?)'
+            ),
+            sqlstats.normalize_statement(
+                'SELECT * FROM links WHERE project_id IN (%s)'
+            )
+        )
+
+
+class Test_summary(testutils.DatabaseWipeTestCase):
+    def test_counts(self):
+        sqlstats.reset()
+        db.get_all_project_info('approved')
+        summary = sqlstats.get_summary()
+        self.assertGreaterEqual(summary['queries'], 1)
+        self.assertEqual(summary['repeated'], [])
+
+    def test_repeated(self):
+        project_id = self.project_info_list[0]['project_id']
+        sqlstats.reset()
+        for i in range(config.SQL_REPEAT_THRESHOLD + 1):
+            db.reset_read_cache()
+            db.get_project_name(project_id)
+        summary = sqlstats.get_summary()
+        self.assertEqual(len(summary['repeated']), 1)
+        self.assertEqual(
+            summary['repeated'][0]['count'], config.SQL_REPEAT_THRESHOLD + 1
+        )
+        self.assertIn('projects', summary['repeated'][0]['statement'])
+
+        comment = sqlstats.format_html_comment(summary)
+        self.assertTrue(comment.startswith('<!--'))
+        self.assertNotIn('--', comment[4:-3])
+        log_line = sqlstats.format_log_line(summary, 'test.py')
+        self.assertTrue(log_line.startswith('sqlstats '))
+        self.assertEqual(
+            json.loads(log_line[len('sqlstats '):])['queries'],
+            summary['queries']
+        )
+
+
+class Test_run(testutils.EnvironmentOverrideDatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_run, self).setUp()
+        self.log_dir = tempfile.mkdtemp()
+        self.original_log = config.SQL_STATS_LOG
+        config.SQL_STATS_LOG = os.path.join(self.log_dir, 'sqlstats.log')
+        self.original_timing_log = config.TIMING_LOG
+        config.TIMING_LOG = os.path.join(self.log_dir, 'timing.log')
+        self.output = tempfile.TemporaryFile(mode='w+')
+        self.original_stdout = sys.stdout
+
+    def tearDown(self):
+        sys.stdout = self.original_stdout
+        self.output.close()
+        config.SQL_STATS_LOG = self.original_log
+        config.TIMING_LOG = self.original_timing_log
+        shutil.rmtree(self.log_dir)
+        super(Test_run, self).tearDown()
+
+    def run_page(self, html=True):
+        def main():
+            db.get_all_project_info('approved')
+            print('Content-type: text/html\n\n<html></html>')
+
+        sys.stdout = self.output
+        try:
+            requestutils.run(main, html=html)
+        finally:
+            sys.stdout = self.original_stdout
+        self.output.seek(0)
+        with open(config.SQL_STATS_LOG) as f:
+            return self.output.read(), f.read()
+
+    def test_admin(self):
+        os.environ['SSL_CLIENT_S_DN_Email'] = (
+            config.ADMIN_USERS[0] + '@mit.edu'
+        )
+        page, log = self.run_page()
+        self.assertIn('<!--\nSQL: ', page)
+        self.assertEqual(len(log.splitlines()), 1)
+
+    def test_not_admin(self):
+        os.environ['SSL_CLIENT_S_DN_Email'] = 'someone@mit.edu'
+        page, log = self.run_page()
+        self.assertNotIn('<!--', page)
+        self.assertEqual(len(log.splitlines()), 1)
+
+    def test_not_html(self):
+        os.environ['SSL_CLIENT_S_DN_Email'] = (
+            config.ADMIN_USERS[0] + '@mit.edu'
+        )
+        page, log = self.run_page(html=False)
+        self.assertNotIn('<!--', page)
+
+
+if __name__ == '__main__':
+    unittest.main()
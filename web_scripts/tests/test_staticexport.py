@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import fcntl
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import db
+import projectjson
+import staticexport
+
+
+class Test_export_static_pages(testutils.DatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_export_static_pages, self).setUp()
+        self.static_dir = tempfile.mkdtemp()
+        self.original_static_dir = staticexport.STATIC_DIR
+        # The templates are loaded relative to web_scripts:
+        self.original_cwd = os.getcwd()
+        os.chdir(os.path.join(os.path.dirname(__file__), '..'))
+        staticexport.STATIC_DIR = os.path.join(self.static_dir, 'static')
+
+    def tearDown(self):
+        staticexport.STATIC_DIR = self.original_static_dir
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.static_dir)
+        super(Test_export_static_pages, self).tearDown()
+
+    def read(self, filename):
+        with open(os.path.join(staticexport.STATIC_DIR, filename), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def test_export(self):
+        self.assertTrue(staticexport.refresh_static_pages())
+        self.assertEqual(
+            sorted(os.listdir(staticexport.STATIC_DIR)),
+            sorted(
+                [filename for _, filename in staticexport.STATIC_PAGES] +
+                [
+                    staticexport.STATIC_JSON, staticexport.FRAGMENT_MANIFEST,
+                    staticexport.LOCK_FILE
+                ]
+            )
+        )
+
+        page = self.read('projectlist-active.html')
+        self.assertIn('test2', page)
+        # test1 is awaiting approval:
+        self.assertNotIn('test1', page)
+        # Anonymous visitors get no edit links:
+        self.assertNotIn('editproject.py', page)
+        self.assertIn(
+            staticexport.AUTH_BASE_URL + '/projectlist.py?filter_by=active',
+            page
+        )
+
+        projects = json.loads(self.read(staticexport.STATIC_JSON))['projects']
+        self.assertEqual(
+            [project['name'] for project in projects], ['test2']
+        )
+
+    def test_json_feed_format(self):
+        # The feed is spliced together from the stored documents, but must
+        # read the same as serializing the views:
+        db.approve_project(
+            self.project_info_list[0], self.project_info_list[0]['project_id'],
+            'approver', ''
+        )
+        self.assertEqual(
+            json.loads(projectjson.format_project_json()),
+            json.loads(
+                json.dumps(
+                    {
+                        'projects': [
+                            db.get_document_info(project.to_dict())
+                            for project in db.get_all_project_views(
+                                'approved'
+                            )
+                        ]
+                    },
+                    default=str
+                )
+            )
+        )
+
+    def test_lock(self):
+        with staticexport.export_lock():
+            with open(
+                os.path.join(staticexport.STATIC_DIR, staticexport.LOCK_FILE)
+            ) as f:
+                # Another export would have to wait:
+                with self.assertRaises((IOError, OSError)):
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        with open(
+            os.path.join(staticexport.STATIC_DIR, staticexport.LOCK_FILE)
+        ) as f:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    def test_updated_after_write(self):
+        staticexport.refresh_static_pages()
+        project_info = self.project_info_list[1]
+        db.deactivate_projects(
+            [project_info['project_id']], 'projects-database-admin'
+        )
+        staticexport.refresh_static_pages()
+        self.assertNotIn('test2', self.read('projectlist-active.html'))
+        self.assertIn('test2', self.read('projectlist-inactive.html'))
+
+    def test_incremental(self):
+        self.assertEqual(staticexport.export_static_pages(), 1)
+        full_page = self.read('projectlist-approved.html')
+        self.assertEqual(staticexport.export_static_pages(), 0)
+        self.assertEqual(self.read('projectlist-approved.html'), full_page)
+
+        # Approving test1 adds a revision, so only its row is rendered:
+        db.approve_project(
+            self.project_info_list[0], self.project_info_list[0]['project_id'],
+            'approver', ''
+        )
+        self.assertEqual(staticexport.export_static_pages(), 1)
+        incremental_page = self.read('projectlist-approved.html')
+        self.assertIn('test1', incremental_page)
+
+        self.assertEqual(
+            staticexport.export_static_pages(incremental=False), 2
+        )
+        self.assertEqual(
+            self.read('projectlist-approved.html'), incremental_page
+        )
+
+    def test_template_change(self):
+        staticexport.export_static_pages()
+        original_get_template_hash = staticexport.get_template_hash
+        staticexport.get_template_hash = lambda: 'changed'
+        try:
+            self.assertEqual(staticexport.export_static_pages(), 1)
+        finally:
+            staticexport.get_template_hash = original_get_template_hash
+
+    def test_failure_removes_pages(self):
+        staticexport.refresh_static_pages()
+        original_format_project_json = \
+            staticexport.projectjson.format_project_json
+
+        def fail():
+            raise RuntimeError('Simulated failure')
+
+        staticexport.projectjson.format_project_json = fail
+        # Keep the expected traceback out of the test output:
+        original_stderr = sys.stderr
+        sys.stderr = tempfile.TemporaryFile(mode='w+')
+        try:
+            self.assertFalse(staticexport.refresh_static_pages())
+            sys.stderr.seek(0)
+            self.assertIn('Simulated failure', sys.stderr.read())
+        finally:
+            sys.stderr.close()
+            sys.stderr = original_stderr
+            staticexport.projectjson.format_project_json = \
+                original_format_project_json
+        # Only the (empty) lock file is left:
+        self.assertEqual(
+            os.listdir(staticexport.STATIC_DIR), [staticexport.LOCK_FILE]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
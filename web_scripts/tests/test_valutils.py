@@ -9,6 +9,7 @@ import unittest
 
 import config
 import db
+import sqlstats
 import valutils
 
 
@@ -1101,5 +1102,233 @@ class Test_validate_revision_id(testutils.DatabaseWipeTestCase):
         self.assertGreaterEqual(len(status_messages), 1)
 
 
+class Test_ValidationContext(
+    testutils.EnvironmentOverrideDatabaseWipeTestCase
+):
+    def setUp(self):
+        super(Test_ValidationContext, self).setUp()
+        self.project_id = self.project_info_list[0]['project_id']
+        self.project_info = {
+            'name': 'test3',
+            'description': 'some test description',
+            'status': 'active',
+            'links': [],
+            'comm_channels': [],
+            'contacts': [
+                {'email': 'foo@mit.edu', 'type': 'primary', 'index': 0}
+            ],
+            'roles': [
+                {
+                    'role': 'foo',
+                    'description': 'bar',
+                    'prereq': '',
+                    'index': 0
+                }
+            ]
+        }
+        db.reset_read_cache()
+
+    def validate_edit(self, user):
+        os.environ['SSL_CLIENT_S_DN_Email'] = user + '@mit.edu'
+        context = valutils.ValidationContext(
+            project_id=str(self.project_id), name=self.project_info['name'],
+            user=user
+        )
+        sqlstats.reset()
+        is_ok, status_messages = valutils.validate_project_id(
+            str(self.project_id), context=context
+        )
+        self.assertTrue(is_ok)
+        is_ok, status_messages = valutils.validate_edit_project(
+            self.project_info, str(self.project_id), context=context
+        )
+        return is_ok, status_messages, sqlstats.get_summary()['queries']
+
+    def test_edit_contact(self):
+        is_ok, status_messages, num_queries = self.validate_edit('foo')
+        self.assertTrue(is_ok)
+        self.assertEqual(status_messages, [])
+        self.assertEqual(num_queries, 1)
+
+    def test_edit_creator(self):
+        is_ok, status_messages, num_queries = self.validate_edit('creator')
+        self.assertTrue(is_ok)
+        self.assertEqual(num_queries, 1)
+
+    def test_edit_messages(self):
+        self.project_info['name'] = 'TEST2'
+        is_ok, status_messages, num_queries = self.validate_edit(
+            'this_is_definitely_not_a_valid_kerb'
+        )
+        self.assertFalse(is_ok)
+        self.assertEqual(
+            status_messages,
+            [
+                'User is not authorized to edit this project!',
+                'A project with name "TEST2" already exists!'
+            ]
+        )
+        self.assertEqual(num_queries, 1)
+
+    def test_missing_project(self):
+        context = valutils.ValidationContext(project_id='-99')
+        is_ok, status_messages = valutils.validate_project_id(
+            '-99', context=context
+        )
+        self.assertFalse(is_ok)
+        self.assertEqual(
+            status_messages, ['There is no project with id "-99"!']
+        )
+
+    def test_invalid_project_id(self):
+        context = valutils.ValidationContext(project_id='asdf')
+        sqlstats.reset()
+        is_ok, status_messages = valutils.validate_project_id(
+            'asdf', context=context
+        )
+        num_queries = sqlstats.get_summary()['queries']
+        self.assertFalse(is_ok)
+        self.assertEqual(num_queries, 0)
+
+    def test_revision(self):
+        context = valutils.ValidationContext(
+            project_id=self.project_id, revision_id='0'
+        )
+        sqlstats.reset()
+        is_ok, status_messages = valutils.validate_revision_id(
+            self.project_id, '0', context=context
+        )
+        num_queries = sqlstats.get_summary()['queries']
+        self.assertTrue(is_ok)
+        self.assertEqual(num_queries, 1)
+
+        is_ok, status_messages = valutils.validate_revision_id(
+            self.project_id, '9999', context=context
+        )
+        self.assertFalse(is_ok)
+        self.assertEqual(
+            status_messages,
+            [
+                'There is no revision with id "9999" for the project with id '
+                '"%d"!' % self.project_id
+            ]
+        )
+
+    def test_other_project(self):
+        # Questions about other projects are answered from the database:
+        other_project_id = self.project_info_list[1]['project_id']
+        context = valutils.ValidationContext(
+            project_id=self.project_id, user='foo'
+        )
+        self.assertTrue(context.can_edit('foo', self.project_id))
+        self.assertFalse(context.can_edit('foo', other_project_id))
+        self.assertEqual(context.get_project_name(other_project_id), 'test2')
+        self.assertEqual(
+            context.get_project_id('test2'), other_project_id
+        )
+
+    def test_inactive(self):
+        db.update_project(
+            dict(self.project_info_list[0], status='inactive'),
+            self.project_id, 'foo'
+        )
+        os.environ['SSL_CLIENT_S_DN_Email'] = 'foo@mit.edu'
+        context = valutils.ValidationContext(
+            project_id=self.project_id, user='foo'
+        )
+        is_ok, status_messages = valutils.validate_renew_project(
+            self.project_id, context=context
+        )
+        self.assertFalse(is_ok)
+        self.assertEqual(
+            status_messages,
+            [
+                'Project "test1" is inactive. To renew it, edit the project '
+                'and set its status to "active".'
+            ]
+        )
+
+
+class Test_validate_import_projects(
+    testutils.EnvironmentOverrideDatabaseWipeTestCase
+):
+    def setUp(self):
+        super(Test_validate_import_projects, self).setUp()
+        self.import_info_list = [
+            {
+                'name': 'import%d' % index,
+                'description': 'an imported project',
+                'status': 'active',
+                'links': [],
+                'comm_channels': [],
+                'contacts': [
+                    {'email': 'foo@mit.edu', 'type': 'primary', 'index': 0}
+                ],
+                'roles': [
+                    {
+                        'role': 'foo',
+                        'description': 'bar',
+                        'prereq': None,
+                        'index': 0
+                    }
+                ]
+            }
+            for index in range(3)
+        ]
+        db.reset_read_cache()
+
+    def test_valid(self):
+        sqlstats.reset()
+        is_ok, status_messages = valutils.validate_import_projects(
+            self.import_info_list
+        )
+        num_queries = sqlstats.get_summary()['queries']
+        self.assertTrue(is_ok)
+        self.assertEqual(status_messages, [])
+        self.assertEqual(num_queries, 1)
+
+    def test_invalid(self):
+        self.import_info_list[0]['name'] = 'TEST2'
+        self.import_info_list[1]['description'] = ''
+        self.import_info_list[2]['name'] = 'Import1'
+        sqlstats.reset()
+        is_ok, status_messages = valutils.validate_import_projects(
+            self.import_info_list
+        )
+        num_queries = sqlstats.get_summary()['queries']
+        self.assertFalse(is_ok)
+        self.assertEqual(
+            status_messages,
+            [
+                'Project 1 ("TEST2"): A project with name "TEST2" already '
+                'exists!',
+                'Project 2 ("import1"): Project description must have at '
+                'least three words!',
+                'Project 3 ("Import1"): The name is used by an earlier '
+                'project in the file!'
+            ]
+        )
+        self.assertEqual(num_queries, 1)
+
+    def test_empty(self):
+        is_ok, status_messages = valutils.validate_import_projects([])
+        self.assertFalse(is_ok)
+
+    def test_permission(self):
+        os.environ['SSL_CLIENT_S_DN_Email'] = 'foo@mit.edu'
+        is_ok, status_messages = valutils.validate_import_permission()
+        self.assertFalse(is_ok)
+        self.assertEqual(
+            status_messages, ['User is not authorized to import projects!']
+        )
+
+        if len(config.ADMIN_USERS) > 0:
+            os.environ['SSL_CLIENT_S_DN_Email'] = (
+                config.ADMIN_USERS[0] + '@mit.edu'
+            )
+            is_ok, status_messages = valutils.validate_import_permission()
+            self.assertTrue(is_ok)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+# testutils MUST be imported first to set up test configuration and module
+# paths properly!
+import testutils
+
+import unittest
+
+import authutils
+import db
+import mail
+import viewmodels
+
+
+class Test_views(testutils.EnvironmentOverrideDatabaseWipeTestCase):
+    def setUp(self):
+        super(Test_views, self).setUp()
+        self.project_list = db.get_all_project_views('approved')
+        self.project = self.project_list[0]
+
+    def test_access(self):
+        self.assertEqual(self.project.name, 'test2')
+        self.assertEqual(self.project['name'], 'test2')
+        self.assertEqual(self.project.get('can_edit', False), None)
+        self.assertEqual(self.project.get('not_a_field', 'x'), 'x')
+        with self.assertRaises(KeyError):
+            self.project['not_a_field']
+        self.assertEqual(
+            self.project.contacts[0]['email'],
+            'this_is_definitely_not_a_valid_kerb@mit.edu'
+        )
+        self.assertEqual(self.project.revision_info.editor, 'creator')
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.project.name = 'test3'
+        with self.assertRaises(AttributeError):
+            self.project.extra = 'x'
+
+    def test_to_dict(self):
+        project_info = self.project.to_dict()
+        # The scheduling columns are not in the documents:
+        for key in db.SCHEDULING_COLUMNS:
+            self.assertIsNone(project_info.pop(key))
+        self.assertEqual(project_info, db.get_all_project_info('approved')[0])
+        self.assertNotIn('can_edit', project_info)
+
+    def test_permissions(self):
+        project_list = authutils.enrich_project_list_with_permissions(
+            'this_is_definitely_not_a_valid_kerb', self.project_list
+        )
+        self.assertTrue(project_list[0].can_edit)
+        self.assertFalse(project_list[0].can_approve)
+        # The original views are left alone:
+        self.assertIsNone(self.project_list[0].can_edit)
+
+    def test_mail(self):
+        self.assertEqual(
+            mail.format_project_info(self.project),
+            mail.format_project_info(self.project.to_dict())
+        )
+
+    def test_project_views(self):
+        project_id = self.project.project_id
+        project_view_map = db.get_project_views([project_id, -1])
+        self.assertEqual(list(project_view_map.keys()), [project_id])
+        # The list views are built from the documents, which leave out the
+        # scheduling columns:
+        self.assertIsNotNone(project_view_map[project_id].expires_at)
+        self.assertEqual(
+            project_view_map[project_id]._replace(
+                **dict.fromkeys(db.SCHEDULING_COLUMNS)
+            ),
+            self.project
+        )
+
+
+class Test_make_view(unittest.TestCase):
+    def test_decode(self):
+        link = viewmodels.make_view(
+            viewmodels.Link,
+            {
+                'id': 1,
+                'project_id': 2,
+                'link': u'https://\xe9.mit.edu'.encode('utf-8'),
+                'index': 0,
+                'anchortext': None
+            }
+        )
+        self.assertEqual(link.link, u'https://\xe9.mit.edu')
+        self.assertIsNone(link.anchortext)
+        self.assertEqual(link.index, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
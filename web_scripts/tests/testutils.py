@@ -17,6 +17,7 @@ assert creds.mode == 'test'
 import unittest
 
 import db
+import dbbackup
 import schema
 
 
@@ -72,22 +73,12 @@ class DatabaseWiper(object):
         """
         assert creds.mode == 'test'
 
-        # NOTE: this is done with .delete() rather than drop_all() because the
-        # latter was found to be unacceptably slow. This method will need to be
-        # updated if the schema ever changes.
-        schema.session.query(schema.ProjectsHistory).delete()
-        schema.session.query(schema.ContactEmails).delete()
-        schema.session.query(schema.ContactEmailsHistory).delete()
-        schema.session.query(schema.Roles).delete()
-        schema.session.query(schema.RolesHistory).delete()
-        schema.session.query(schema.Links).delete()
-        schema.session.query(schema.LinksHistory).delete()
-        schema.session.query(schema.CommChannels).delete()
-        schema.session.query(schema.CommChannelsHistory).delete()
-
-        schema.session.query(schema.Projects).delete()
-
+        # NOTE: this is done with DELETE rather than drop_all() because the
+        # latter was found to be unacceptably slow. The tables are emptied in
+        # foreign key order, so this does not need to change with the schema.
+        dbbackup.clear_tables(schema.session)
         schema.session.commit()
+        db.reset_read_cache()
 
     def __enter__(self):
         self.drop_test_projects()
@@ -0,0 +1,87 @@
+"""Phase timing for the CGI entry points. The code for each phase (rendering
+templates, sending mail) runs inside timed(), and requestutils.run logs the
+totals, together with the time taken to start up and the database time from
+sqlstats, when the request is done. See latencyreport.py for the report.
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+# The phases requestutils.run logs: 'startup' (from interpreter start until
+# main is called, i.e., mostly imports), 'db' (the time spent executing SQL,
+# from sqlstats), the phases timed with timed(), 'other' (the rest of main),
+# and 'total':
+PHASES = ['startup', 'db', 'render', 'mail', 'other', 'total']
+
+# Fallback for get_process_start_time:
+IMPORT_TIME = time.time()
+
+# Maps each phase to the total time (in seconds) spent in it by this process:
+phase_seconds = {}
+# Maps each phase which is being timed to the number of timed() blocks open
+# for it and when the first of them was entered:
+_open_blocks = {}
+# timed() may be used from worker threads (e.g., by sendreminders):
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """Context manager which adds the time spent inside it to a phase. Blocks
+    for the same phase which overlap, whether nested or on other threads, add
+    their wall time once.
+
+    Parameters
+    ----------
+    phase : str
+        The name of the phase, e.g., 'render'.
+    """
+    with _lock:
+        num_open, start_time = _open_blocks.get(phase, (0, None))
+        if num_open == 0:
+            start_time = time.time()
+        _open_blocks[phase] = (num_open + 1, start_time)
+    try:
+        yield
+    finally:
+        with _lock:
+            num_open, start_time = _open_blocks.pop(phase)
+            if num_open > 1:
+                _open_blocks[phase] = (num_open - 1, start_time)
+            else:
+                phase_seconds[phase] = (
+                    phase_seconds.get(phase, 0.0) + time.time() - start_time
+                )
+
+
+def reset():
+    """Forget the phase times recorded so far.
+    """
+    with _lock:
+        phase_seconds.clear()
+
+
+def get_process_start_time():
+    """Get the time at which this process (i.e., the interpreter) started, so
+    that the time taken to start up and import modules can be measured. This
+    is read from /proc, to within a clock tick; where that is not available,
+    the time this module was imported is used instead.
+
+    Returns
+    -------
+    start_time : float
+        The start time, in seconds since the epoch.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # The fields after the command name (which may contain spaces)
+            # start at field 3, and starttime is field 22:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        age = uptime - start_ticks / float(os.sysconf('SC_CLK_TCK'))
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        return IMPORT_TIME
+    return time.time() - age
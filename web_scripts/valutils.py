@@ -12,6 +12,136 @@ import strutils
 #
 # Functions which do NOT start with "validate_" are helper functions, and do
 # not need to adhere to the interface defined above.
+#
+# The functions which need facts from the database get them from a
+# ValidationContext. A context created for the whole form (e.g., with the
+# project ID, proposed name, and user) and passed to each function loads all of
+# them with a single query. Without one, each function makes its own.
+
+
+def to_int_or_none(value):
+    """Convert an ID (e.g., from a CGI form) to an int, or None if it is not
+    one.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ValidationContext(object):
+    def __init__(
+        self, project_id=None, name=None, revision_id=None, user=None,
+        names=None
+    ):
+        """Snapshot of the facts from the database which validating a form
+        needs, loaded with a single query (see db.get_validation_facts) the
+        first time one of them is used.
+
+        The lookups fall back to querying the database when asked about a
+        different project, name, revision, or user than the context was
+        created for, so a context is never wrong, only slower.
+
+        Parameters
+        ----------
+        project_id : str or int, optional
+            The project being validated. IDs which are not ints are ignored,
+            so this can be taken straight from the form.
+        name : str, optional
+            The proposed project name.
+        revision_id : str or int, optional
+            The revision of the project being validated.
+        user : str, optional
+            The kerberos of the user, for checking whether they can edit the
+            project.
+        names : list of str, optional
+            More proposed project names (e.g., for an import), whose
+            availability is looked up with one query of its own.
+        """
+        self.project_id = to_int_or_none(project_id)
+        self.name = name
+        self.revision_id = to_int_or_none(revision_id)
+        self.user = user
+        self.names = set(names) if names is not None else None
+        self._facts = None
+        self._project_ids_by_name = None
+
+    @property
+    def facts(self):
+        if self._facts is None:
+            self._facts = db.get_validation_facts(
+                project_id=self.project_id,
+                name=self.name,
+                revision_id=self.revision_id,
+                contact_email=(
+                    self.user + '@mit.edu' if self.user else None
+                )
+            )
+        return self._facts
+
+    def has_project(self, project_id):
+        return (
+            (self.project_id is not None) and
+            (to_int_or_none(project_id) == self.project_id)
+        )
+
+    def get_num_projects(self, project_id):
+        """Get the number of projects with the given ID.
+        """
+        if self.has_project(project_id):
+            return self.facts['num_projects']
+        return len(db.get_project(project_id))
+
+    def get_project_name(self, project_id):
+        if self.has_project(project_id):
+            return self.facts['name']
+        return db.get_project_name(project_id)
+
+    def get_project_status(self, project_id):
+        if self.has_project(project_id):
+            return self.facts['status']
+        return db.get_project(project_id)[0]['status']
+
+    def get_project_id(self, name):
+        """Get the ID of the project with the given name, or None if there is
+        none.
+        """
+        if (self.name is not None) and (name == self.name):
+            return self.facts['name_project_id']
+        elif (self.names is not None) and (name in self.names):
+            if self._project_ids_by_name is None:
+                self._project_ids_by_name = db.get_project_ids_by_name(
+                    list(self.names)
+                )
+            return self._project_ids_by_name.get(name.lower())
+        return db.get_project_id(name)
+
+    def get_num_revisions(self, project_id, revision_id):
+        """Get the number of (undeleted) revisions of the given project with
+        the given ID.
+        """
+        if (
+            self.has_project(project_id) and
+            (self.revision_id is not None) and
+            (to_int_or_none(revision_id) == self.revision_id)
+        ):
+            return self.facts['num_revisions']
+        return len(
+            db.get_project_revision(project_id, revision_id=revision_id)
+        )
+
+    def can_edit(self, user, project_id):
+        """Determine whether the given user can edit the given project, as
+        authutils.can_edit does.
+        """
+        if not (self.has_project(project_id) and user and user == self.user):
+            return authutils.can_edit(user, project_id)
+        elif authutils.is_admin(user) or authutils.is_approver(user):
+            return True
+        elif self.facts['creator'] == user:
+            return True
+        else:
+            return self.facts['contact_email'] == user + '@mit.edu'
 
 
 def all_unique(vals, ignore_case=True):
@@ -85,13 +215,15 @@ def validate_project_name_text(name):
     return name_ok, status_messages
 
 
-def validate_project_name_available(name):
+def validate_project_name_available(name, context=None):
     """Check if the project name is available.
 
     Parameters
     ----------
     name : str
         The proposed project name.
+    context : ValidationContext, optional
+        The facts from the database.
 
     Returns
     -------
@@ -100,14 +232,16 @@ def validate_project_name_available(name):
     status_messages : list of str
         A list of status messages.
     """
-    project_id = db.get_project_id(name)
+    if context is None:
+        context = ValidationContext(name=name)
+    project_id = context.get_project_id(name)
     if project_id:
         return False, ['A project with name "%s" already exists!' % name]
     else:
         return True, []
 
 
-def validate_project_name(name, previous_name=None):
+def validate_project_name(name, previous_name=None, context=None):
     """Check if the project name field is valid.
 
     Parameters
@@ -116,6 +250,8 @@ def validate_project_name(name, previous_name=None):
         The proposed project name.
     previous_name : str, optional
         The previous name of the project (if this is an edit and not an add).
+    context : ValidationContext, optional
+        The facts from the database.
 
     Returns
     -------
@@ -132,7 +268,9 @@ def validate_project_name(name, previous_name=None):
     status_messages.extend(name_msgs)
 
     if (previous_name is None) or (name.lower() != previous_name.lower()):
-        name_available, name_msgs = validate_project_name_available(name)
+        name_available, name_msgs = validate_project_name_available(
+            name, context=context
+        )
         name_ok &= name_available
         status_messages.extend(name_msgs)
 
@@ -464,7 +602,7 @@ def validate_project_comm_channels(comm_channels):
     return is_ok, status_messages
 
 
-def validate_project_info(project_info, previous_name=None):
+def validate_project_info(project_info, previous_name=None, context=None):
     """Validate that the given project info is OK.
 
     Parameters
@@ -473,6 +611,8 @@ def validate_project_info(project_info, previous_name=None):
         The project info extracted from the form.
     previous_name : str, optional
         The previous name of the project (if this is an edit and not an add).
+    context : ValidationContext, optional
+        The facts from the database.
 
     Returns
     -------
@@ -485,7 +625,7 @@ def validate_project_info(project_info, previous_name=None):
     status_messages = []
 
     name_ok, name_msgs = validate_project_name(
-        project_info['name'], previous_name=previous_name
+        project_info['name'], previous_name=previous_name, context=context
     )
     is_ok &= name_ok
     status_messages.extend(name_msgs)
@@ -522,7 +662,7 @@ def validate_project_info(project_info, previous_name=None):
     return is_ok, status_messages
 
 
-def validate_add_project(project_info):
+def validate_add_project(project_info, context=None):
     """Validate that the given project is OK to add.
 
     In particular, check that:
@@ -533,6 +673,8 @@ def validate_add_project(project_info):
     ----------
     project_info : dict
         The project info extracted from the form.
+    context : ValidationContext, optional
+        The facts from the database. Default is to load them for this form.
 
     Returns
     -------
@@ -544,24 +686,99 @@ def validate_add_project(project_info):
     is_ok = True
     status_messages = []
 
+    if context is None:
+        context = ValidationContext(name=project_info['name'])
+
     permission_ok, permission_msgs = validate_add_permission()
     is_ok &= permission_ok
     status_messages.extend(permission_msgs)
 
-    info_ok, info_msgs = validate_project_info(project_info)
+    info_ok, info_msgs = validate_project_info(project_info, context=context)
     is_ok &= info_ok
     status_messages.extend(info_msgs)
 
     return is_ok, status_messages
 
 
-def validate_edit_permission(project_id):
+def validate_import_permission():
+    """Check if the user has permission to import projects in bulk, which is
+    only for admins.
+
+    Returns
+    -------
+    is_ok : bool
+        Whether or not the validation was passed.
+    status_messages : list of str
+        A list of status messages.
+    """
+    is_ok = authutils.is_admin(authutils.get_kerberos())
+    if is_ok:
+        status_messages = []
+    else:
+        status_messages = ['User is not authorized to import projects!']
+    return is_ok, status_messages
+
+
+def validate_import_projects(project_info_list, context=None):
+    """Validate that the given projects are OK to import, i.e., that each is
+    OK to add and that no name is used twice. Whether the names are taken is
+    checked with a single query for the whole list.
+
+    Parameters
+    ----------
+    project_info_list : list of dict
+        The project info for each project.
+    context : ValidationContext, optional
+        The facts from the database. Default is to load them for these
+        projects.
+
+    Returns
+    -------
+    is_ok : bool
+        Indicates whether or not the projects are OK to import.
+    status_messages : list of str
+        A list of status messages indicating the result of the validation.
+        Each starts with the number and name of the project it is about.
+    """
+    if len(project_info_list) == 0:
+        return False, ['There are no projects to import!']
+
+    is_ok = True
+    status_messages = []
+
+    if context is None:
+        context = ValidationContext(
+            names=[project_info['name'] for project_info in project_info_list]
+        )
+
+    seen_names = set()
+    for number, project_info in enumerate(project_info_list, start=1):
+        prefix = 'Project %d ("%s"): ' % (number, project_info['name'])
+        info_ok, info_msgs = validate_project_info(
+            project_info, context=context
+        )
+        is_ok &= info_ok
+        status_messages.extend(prefix + message for message in info_msgs)
+
+        if project_info['name'].lower() in seen_names:
+            is_ok = False
+            status_messages.append(
+                prefix + 'The name is used by an earlier project in the file!'
+            )
+        seen_names.add(project_info['name'].lower())
+
+    return is_ok, status_messages
+
+
+def validate_edit_permission(project_id, context=None):
     """Validate that the user has permission to edit the project.
 
     Parameters
     ----------
     project_id : str or int
         The project ID.
+    context : ValidationContext, optional
+        The facts from the database.
 
     Returns
     -------
@@ -571,14 +788,16 @@ def validate_edit_permission(project_id):
         A list of status messages indicating the result of the validation.
     """
     user = authutils.get_kerberos()
-    can_edit = authutils.can_edit(user, project_id)
+    if context is None:
+        context = ValidationContext(project_id=project_id, user=user)
+    can_edit = context.can_edit(user, project_id)
     if can_edit:
         return True, []
     else:
         return False, ['User is not authorized to edit this project!']
 
 
-def validate_edit_project(project_info, project_id):
+def validate_edit_project(project_info, project_id, context=None):
     """Validate that the given project is OK to edit.
 
     In particular, check that:
@@ -591,6 +810,8 @@ def validate_edit_project(project_info, project_id):
         The project info extracted from the form.
     project_id : int
         The ID of the project to edit.
+    context : ValidationContext, optional
+        The facts from the database. Default is to load them for this form.
 
     Returns
     -------
@@ -602,13 +823,21 @@ def validate_edit_project(project_info, project_id):
     is_ok = True
     status_messages = []
 
-    permission_ok, permission_msgs = validate_edit_permission(project_id)
+    if context is None:
+        context = ValidationContext(
+            project_id=project_id, name=project_info['name'],
+            user=authutils.get_kerberos()
+        )
+
+    permission_ok, permission_msgs = validate_edit_permission(
+        project_id, context=context
+    )
     is_ok &= permission_ok
     status_messages.extend(permission_msgs)
 
-    previous_name = db.get_project_name(project_id)
+    previous_name = context.get_project_name(project_id)
     info_ok, info_msgs = validate_project_info(
-        project_info, previous_name=previous_name
+        project_info, previous_name=previous_name, context=context
     )
     is_ok &= info_ok
     status_messages.extend(info_msgs)
@@ -616,6 +845,79 @@ def validate_edit_project(project_info, project_id):
     return is_ok, status_messages
 
 
+def validate_project_is_active(project_id, context=None):
+    """Check if the project is active (and hence can be renewed without
+    editing it).
+
+    Parameters
+    ----------
+    project_id : str or int
+        The project ID.
+    context : ValidationContext, optional
+        The facts from the database.
+
+    Returns
+    -------
+    is_ok : bool
+        Whether or not the validation was passed.
+    status_messages : list of str
+        A list of status messages.
+    """
+    if context is None:
+        context = ValidationContext(project_id=project_id)
+    if context.get_project_status(project_id) == 'active':
+        return True, []
+    else:
+        return False, [
+            'Project "%s" is inactive. To renew it, edit the project and set '
+            'its status to "active".' % context.get_project_name(project_id)
+        ]
+
+
+def validate_renew_project(project_id, context=None):
+    """Validate that the given project is OK to renew.
+
+    In particular, check that:
+    * The user is signed-in and is authorized to edit the project.
+    * The project is active.
+
+    Parameters
+    ----------
+    project_id : int
+        The ID of the project to renew.
+    context : ValidationContext, optional
+        The facts from the database. Default is to load them for this form.
+
+    Returns
+    -------
+    is_ok : bool
+        Indicates whether or not the project is OK to renew.
+    status_messages : list of str
+        A list of status messages indicating the result of the validation.
+    """
+    is_ok = True
+    status_messages = []
+
+    if context is None:
+        context = ValidationContext(
+            project_id=project_id, user=authutils.get_kerberos()
+        )
+
+    permission_ok, permission_msgs = validate_edit_permission(
+        project_id, context=context
+    )
+    is_ok &= permission_ok
+    status_messages.extend(permission_msgs)
+
+    active_ok, active_msgs = validate_project_is_active(
+        project_id, context=context
+    )
+    is_ok &= active_ok
+    status_messages.extend(active_msgs)
+
+    return is_ok, status_messages
+
+
 def validate_approval_permission():
     """Check if the user has permission to approve projects.
 
@@ -693,7 +995,7 @@ def validate_approval_comments(approval_action, approver_comments):
 
 
 def validate_approve_project(
-    project_info, project_id, approval_action, approver_comments
+    project_info, project_id, approval_action, approver_comments, context=None
 ):
     """Validate that the given project is OK to approve/reject, possibly
     including changes to the project info made by the reviewer.
@@ -709,6 +1011,8 @@ def validate_approve_project(
         The project info extracted from the form.
     project_id : int
         The ID of the project to edit.
+    context : ValidationContext, optional
+        The facts from the database. Default is to load them for this form.
 
     Returns
     -------
@@ -720,13 +1024,18 @@ def validate_approve_project(
     is_ok = True
     status_messages = []
 
+    if context is None:
+        context = ValidationContext(
+            project_id=project_id, name=project_info['name']
+        )
+
     permission_ok, permission_msgs = validate_approval_permission()
     is_ok &= permission_ok
     status_messages.extend(permission_msgs)
 
-    previous_name = db.get_project_name(project_id)
+    previous_name = context.get_project_name(project_id)
     info_ok, info_msgs = validate_project_info(
-        project_info, previous_name=previous_name
+        project_info, previous_name=previous_name, context=context
     )
     is_ok &= info_ok
     status_messages.extend(info_msgs)
@@ -765,13 +1074,15 @@ def validate_id_is_int(id_):
         return True, []
 
 
-def validate_project_id_exists(project_id):
+def validate_project_id_exists(project_id, context=None):
     """Check if the given project ID exists (and hence can be edited).
 
     Parameters
     ----------
     project_id : str
         The project ID to check. Assumed to be a string coming from a CGI form.
+    context : ValidationContext, optional
+        The facts from the database.
 
     Returns
     -------
@@ -781,31 +1092,36 @@ def validate_project_id_exists(project_id):
         A list of status messages.
     """
     project_id = int(project_id)
-    project_info = db.get_project(project_id)
-    if len(project_info) == 0:
+    if context is None:
+        context = ValidationContext(project_id=project_id)
+    num_projects = context.get_num_projects(project_id)
+    if num_projects == 0:
         is_ok = False
         status_messages = ['There is no project with id "%d"!' % project_id]
-    elif len(project_info) == 1:
+    elif num_projects == 1:
         is_ok = True
         status_messages = []
     else:
         is_ok = False
         status_messages = [
             'There are %d projects with id "%d"!' % (
-                len(project_info), project_id
+                num_projects, project_id
             )
         ]
 
     return is_ok, status_messages
 
 
-def validate_project_id(project_id):
+def validate_project_id(project_id, context=None):
     """Check if the given project ID is OK to edit.
 
     Parameters
     ----------
     project_id : str
         The project ID to check. Assumed to be a string coming from a CGI form.
+    context : ValidationContext, optional
+        The facts from the database. Pass the context for the rest of the
+        form, so that it is only loaded once.
 
     Returns
     -------
@@ -822,14 +1138,16 @@ def validate_project_id(project_id):
     status_messages.extend(is_int_status)
 
     if is_int:
-        is_project, is_project_status = validate_project_id_exists(project_id)
+        is_project, is_project_status = validate_project_id_exists(
+            project_id, context=context
+        )
         is_ok &= is_project
         status_messages.extend(is_project_status)
 
     return is_ok, status_messages
 
 
-def validate_revision_id_exists(project_id, revision_id):
+def validate_revision_id_exists(project_id, revision_id, context=None):
     """Check if the given revision ID exists for the given project ID.
 
     Parameters
@@ -839,6 +1157,8 @@ def validate_revision_id_exists(project_id, revision_id):
     revision_id : str
         The revision ID to check. Assumed to be a string coming from a CGI
         form.
+    context : ValidationContext, optional
+        The facts from the database.
 
     Returns
     -------
@@ -849,14 +1169,18 @@ def validate_revision_id_exists(project_id, revision_id):
     """
     project_id = int(project_id)
     revision_id = int(revision_id)
-    project_info = db.get_project_revision(project_id, revision_id=revision_id)
-    if len(project_info) == 0:
+    if context is None:
+        context = ValidationContext(
+            project_id=project_id, revision_id=revision_id
+        )
+    num_revisions = context.get_num_revisions(project_id, revision_id)
+    if num_revisions == 0:
         is_ok = False
         status_messages = [
             'There is no revision with id "%d" for the project with id "%d"!' %
             (revision_id, project_id)
         ]
-    elif len(project_info) == 1:
+    elif num_revisions == 1:
         is_ok = True
         status_messages = []
     else:
@@ -864,14 +1188,14 @@ def validate_revision_id_exists(project_id, revision_id):
         status_messages = [
             'There are %d projects with project id "%d" ' +
             'and revision id "%d"!' % (
-                len(project_info), project_id, revision_id
+                num_revisions, project_id, revision_id
             )
         ]
 
     return is_ok, status_messages
 
 
-def validate_revision_id(project_id, revision_id):
+def validate_revision_id(project_id, revision_id, context=None):
     """Check if the given revision ID exists for the given project ID.
 
     Parameters
@@ -881,6 +1205,8 @@ def validate_revision_id(project_id, revision_id):
     revision_id : str
         The revision ID to check. Assumed to be a string coming from a CGI
         form.
+    context : ValidationContext, optional
+        The facts from the database. Default is to load them for these IDs.
 
     Returns
     -------
@@ -889,7 +1215,11 @@ def validate_revision_id(project_id, revision_id):
     status_messages : list of str
         A list of status messages.
     """
-    is_ok, status_messages = validate_project_id(project_id)
+    if context is None:
+        context = ValidationContext(
+            project_id=project_id, revision_id=revision_id
+        )
+    is_ok, status_messages = validate_project_id(project_id, context=context)
 
     if is_ok:
         is_int, is_int_status = validate_id_is_int(revision_id)
@@ -898,7 +1228,7 @@ def validate_revision_id(project_id, revision_id):
 
         if is_int:
             is_revision, is_revision_status = validate_revision_id_exists(
-                project_id, revision_id
+                project_id, revision_id, context=context
             )
             is_ok &= is_revision
             status_messages.extend(is_revision_status)
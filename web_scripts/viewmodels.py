@@ -0,0 +1,187 @@
+"""Compact, immutable views of project data for the read-only renderers (the
+project list template, projectjson.py, and the reminder emails).
+
+Each view is a namedtuple (so it has no per-instance __dict__) built once from
+query results, with its strings already decoded. Fields can be read either as
+attributes (as the templates do) or by key (as code written against the
+project_info dicts does), so views can be passed to functions which expect a
+project_info dict as long as they do not modify it. Use _replace to derive a
+modified view, and to_dict to get plain dicts (e.g., for JSON).
+
+The fields are taken from the schema, so that new columns are picked up
+automatically.
+"""
+
+import collections
+
+import strutils
+from schema import Projects, Links, CommChannels, ContactEmails, Roles
+
+
+class ViewMixin(object):
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, slice)):
+            return tuple.__getitem__(self, key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        """Get a field by name, like dict.get.
+        """
+        return getattr(self, key, default)
+
+    def keys(self):
+        """Get the field names, like dict.keys.
+        """
+        return list(self._fields)
+
+    def to_dict(self):
+        """Convert the view (and any nested views) to plain dicts and lists.
+
+        Returns
+        -------
+        view_dict : dict
+            Dict mapping field names to values.
+        """
+        return {
+            key: to_plain(getattr(self, key)) for key in self._fields
+        }
+
+
+def to_plain(value):
+    """Convert a value which may be (or contain) views to plain dicts and
+    lists.
+    """
+    if isinstance(value, ViewMixin):
+        return value.to_dict()
+    elif isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    else:
+        return value
+
+
+def make_view_class(name, fields):
+    """Make a view class with the given fields.
+
+    Parameters
+    ----------
+    name : str
+        The class name.
+    fields : list of str
+        The field names.
+
+    Returns
+    -------
+    view_class : type
+        The namedtuple subclass.
+    """
+    return type(
+        name,
+        (ViewMixin, collections.namedtuple(name, fields)),
+        {'__slots__': ()}
+    )
+
+
+Link = make_view_class('Link', Links.__table__.columns.keys())
+CommChannel = make_view_class(
+    'CommChannel', CommChannels.__table__.columns.keys()
+)
+Contact = make_view_class('Contact', ContactEmails.__table__.columns.keys())
+Role = make_view_class('Role', Roles.__table__.columns.keys())
+RevisionInfo = make_view_class('RevisionInfo', ['timestamp', 'editor'])
+
+# Maps the keys of the auxiliary tables (as in db.AUXILIARY_TABLES) to their
+# view classes:
+ENTRY_VIEW_CLASSES = collections.OrderedDict(
+    [
+        ('links', Link),
+        ('comm_channels', CommChannel),
+        ('contacts', Contact),
+        ('roles', Role)
+    ]
+)
+
+# Fields which depend on the user viewing the project, rather than on the
+# project itself. These are None until set with _replace (see
+# authutils.enrich_project_list_with_permissions), and are not exported.
+PERMISSION_FIELDS = ['can_edit', 'can_approve']
+
+
+class Project(
+    make_view_class(
+        'ProjectBase',
+        Projects.__table__.columns.keys() + list(ENTRY_VIEW_CLASSES.keys()) +
+        ['revision_info'] + PERMISSION_FIELDS
+    )
+):
+    __slots__ = ()
+
+    def to_dict(self):
+        """Convert the view (and its entries) to plain dicts and lists, in
+        the same format as db.get_all_project_info.
+
+        Returns
+        -------
+        project_info : dict
+            The project info.
+        """
+        project_info = super(Project, self).to_dict()
+        for key in PERMISSION_FIELDS:
+            project_info.pop(key)
+        return project_info
+
+
+def make_view(view_class, row):
+    """Make a view from a result row (or dict), decoding its strings.
+
+    Parameters
+    ----------
+    view_class : type
+        The view class, e.g., Link.
+    row : sqlalchemy.engine.RowProxy or dict
+        The values for each field.
+
+    Returns
+    -------
+    view : ViewMixin
+        The view.
+    """
+    return view_class(
+        *[strutils.decode_utf(row[key]) for key in view_class._fields]
+    )
+
+
+def make_project(row, entries, revision_info):
+    """Make a Project view.
+
+    Parameters
+    ----------
+    row : sqlalchemy.engine.RowProxy or dict
+        The row from the projects table.
+    entries : dict
+        Maps the keys of ENTRY_VIEW_CLASSES to the rows of each auxiliary
+        table which belong to the project, in index order.
+    revision_info : dict
+        The revision info, with keys 'timestamp' and 'editor'.
+
+    Returns
+    -------
+    project : Project
+        The view.
+    """
+    values = {
+        key: strutils.decode_utf(row[key])
+        for key in Projects.__table__.columns.keys()
+    }
+    for key, view_class in ENTRY_VIEW_CLASSES.items():
+        values[key] = tuple(
+            make_view(view_class, entry) for entry in entries[key]
+        )
+    values['revision_info'] = make_view(RevisionInfo, revision_info)
+    for key in PERMISSION_FIELDS:
+        values[key] = None
+    return Project(**values)